@@ -2,8 +2,10 @@ from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from typing import List, Dict, Any
 import pandas as pd
 import io
-from core.domain_kb.construct import stratified_sample, generate_rules_with_llm, save_rules, load_rules
-from core.llm import call_llm  # Assume a unified LLM calling interface is available
+from core.domain_kb.construct import stratified_sample_csv, generate_rules_with_llm
+from core.domain_kb.rule_store import rule_store
+from core.domain_kb.csv_io import read_csv_upload
+from core.llm import call_llm, default_model_name  # Assume a unified LLM calling interface is available
 import os
 
 router = APIRouter()
@@ -19,9 +21,9 @@ def sample_data(
     Upload a clean data file and return stratified sampling results (frontend preview).
     """
     try:
-        df = pd.read_csv(file.file)
         cols = stratify_cols.split(',') if stratify_cols else None
-        sample = stratified_sample(df, frac=frac, min_rows=min_rows, stratify_cols=cols)
+        # Stream the upload in chunks; memory follows the sample size, not the file
+        sample = stratified_sample_csv(file.file, frac=frac, min_rows=min_rows, stratify_cols=cols)
         return {"columns": sample.columns.tolist(), "rows": sample.head(100).to_dict(orient="records")}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -34,10 +36,10 @@ def generate_rules(
     Input CSV file and directly generate rules.
     """
     try:
-        df = pd.read_csv(file.file)
+        df = read_csv_upload(file.file)
         # Extract table name from filename (remove .csv extension)
         table_name = file.filename.replace('.csv', '').replace('.CSV', '')
-        rules = generate_rules_with_llm(df, call_llm, table=table_name)
+        rules = generate_rules_with_llm(df, call_llm, table=table_name, model=default_model_name())
         return {"rules": rules}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -48,7 +50,7 @@ def save_rules_api(
     dataset: str = Form(...)
 ):
     """
-    Save reviewed rules in JSONL format.
+    Save reviewed rules in JSONL format as a new version and sync the delta into the KB index.
     """
     try:
         import json
@@ -57,9 +59,8 @@ def save_rules_api(
         if not isinstance(rules_list, list):
             raise ValueError("Rules must be an array")
         
-        path = f"testdata/knowledge_base/domain_kb_{dataset}.jsonl"
-        save_rules(rules_list, path)
-        return {"status": "ok", "path": path, "count": len(rules_list)}
+        saved = rule_store.save(dataset, rules_list)
+        return {"status": "ok", "count": len(rules_list), **saved}
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON format for rules")
     except Exception as e:
@@ -71,10 +72,18 @@ def get_rules(dataset: str):
     Get saved rules.
     """
     try:
-        path = f"testdata/knowledge_base/domain_kb_{dataset}.jsonl"
-        if not os.path.exists(path):
+        if not rule_store.exists(dataset):
             raise HTTPException(status_code=404, detail="Rules not found")
-        rules = load_rules(path)
+        rules = rule_store.load(dataset)
         return {"rules": rules}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/domain_kb/rule_versions")
+def get_rule_versions(dataset: str):
+    """
+    Get the version history of saved rules.
+    """
+    return {"versions": rule_store.history(dataset)}
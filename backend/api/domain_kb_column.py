@@ -2,7 +2,10 @@ import pandas as pd
 import json
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from typing import List
-from core.llm import call_llm
+from core.llm import call_llm, default_model_name
+from core.domain_kb.construct import run_rule_prompts
+from core.domain_kb.profile import profile_columns, format_profile
+from core.domain_kb.csv_io import read_csv_upload
 
 router = APIRouter()
 
@@ -17,20 +20,27 @@ def generate_column_rules(
     Upload a clean CSV file and selected columns, sample 100 rows, automatically generate domain rules for each column, return in JSONL format.
     """
     try:
-        df = pd.read_csv(file.file)
-        col_list = [c.strip() for c in columns.split(",") if c.strip() in df.columns]
-        sample = df[col_list].dropna().head(n_rows)
-        rules = []
-        for idx, col in enumerate(col_list, 1):
-            values = sample[col].tolist()
-            prompt = (
-                f"Analyze the following sample values for the column '{col}' in the '{table}' table. "
-                f"Based on these examples, write a single, concise English rule sentence for data cleaning and normalization of this column. "
+        # Parse only the requested columns and stop after n_rows complete rows
+        requested = [c.strip() for c in columns.split(",") if c.strip()]
+        sample = read_csv_upload(file.file, columns=requested, n_rows=n_rows, dropna=True)
+        col_list = list(sample.columns)
+        # Profile the sampled rows; the compact summary goes to the LLM instead of raw values
+        profiles = profile_columns(sample, col_list)
+        prompts = {}
+        for col in col_list:
+            prompts[col] = (
+                f"Analyze the following profile of the column '{col}' in the '{table}' table. "
+                f"Based on this profile, write a single, concise English rule sentence for data cleaning and normalization of this column. "
                 f"The rule should describe value format, units, valid ranges, canonical representation, and any domain-specific constraints. "
-                f"Do NOT output a value or example, only output a rule sentence in English for data cleaning. Values: {values}"
+                f"Do NOT output a value or example, only output a rule sentence in English for data cleaning. Profile: {format_profile(col, profiles[col])}"
             )
-              # For debugging
-            rule = call_llm(prompt)
+        # Columns run concurrently; unchanged samples are served from the rule cache
+        generated = run_rule_prompts(table, prompts, call_llm, default_model_name())
+        rules = []
+        for idx, col in enumerate(col_list, 1):
+            rule = generated[col]
+            if isinstance(rule, Exception):
+                raise rule
             rules.append({
                 "id": str(idx),
                 "table": table,
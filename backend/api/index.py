@@ -1,12 +1,22 @@
+import os
+import shutil
+import tempfile
 from fastapi import APIRouter, HTTPException, File, UploadFile, Form
-from core.index import get_indexes, create_index, update_index, delete_index, upsert_rows, UpsertRequest
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from core.index import (
+    get_indexes, create_index, update_index, delete_index, upsert_rows, delete_points, update_points,
+    migrate_payloads, build_local_copy, UpsertRequest, DeletePointsRequest, UpdatePointsRequest, MigratePayloadsRequest,
+)
+from core.log_sync import sync_history_log
+from core.snapshot import export_snapshot, import_snapshot
 
 router = APIRouter()
 
 
 @router.get("/")
 async def get_indexes_endpoint():
-    response = await get_indexes()
+    response = await run_in_threadpool(get_indexes)
     if response["status"] == "fail":
         raise HTTPException(status_code=400, detail=response["message"])
     return response
@@ -16,10 +26,10 @@ async def get_indexes_endpoint():
 async def create_index_endpoint(
     index_name=Form(...), files: list[UploadFile] = File(...)
 ):
-    response = await create_index(index_name)
+    response = await run_in_threadpool(create_index, index_name)
     if response["status"] == "fail":
         raise HTTPException(status_code=400, detail=response["message"])
-    response = await update_index(index_name, files)
+    response = await run_in_threadpool(update_index, index_name, files)
     if response["status"] == "fail":
         raise HTTPException(status_code=400, detail=response["message"])
     return response
@@ -29,7 +39,7 @@ async def create_index_endpoint(
 async def update_index_endpoint(
     index_name=Form(...), files: list[UploadFile] = File(...)
 ):
-    response = await update_index(index_name, files)
+    response = await run_in_threadpool(update_index, index_name, files)
     if response["status"] == "fail":
         raise HTTPException(status_code=400, detail=response["message"])
     return response
@@ -37,16 +47,95 @@ async def update_index_endpoint(
 
 @router.delete("/{index_name}")
 async def delete_index_endpoint(index_name: str):
-    response = await delete_index(index_name)
+    response = await run_in_threadpool(delete_index, index_name)
     if response["status"] == "fail":
         raise HTTPException(status_code=400, detail=response["message"])
     return response
 
+
 # NEW ENDPOINT for direct JSON rows
 @router.post("/upsert_rows")
 async def upsert_rows_endpoint(req: UpsertRequest):
     try:
-        response = await upsert_rows(req)
+        response = await run_in_threadpool(upsert_rows, req)
         return response
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Targeted maintenance: only points matching the payload filter are touched
+@router.post("/delete_points")
+async def delete_points_endpoint(req: DeletePointsRequest):
+    response = await run_in_threadpool(delete_points, req)
+    if response["status"] == "fail":
+        raise HTTPException(status_code=400, detail=response["message"])
+    return response
+
+
+@router.post("/update_points")
+async def update_points_endpoint(req: UpdatePointsRequest):
+    response = await run_in_threadpool(update_points, req)
+    if response["status"] == "fail":
+        raise HTTPException(status_code=400, detail=response["message"])
+    return response
+
+# Rewrite stored payloads into the compact (or full) layout; dry_run only reports bytes per point
+@router.post("/migrate_payloads")
+async def migrate_payloads_endpoint(req: MigratePayloadsRequest):
+    response = await run_in_threadpool(migrate_payloads, req)
+    if response["status"] == "fail":
+        raise HTTPException(status_code=400, detail=response["message"])
+    return response
+
+
+@router.get("/{index_name}/payload_report")
+async def payload_report_endpoint(index_name: str):
+    response = await run_in_threadpool(migrate_payloads, MigratePayloadsRequest(index_name=index_name, dry_run=True))
+    if response["status"] == "fail":
+        raise HTTPException(status_code=400, detail=response["message"])
+    return response
+
+
+# In-process copy for a small collection created before local copies existed
+@router.post("/{index_name}/local_copy")
+async def build_local_copy_endpoint(index_name: str):
+    response = await run_in_threadpool(build_local_copy, index_name)
+    if response["status"] == "fail":
+        raise HTTPException(status_code=400, detail=response["message"])
+    return response
+
+
+# Incremental sync of append-only history logs (only new lines are embedded)
+@router.post("/sync")
+async def sync_index_endpoint(index_name=Form(...), paths: str = Form(...)):
+    try:
+        results = {
+            path: await run_in_threadpool(sync_history_log, index_name, path)
+            for path in [p.strip() for p in paths.split(",") if p.strip()]
+        }
+        return {"status": "success", "results": results}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Snapshots: move or restore an index without re-embedding
+@router.get("/{index_name}/snapshot")
+async def export_snapshot_endpoint(index_name: str, dtype: str = "float32"):
+    response = await run_in_threadpool(export_snapshot, index_name, dtype=dtype)
+    if response["status"] == "fail":
+        raise HTTPException(status_code=400, detail=response["message"])
+    return FileResponse(response["path"], media_type="application/octet-stream", filename=f"{index_name}.npz")
+
+
+@router.post("/snapshot")
+async def import_snapshot_endpoint(
+    index_name=Form(...), overwrite: bool = Form(False), file: UploadFile = File(...)
+):
+    with tempfile.NamedTemporaryFile(suffix=".npz", delete=False) as tmp:
+        shutil.copyfileobj(file.file, tmp)
+    try:
+        response = await run_in_threadpool(import_snapshot, index_name, tmp.name, overwrite=overwrite)
+    finally:
+        os.remove(tmp.name)
+    if response["status"] == "fail":
+        raise HTTPException(status_code=400, detail=response["message"])
+    return response
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException
-from core.llm import get_models
+from core.llm import get_models, get_backend_status
 
 router = APIRouter()
 
@@ -10,3 +10,8 @@ async def get_models_endpoint():
     if response["status"] == "fail":
         raise HTTPException(status_code=400, detail=response["message"])
     return response
+
+
+@router.get("/backends")
+async def get_backend_status_endpoint():
+    return get_backend_status()
@@ -1,6 +1,20 @@
-from fastapi import APIRouter, HTTPException
-from schemas import RepairRequest
+import os
+import json
+import shutil
+import tempfile
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, Response
+from schemas import RepairRequest, ColumnarRepairOptions, FeedbackRequest
 from core.repair import repair_data
+from core.columnar import ARROW_MEDIA_TYPE, parse_json_request, parse_arrow_request, to_columns, to_arrow
+from core.feedback import feedback_buffer
+from core.table_repair import validate_plan, stream_repaired_zip, TABLE_CHUNK_ROWS
+from core.detect import evaluate_detection, TESTDATA_DIR, EVAL_CLEAN_SAMPLE
+from core.fd_repair import evaluate_dependencies
+from core.batching import get_batching_stats
+from core.domain_kb.csv_io import read_csv_header
 
 router = APIRouter()
 
@@ -16,7 +30,154 @@ async def repair_endpoint(request: RepairRequest):
         request.reasoner_name,
         request.index_name,
         request.index_type,
+        bool(request.will_rerank),
+        request.top_k,
+        request.context_token_budget,
+        bool(request.detect),
+        fd_repair=bool(request.fd_repair),
     )
     if response["status"] == "fail":
         raise HTTPException(status_code=400, detail=response["message"])
     return response
+
+
+# Columnar variant of POST /repair/ for large columns: the body is read raw (no per-cell validation)
+# as JSON {..options, "ids", "target", "pivots": {name: [...]}} or an Arrow IPC stream; the response
+# is column arrays with citations / conflict blocks de-duplicated into reference tables
+# (Arrow back when the Accept header asks for it)
+@router.post("/columnar")
+async def repair_columnar_endpoint(request: Request):
+    body = await request.body()
+    arrow_in = request.headers.get("content-type", "").startswith(ARROW_MEDIA_TYPE)
+    try:
+        options, target_data, pivot_data = parse_arrow_request(body) if arrow_in else parse_json_request(body)
+        options = ColumnarRepairOptions(**options)
+    except ImportError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"invalid columnar request: {e}")
+
+    response = await repair_data(
+        options.entity_description,
+        options.target_name,
+        target_data,
+        options.pivot_names,
+        pivot_data,
+        options.reasoner_name,
+        options.index_name,
+        options.index_type,
+        bool(options.will_rerank),
+        options.top_k,
+        options.context_token_budget,
+        bool(options.detect),
+        fd_repair=bool(options.fd_repair),
+    )
+    if response["status"] == "fail":
+        raise HTTPException(status_code=400, detail=response["message"])
+
+    columnar = to_columns(response, [row["id"] for row in target_data])
+    if ARROW_MEDIA_TYPE in request.headers.get("accept", ""):
+        try:
+            return Response(content=to_arrow(columnar), media_type=ARROW_MEDIA_TYPE)
+        except ImportError as e:
+            raise HTTPException(status_code=406, detail=str(e))
+    # Already plain JSON types; skip FastAPI's per-value encoder walk
+    return Response(content=json.dumps(columnar, default=str), media_type="application/json")
+
+
+# Whole-table repair: CSV in, zip (repaired.csv + changes.csv) streamed back chunk by chunk
+@router.post("/table")
+async def repair_table_endpoint(
+    file: UploadFile = File(...),
+    plan: str = Form(...),  # JSON list of {"target", "pivots", "index_name", "index_type", "will_rerank", "top_k", "detect", "fd_repair"}
+    reasoner_name: str = Form(...),
+    entity_description: Optional[str] = Form(None),
+    chunk_rows: int = Form(TABLE_CHUNK_ROWS),
+    context_token_budget: Optional[int] = Form(None),
+):
+    try:
+        column_plan = json.loads(plan)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"plan is not valid JSON: {e}")
+
+    # The stream outlives this handler, so it reads from its own copy of the upload
+    source = tempfile.TemporaryFile()
+    shutil.copyfileobj(file.file, source)
+    error = validate_plan(column_plan, read_csv_header(source))
+    if error:
+        source.close()
+        raise HTTPException(status_code=400, detail=error)
+
+    async def body():
+        try:
+            async for part in stream_repaired_zip(
+                source, column_plan, reasoner_name, entity_description, max(1, chunk_rows), context_token_budget
+            ):
+                yield part
+        finally:
+            source.close()
+
+    name = (file.filename or "table.csv").rsplit(".", 1)[0]
+    return StreamingResponse(
+        body(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{name}_repaired.zip"'},
+    )
+
+
+@router.post("/feedback")
+async def feedback_endpoint(request: FeedbackRequest):
+    """Buffer reviewed repairs; they reach the history-log index on the next flush."""
+    result = feedback_buffer.add(request.index_name, [item.dict() for item in request.items])
+    return {"status": "success", **result}
+
+
+@router.post("/feedback/flush")
+async def feedback_flush_endpoint():
+    # Embeds, checks Qdrant, uploads and waits on the cross-worker lock: keep it off the event loop
+    flushed = await run_in_threadpool(feedback_buffer.flush)
+    return {"status": "success", **flushed, **feedback_buffer.status()}
+
+
+@router.get("/feedback/status")
+async def feedback_status_endpoint():
+    return feedback_buffer.status()
+
+
+# How well concurrent requests are being coalesced (embeddings, vector searches, LLM prompts)
+@router.get("/batching/status")
+async def batching_status_endpoint():
+    return get_batching_stats()
+
+
+# Detector precision/recall on testdata/<dataset>/dirty.csv vs clean.csv
+@router.get("/detect/evaluate")
+async def detect_evaluate_endpoint(
+    dataset: str,
+    history_paths: Optional[List[str]] = Query(None),  # KB JSONL files, relative to the testdata folder
+    index_name: Optional[List[str]] = Query(None),
+    clean_sample: float = EVAL_CLEAN_SAMPLE,  # share of rows whose clean values the detector learns from
+):
+    if os.path.basename(dataset) != dataset:
+        raise HTTPException(status_code=400, detail="dataset must be a folder name under testdata")
+    paths = []
+    for path in history_paths or []:
+        full = os.path.realpath(os.path.join(TESTDATA_DIR, path))
+        if not full.startswith(os.path.realpath(TESTDATA_DIR) + os.sep):
+            raise HTTPException(status_code=400, detail=f"history path outside testdata: {path}")
+        paths.append(full)
+    response = await run_in_threadpool(evaluate_detection, dataset, paths, index_name, TESTDATA_DIR, clean_sample)
+    if response["status"] == "fail":
+        raise HTTPException(status_code=400, detail=response["message"])
+    return response
+
+
+# Dependency-repair accuracy for one column of testdata/<dataset>/dirty.csv vs clean.csv
+@router.get("/dependencies/evaluate")
+async def dependencies_evaluate_endpoint(dataset: str, target: str, pivots: List[str] = Query(...)):
+    if os.path.basename(dataset) != dataset:
+        raise HTTPException(status_code=400, detail="dataset must be a folder name under testdata")
+    response = await run_in_threadpool(evaluate_dependencies, dataset, target, pivots, TESTDATA_DIR)
+    if response["status"] == "fail":
+        raise HTTPException(status_code=400, detail=response["message"])
+    return response
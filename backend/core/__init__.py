@@ -1,24 +1,29 @@
 import os
-from sentence_transformers import SentenceTransformer
 from elasticsearch import Elasticsearch
-from qdrant_client import QdrantClient
 from language_models import MODEL_MAP
 
 
 from dotenv import load_dotenv
 load_dotenv()
 
+from core.vector_store import ResilientQdrantClient, make_qdrant_client
+
 # Initialize models and clients
 # qdrant_client = QdrantClient(url=os.getenv("QDRANT_URL"))
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 
-qdrant_client = QdrantClient(
-    url=QDRANT_URL,          # e.g., "https://<cluster>.<region>.cloud.qdrant.io:6333"
-    api_key=QDRANT_API_KEY,  # required for cloud
-    timeout=30.0,            # optional
-)
-sentence_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+# gRPC where available, retried reads and a circuit breaker (see core/vector_store.py)
+qdrant_client = ResilientQdrantClient(client_factory=lambda: make_qdrant_client(QDRANT_URL, QDRANT_API_KEY))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Shared embedding sidecar (embedding_service.py) instead of one model copy per worker
+EMBEDDING_SOCKET = os.getenv("EMBEDDING_SOCKET")
+if EMBEDDING_SOCKET:
+    from embedding_service import EmbeddingClient
+    sentence_model = EmbeddingClient(EMBEDDING_SOCKET)
+else:
+    from sentence_transformers import SentenceTransformer
+    sentence_model = SentenceTransformer(EMBEDDING_MODEL)
 
 initialized_models = {}
 for name, model_class in MODEL_MAP.items():
@@ -0,0 +1,203 @@
+import os
+import copy
+import json
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, List
+
+from core import qdrant_client, sentence_model, initialized_models
+from core.retrieval_cache import lookup_embeddings, store_embeddings
+
+# Coalesce embedding / vector-search / LLM work from concurrent requests into shared batches
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "true").lower() == "true"
+# Extra wait for more items once a batch could go out; 0 = pure "batch what queued while busy"
+MICROBATCH_WAIT_MS = float(os.getenv("MICROBATCH_WAIT_MS", "2"))
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "256"))
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", "64"))
+SEARCH_BATCH_INFLIGHT = int(os.getenv("SEARCH_BATCH_INFLIGHT", "4"))
+LLM_BATCH_MAX = int(os.getenv("LLM_BATCH_MAX", "32"))
+LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", "8"))
+
+
+class MicroBatcher:
+    """
+    Collects items submitted by concurrent coroutines and hands them to
+    ``fn(key, items) -> results`` (run in a worker thread) as shared batches.
+
+    An idle batcher dispatches at once (after at most ``max_wait_ms``), so a
+    lone request pays almost nothing; while ``max_inflight`` batches are
+    running, new items queue up and go out together in the next one. Items
+    with different keys (e.g. collections, models) are never mixed in one
+    call. A result that is an exception fails only its own item.
+    """
+
+    def __init__(self, name: str, fn: Callable[[Hashable, list], list], max_batch: int = 64,
+                 max_wait_ms: float = MICROBATCH_WAIT_MS, max_inflight: int = 1, enabled: bool = MICROBATCH_ENABLED):
+        self.name = name
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_inflight = max_inflight
+        self.enabled = enabled
+        self._loop = None
+        self._pending: list = []
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+
+    def _ensure_worker(self) -> None:
+        # Event-loop objects are bound to the loop that runs them; start over on a new loop
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._pending = []
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_inflight)
+        self._worker = loop.create_task(self._run())
+
+    async def submit_many(self, items: list, key: Hashable = None) -> list:
+        """Queue items and wait for their results, in order."""
+        if not items:
+            return []
+        if not self.enabled:
+            results = await asyncio.to_thread(self.fn, key, list(items))
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            return results
+        self._ensure_worker()
+        futures = [self._loop.create_future() for _ in items]
+        self._pending.extend((key, item, future) for item, future in zip(items, futures))
+        self._wakeup.set()
+        return list(await asyncio.gather(*futures))
+
+    async def submit(self, item, key: Hashable = None):
+        return (await self.submit_many([item], key))[0]
+
+    async def _run(self) -> None:
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            if self.max_wait > 0 and len(self._pending) < self.max_batch:
+                await asyncio.sleep(self.max_wait)
+            await self._slots.acquire()
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            self._loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch: list) -> None:
+        try:
+            groups = {}
+            for key, item, future in batch:
+                if not future.done():  # caller gave up (cancelled)
+                    groups.setdefault(key, []).append((item, future))
+            for key, entries in groups.items():
+                with self._lock:
+                    self.batches += 1
+                    self.items += len(entries)
+                    self.largest = max(self.largest, len(entries))
+                try:
+                    results = await asyncio.to_thread(self.fn, key, [item for item, _ in entries])
+                except Exception as e:
+                    results = [e] * len(entries)
+                for (_, future), result in zip(entries, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, BaseException):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "largest_batch": self.largest,
+                "queued": len(self._pending),
+            }
+
+
+# ---------- Embeddings ----------
+def _encode_many(_key, texts: List[str]) -> list:
+    # Concurrent requests often miss the cache on the same query; encode it once
+    distinct = list(dict.fromkeys(texts))
+    vectors = dict(zip(distinct, sentence_model.encode(distinct)))
+    return [vectors[t] for t in texts]
+
+
+embedding_batcher = MicroBatcher("embeddings", _encode_many, max_batch=EMBED_BATCH_MAX)
+
+
+async def encode_queries_batched(queries: List[str]) -> list:
+    """encode_queries, with cache misses encoded in batches shared with other requests."""
+    vectors, missing = lookup_embeddings(queries)
+    if missing:
+        encoded = dict(zip(missing, await embedding_batcher.submit_many(missing)))
+        store_embeddings(encoded)
+        vectors = [v if v is not None else encoded[q] for q, v in zip(queries, vectors)]
+    return vectors
+
+
+# ---------- Vector search ----------
+def _search_many(collection_name: str, requests: List[tuple]) -> list:
+    """requests: (vector, filter, limit) tuples against one collection; one query_batch_points call."""
+    from qdrant_client import models
+
+    responses = qdrant_client.query_batch_points(
+        collection_name=collection_name,
+        requests=[
+            models.QueryRequest(query=vector, filter=query_filter, limit=limit, with_payload=True)
+            for vector, query_filter, limit in requests
+        ],
+    )
+    return [response.points for response in responses]
+
+
+search_batcher = MicroBatcher("vector_search", _search_many, max_batch=SEARCH_BATCH_MAX, max_inflight=SEARCH_BATCH_INFLIGHT)
+
+
+# ---------- LLM prompts ----------
+_llm_executor = ThreadPoolExecutor(max_workers=LLM_BATCH_CONCURRENCY, thread_name_prefix="llm-batch")
+
+
+def _prompt_key(wrapped, retrieved) -> str:
+    # The answer's citations are resolved against `retrieved`, so it is part of the identity
+    return json.dumps([wrapped, retrieved], sort_keys=True, default=str)
+
+
+def _generate_many(model_name: str, prompts: List[tuple]) -> list:
+    """
+    prompts: (wrapped prompt, retrieved) pairs for one model. Identical pairs
+    are generated once; distinct ones run concurrently (the Ollama pool / API
+    client spreads them over hosts).
+    """
+    model = initialized_models[model_name]
+    distinct = {}
+    for wrapped, retrieved in prompts:
+        distinct.setdefault(_prompt_key(wrapped, retrieved), (wrapped, retrieved))
+
+    def generate(prompt):
+        try:
+            return model.generate(*prompt)
+        except Exception as e:
+            return e
+
+    answers = dict(zip(distinct, _llm_executor.map(generate, distinct.values())))
+    # Each caller gets its own copy; prompt_with_data annotates the dicts
+    return [copy.copy(answers[_prompt_key(wrapped, retrieved)]) for wrapped, retrieved in prompts]
+
+
+llm_batcher = MicroBatcher("llm", _generate_many, max_batch=LLM_BATCH_MAX, max_inflight=LLM_BATCH_CONCURRENCY)
+
+
+def get_batching_stats() -> dict:
+    return {b.name: b.stats() for b in (embedding_batcher, search_batcher, llm_batcher)}
@@ -0,0 +1,140 @@
+import json
+from typing import Any, Dict, List, Tuple
+
+# Columnar wire format for large repairs (see POST /repair/columnar)
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+COLUMN_KEYS = {"ids", "target", "pivots"}
+# Per-row fields sent as references into de-duplicated tables
+REFERENCE_FIELDS = {"citation": "citations", "conflict": "conflicts"}
+
+
+def _import_arrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise ImportError("Arrow IPC needs pyarrow (pip install pyarrow); use the JSON columnar format instead")
+    return pa
+
+
+def rows_from_columns(ids: list, target: list, pivot_names: List[str], pivots: Dict[str, list]) -> Tuple[list, list]:
+    """Column arrays -> the row-wise target_data / pivot_data that repair_data takes."""
+    n = len(target)
+    if ids is None:
+        ids = list(range(n))
+    if len(ids) != n:
+        raise ValueError(f"ids has {len(ids)} entries, target has {n}")
+    missing = [name for name in pivot_names if name not in pivots]
+    if missing:
+        raise ValueError(f"pivot columns missing: {missing}")
+    columns = [pivots[name] for name in pivot_names]
+    for name, column in zip(pivot_names, columns):
+        if len(column) != n:
+            raise ValueError(f"pivot column {name} has {len(column)} entries, target has {n}")
+    target_data = [{"id": i, "value": v} for i, v in zip(ids, target)]
+    pivot_data = [{"id": i, "values": list(values)} for i, values in zip(ids, zip(*columns))] if columns else \
+        [{"id": i, "values": []} for i in ids]
+    return target_data, pivot_data
+
+
+def parse_json_request(body: bytes) -> Tuple[dict, list, list]:
+    """
+    {"target_name", "pivot_names", ..., "ids": [...], "target": [...], "pivots": {name: [...]}}
+    Returns:
+        (options dict, target_data, pivot_data)
+    """
+    payload = json.loads(body)
+    if not isinstance(payload, dict) or not isinstance(payload.get("target"), list):
+        raise ValueError("body must be an object with a 'target' array")
+    options = {k: v for k, v in payload.items() if k not in COLUMN_KEYS}
+    pivots = payload.get("pivots") or {}
+    if not isinstance(pivots, dict):
+        raise ValueError("'pivots' must map pivot names to arrays")
+    target_data, pivot_data = rows_from_columns(
+        payload.get("ids"), payload["target"], options.get("pivot_names") or [], pivots
+    )
+    return options, target_data, pivot_data
+
+
+def parse_arrow_request(body: bytes) -> Tuple[dict, list, list]:
+    """
+    Arrow IPC stream: the target column (named target_name), the pivot columns
+    and an optional "id" column; the other options are JSON in the schema
+    metadata under "options".
+    """
+    pa = _import_arrow()
+    table = pa.ipc.open_stream(body).read_all()
+    metadata = table.schema.metadata or {}
+    if b"options" not in metadata:
+        raise ValueError("Arrow schema metadata must carry the request options under 'options'")
+    options = json.loads(metadata[b"options"])
+    target_name = options.get("target_name")
+    if target_name not in table.column_names:
+        raise ValueError(f"target column {target_name!r} not in the Arrow table")
+    pivot_names = options.get("pivot_names") or []
+    pivots = {name: table.column(name).to_pylist() for name in pivot_names if name in table.column_names}
+    ids = table.column("id").to_pylist() if "id" in table.column_names else None
+    target_data, pivot_data = rows_from_columns(ids, table.column(target_name).to_pylist(), pivot_names, pivots)
+    return options, target_data, pivot_data
+
+
+def _reference_table(values: list) -> Tuple[list, list]:
+    """Distinct values (by JSON content) and, per row, the index of its value (None stays None)."""
+    table, refs, seen, by_object = [], [], {}, {}
+    for value in values:
+        if value is None:
+            refs.append(None)
+            continue
+        # Rows often share one list/dict object; only serialise each object once
+        ref = by_object.get(id(value))
+        if ref is None:
+            key = json.dumps(value, sort_keys=True, default=str)
+            if key not in seen:
+                seen[key] = len(table)
+                table.append(value)
+            ref = by_object[id(value)] = seen[key]
+        refs.append(ref)
+    return table, refs
+
+
+def to_columns(response: Dict[str, Any], ids: list) -> Dict[str, Any]:
+    """
+    Row-wise repair response -> {"columns": {field: [...]}, "citations": [...],
+    "conflicts": [...], **top-level fields}. Citation lists and conflict blocks
+    are stored once and referenced by index from "citation_ref"/"conflict_ref".
+    """
+    results = [r if isinstance(r, dict) else {"value": r} for r in response.get("results", [])]
+    fields = []
+    for result in results:
+        fields.extend(k for k in result if k not in fields and k not in REFERENCE_FIELDS)
+    columns = {"id": list(ids)}
+    for field in fields:
+        columns[field] = [r.get(field) for r in results]
+    out = {k: v for k, v in response.items() if k != "results"}
+    for field, table_name in REFERENCE_FIELDS.items():
+        table, refs = _reference_table([r.get(field) for r in results])
+        columns[f"{field}_ref"] = refs
+        out[table_name] = table
+    out["columns"] = columns
+    return out
+
+
+def _arrow_array(pa, values: list):
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed types (e.g. row_number as int and str): send as text
+        return pa.array([v if v is None or isinstance(v, str) else json.dumps(v, default=str) for v in values])
+
+
+def to_arrow(columnar: Dict[str, Any]) -> bytes:
+    """to_columns output -> Arrow IPC stream; reference tables and top-level fields go in schema metadata."""
+    pa = _import_arrow()
+    columns = columnar["columns"]
+    table = pa.table({name: _arrow_array(pa, values) for name, values in columns.items()})
+    metadata = {k: json.dumps(v, default=str) for k, v in columnar.items() if k != "columns"}
+    table = table.replace_schema_metadata(metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,409 @@
+import os
+import re
+import json
+from typing import List, Dict, Any, Optional, Iterable
+
+import numpy as np
+import pandas as pd
+
+from core.domain_kb.profile import value_patterns
+
+TESTDATA_DIR = os.getenv("TESTDATA_DIR", "testdata")
+MISSING_TOKENS = {"", "n/a", "na", "null", "none", "nan", "-", "?"}
+# Missing values are suspicious only in columns that are mostly filled
+MISSING_MAX_RATE = float(os.getenv("DETECT_MISSING_MAX_RATE", "0.2"))
+# Shapes seen in under this share of a column's values are suspicious
+PATTERN_MIN_FREQ = float(os.getenv("DETECT_PATTERN_MIN_FREQ", "0.01"))
+NUMERIC_MIN_RATE = 0.9
+OUTLIER_Z = 3.5
+# A value seen at most RARE_VALUE_MAX_COUNT times that is a near-copy of a frequent one is likely a typo
+RARE_VALUE_MAX_COUNT = 2
+FREQUENT_MIN_COUNT = 3
+# Rare x frequent characters compared at once by _near_frequent (bounds its temporary arrays)
+NEAR_FREQUENT_BLOCK = 1 << 22
+# Fewer clean values than this are too few to learn a column's formats and frequencies from
+MIN_CLEAN_VALUES = int(os.getenv("DETECT_MIN_CLEAN_VALUES", "20"))
+# Share of clean.csv rows evaluate_detection hands the detector as its clean sample (not scored)
+EVAL_CLEAN_SAMPLE = float(os.getenv("DETECT_EVAL_CLEAN_SAMPLE", "0.2"))
+
+
+def _normalize_name(name: str) -> str:
+    return re.sub(r"[^0-9a-z]", "", str(name).lower())
+
+
+class ColumnKnowledge:
+    """
+    What the knowledge base says about one column: known dirty/clean values,
+    rule regexes, and its clean values with repeats (history-log fixes and the
+    column's cells in clean table rows), which the detector learns formats from.
+    """
+
+    def __init__(self, known_dirty: Iterable[str] = (), known_clean: Iterable[str] = (), regexes: Iterable[str] = ()):
+        self.known_dirty = {str(v) for v in known_dirty if v is not None}
+        self.known_clean = {str(v) for v in known_clean if v is not None}
+        self.regexes = [rx for rx in regexes if rx]
+        self.clean_values: List[str] = sorted(self.known_clean)
+
+    def add_rows(self, rows: Iterable[dict]) -> "ColumnKnowledge":
+        for row in rows:
+            if row.get("dirty_value") is not None:
+                self.known_dirty.add(str(row["dirty_value"]))
+            if row.get("clean_value") is not None:
+                self.known_clean.add(str(row["clean_value"]))
+                self.clean_values.append(str(row["clean_value"]))
+            if row.get("regex"):
+                self.regexes.append(row["regex"])
+        # A value that is also a known fix is not known-bad
+        self.known_dirty -= self.known_clean
+        return self
+
+    def add_clean_values(self, values: Iterable[Any]) -> "ColumnKnowledge":
+        # Cells of clean table rows: a clean sample, but not a dictionary of known fixes
+        self.clean_values.extend("" if v is None else str(v) for v in values)
+        return self
+
+    def merge(self, other: "ColumnKnowledge") -> "ColumnKnowledge":
+        self.known_dirty |= other.known_dirty
+        self.known_clean |= other.known_clean
+        self.regexes.extend(rx for rx in other.regexes if rx not in self.regexes)
+        self.clean_values.extend(other.clean_values)
+        self.known_dirty -= self.known_clean
+        return self
+
+
+def _collect(column: str, rows: Iterable[dict]) -> ColumnKnowledge:
+    """KB rows about ``column`` (history logs, domain rules) plus its cells in clean table rows."""
+    target = _normalize_name(column)
+    about, cells = [], []
+    for row in rows:
+        if row.get("column") is not None:
+            if _normalize_name(row["column"]) == target:
+                about.append(row)
+            continue
+        cells.extend(value for key, value in row.items() if _normalize_name(key) == target)
+    return ColumnKnowledge().add_rows(about).add_clean_values(cells)
+
+
+def knowledge_from_files(column: str, paths: Iterable[str]) -> ColumnKnowledge:
+    """Collect KB rows for ``column`` from JSONL files."""
+    rows = []
+    for path in paths:
+        with open(path, "r") as f:
+            rows.extend(json.loads(line) for line in f if line.strip())
+    return _collect(column, rows)
+
+
+def knowledge_from_indexes(column: str, index_names: Iterable[str], batch_size: int = 1000) -> ColumnKnowledge:
+    """
+    Collect KB rows for ``column`` from indexes: their local copies if any,
+    else a scroll. Column names are matched like knowledge_from_files does
+    (case and punctuation ignored), so the scroll reads every point of the index.
+    """
+    from core import qdrant_client
+    from core.local_index import get_local_index
+    from core.layout import physical_name, tenant_filter
+    from core.index import expand_payload
+
+    rows = []
+    for index_name in index_names:
+        local_index = get_local_index(index_name)
+        if local_index is not None:
+            local_index.refresh()
+            with local_index.lock:
+                rows.extend(p.get("row") or p for p in local_index.payloads)
+            continue
+        offset = None
+        while True:
+            records, offset = qdrant_client.scroll(
+                collection_name=physical_name(index_name),
+                scroll_filter=tenant_filter(index_name),
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+            rows.extend(expand_payload(r.payload, index_name, r.id)["row"] or r.payload for r in records)
+            if offset is None:
+                break
+    return _collect(column, rows)
+
+
+def _code_points(values: np.ndarray, length: int) -> np.ndarray:
+    # Equal-length strings -> (n, length) code points, every digit folded to "0"
+    points = values.astype(f"<U{length}").view(np.uint32).reshape(len(values), length)
+    return np.where((points >= 48) & (points <= 57), 48, points)
+
+
+def _near_frequent(rare: np.ndarray, frequent: np.ndarray, block: int = NEAR_FREQUENT_BLOCK) -> np.ndarray:
+    """
+    For each rare value, is there a frequent value of the same length that
+    differs in 1..max(1, len // 6) characters? Compared as code-point
+    matrices, one length group at a time, in blocks of at most ``block``
+    compared characters so memory stays flat however many values there are.
+    Digit-for-digit differences don't count ("31 patients" is not a typo of
+    "37 patients").
+    """
+    result = np.zeros(len(rare), dtype=bool)
+    if len(rare) == 0 or len(frequent) == 0:
+        return result
+    rare = rare.astype(str)
+    frequent = frequent.astype(str)
+    rare_len = np.char.str_len(rare)
+    freq_len = np.char.str_len(frequent)
+    for length in np.intersect1d(rare_len, freq_len):
+        if length == 0:
+            continue
+        r_idx = np.where(rare_len == length)[0]
+        r = _code_points(rare[r_idx], length)
+        f = _code_points(frequent[freq_len == length], length)
+        f_step = max(1, min(len(f), block // length))
+        r_step = max(1, block // (f_step * length))
+        best = np.full(len(r), length + 1)
+        for r_start in range(0, len(r), r_step):
+            r_block = r[r_start:r_start + r_step, None, :]
+            for f_start in range(0, len(f), f_step):
+                mismatches = (r_block != f[None, f_start:f_start + f_step, :]).sum(axis=2)
+                mismatches[mismatches == 0] = length + 1  # identical: not a typo
+                best[r_start:r_start + r_step] = np.minimum(best[r_start:r_start + r_step], mismatches.min(axis=1))
+        result[r_idx] = best <= max(1, length // 6)
+    return result
+
+
+class ColumnDetector:
+    """
+    Vectorized error detection for one column.
+
+    Format and frequency statistics (value and shape counts, numeric sample,
+    missing rate) are learned from clean values only: the knowledge base's
+    (``ColumnKnowledge.clean_values``) plus any clean sample passed to
+    ``partial_fit``, over one or more chunks. The cells being judged never
+    train the detector, so a column's own errors cannot pass as its format.
+    ``predict`` then flags cells by:
+      known_dirty    - value is a known dirty value in the history logs
+      dirty_pattern  - value has the shape of known dirty values (and not of known clean ones)
+      rule           - value does not match a domain-rule regex
+      missing        - empty/placeholder where clean values are mostly filled
+      rare_pattern   - shape seen in under PATTERN_MIN_FREQ of the clean values
+      not_numeric / outlier - in a mostly numeric column (robust z-score)
+      near_frequent  - value rare among clean values that is a near-copy of a frequent one (typo)
+      variant        - case/punctuation variant of the dominant clean spelling
+      unchecked      - fewer than MIN_CLEAN_VALUES clean values to learn from: every cell goes on to repair
+    Known clean values are never flagged.
+    """
+
+    def __init__(self, knowledge: Optional[ColumnKnowledge] = None):
+        self.knowledge = knowledge or ColumnKnowledge()
+        self.value_counts = pd.Series(dtype=np.int64)
+        self.pattern_counts = pd.Series(dtype=np.int64)
+        self.numbers: List[np.ndarray] = []
+        self.rows = 0
+        self.missing = 0
+        self.partial_fit(self.knowledge.clean_values)
+
+    @staticmethod
+    def _text(values) -> pd.Series:
+        # Object dtype keeps .str on Python's re: KB rule regexes may use what RE2 (Arrow strings) lacks
+        return pd.Series(values, dtype=object).fillna("").astype(str).astype(object)
+
+    def partial_fit(self, clean_values) -> "ColumnDetector":
+        """Learn from a chunk of known-clean values (never from the cells to be judged)."""
+        text = self._text(clean_values)
+        missing = text.str.strip().str.lower().isin(MISSING_TOKENS)
+        present = text[~missing]
+        self.rows += len(text)
+        self.missing += int(missing.sum())
+        self.value_counts = self.value_counts.add(present.value_counts(), fill_value=0)
+        self.pattern_counts = self.pattern_counts.add(value_patterns(present).value_counts(), fill_value=0)
+        numbers = pd.to_numeric(present, errors="coerce").dropna()
+        if len(numbers):
+            self.numbers.append(numbers.to_numpy(dtype=np.float64))
+        return self
+
+    def fit(self, clean_values) -> "ColumnDetector":
+        return self.partial_fit(clean_values)
+
+    def _compare_with_clean(
+        self, text: pd.Series, stripped: pd.Series, missing: np.ndarray, patterns: pd.Series,
+    ) -> Dict[str, np.ndarray]:
+        """Checks against the clean values' missing rate, numbers, shapes and spellings."""
+        present_rows = max(self.rows - self.missing, 1)
+        reasons: Dict[str, np.ndarray] = {}
+        if self.missing / self.rows <= MISSING_MAX_RATE:
+            reasons["missing"] = missing
+
+        numbers = np.concatenate(self.numbers) if self.numbers else np.empty(0)
+        if len(numbers) >= NUMERIC_MIN_RATE * present_rows and len(numbers) > 0:
+            x = pd.to_numeric(text, errors="coerce").to_numpy(dtype=np.float64)
+            reasons["not_numeric"] = np.isnan(x) & ~missing
+            # Outliers only for measurements; integer columns are mostly codes (ids, zips, phones)
+            if not np.all(numbers == np.round(numbers)):
+                median = np.median(numbers)
+                mad = np.median(np.abs(numbers - median)) * 1.4826
+                if mad > 0:
+                    with np.errstate(invalid="ignore"):
+                        reasons["outlier"] = np.nan_to_num(np.abs(x - median) / mad) > OUTLIER_Z
+        else:
+            shape_share = patterns.map(self.pattern_counts).fillna(0).to_numpy() / present_rows
+            reasons["rare_pattern"] = (shape_share < PATTERN_MIN_FREQ) & ~missing
+
+            # Values the clean sample has (almost) never seen, next to ones it sees often
+            counts = self.value_counts
+            distinct = pd.Series(pd.unique(text[~missing]), dtype=object)
+            seen = distinct.map(counts).fillna(0).to_numpy()
+            rare_values = distinct[seen <= RARE_VALUE_MAX_COUNT].to_numpy(dtype=str)
+            frequent_values = counts.index[counts >= FREQUENT_MIN_COUNT].to_numpy(dtype=str)
+            typos = rare_values[_near_frequent(rare_values, frequent_values)]
+            reasons["near_frequent"] = text.isin(set(typos)).to_numpy()
+
+            # Case / punctuation variants: flag all but the dominant clean spelling
+            if len(counts):
+                keys = pd.Series(counts.index.astype(str)).str.lower().str.replace(r"[^0-9a-z]", "", regex=True)
+                frame = pd.DataFrame({"value": counts.index.astype(str), "key": keys.to_numpy(), "count": counts.to_numpy()})
+                frame = frame[frame["key"] != ""]
+                dominant = frame.loc[frame.groupby("key")["count"].idxmax()].set_index("key")["value"]
+                text_keys = stripped.str.lower().str.replace(r"[^0-9a-z]", "", regex=True)
+                expected = text_keys.map(dominant)
+                reasons["variant"] = (expected.notna() & (expected != text)).to_numpy()
+
+        return reasons
+
+    def predict(self, values) -> tuple:
+        """
+        Returns:
+            (flags: bool array, reasons: {check: bool array})
+        """
+        text = self._text(values)
+        stripped = text.str.strip()
+        missing = (stripped.str.lower().isin(MISSING_TOKENS)).to_numpy()
+        known = self.knowledge
+        known_clean = text.isin(known.known_clean).to_numpy()
+        patterns = value_patterns(text)
+        reasons: Dict[str, np.ndarray] = {}
+
+        if known.known_dirty:
+            reasons["known_dirty"] = text.isin(known.known_dirty).to_numpy()
+        if known.known_dirty and known.known_clean:
+            # Shapes of known dirty values that use a character class or symbol no clean value uses
+            # ("12.0 oz." next to "12.0", "256/386/4556" next to "256-386-4556")
+            clean_symbols = set("".join(value_patterns(pd.Series(sorted(known.known_clean))))) - {"+"}
+            bad_shapes = {
+                shape for shape in value_patterns(pd.Series(sorted(known.known_dirty)))
+                if set(shape) - {"+"} - clean_symbols
+            }
+            reasons["dirty_pattern"] = patterns.isin(bad_shapes).to_numpy() & ~missing
+
+        for rx in known.regexes:
+            try:
+                ok = stripped.str.fullmatch(rx).fillna(False).to_numpy(dtype=bool)
+            except re.error:
+                continue
+            reasons["rule"] = reasons.get("rule", np.zeros(len(text), dtype=bool)) | (~ok & ~missing)
+
+        if self.rows < MIN_CLEAN_VALUES:
+            # Nothing to tell a normal cell by; don't let unjudged cells skip repair
+            reasons["unchecked"] = np.ones(len(text), dtype=bool)
+        else:
+            reasons.update(self._compare_with_clean(text, stripped, missing, patterns))
+
+        flags = np.zeros(len(text), dtype=bool)
+        for mask in reasons.values():
+            flags |= mask
+        flags &= ~known_clean
+        return flags, reasons
+
+
+def detect_cells(
+    column: str, values: list, index_names: Optional[List[str]] = None, clean_sample: Optional[list] = None,
+) -> np.ndarray:
+    """Flag suspicious cells against what the indexes' KB (and an optional clean sample) say about the column."""
+    knowledge = knowledge_from_indexes(column, index_names) if index_names else None
+    flags, _ = ColumnDetector(knowledge).fit(clean_sample or []).predict(values)
+    return flags
+
+
+# ---------- Evaluation against testdata/<dataset>/clean.csv ----------
+def _align(dirty: pd.DataFrame, clean: pd.DataFrame) -> pd.DataFrame:
+    """Clean frame with the dirty frame's column names and row count."""
+    if dirty.shape[1] == clean.shape[1]:
+        clean = clean.set_axis(dirty.columns, axis=1)
+    else:
+        by_name = {_normalize_name(c): c for c in clean.columns}
+        missing = [c for c in dirty.columns if _normalize_name(c) not in by_name]
+        if missing:
+            raise ValueError(f"cannot align columns with clean.csv: {missing}")
+        clean = clean[[by_name[_normalize_name(c)] for c in dirty.columns]].set_axis(dirty.columns, axis=1)
+    rows = min(len(dirty), len(clean))
+    return clean.iloc[:rows].reset_index(drop=True)
+
+
+def _scores(flags: np.ndarray, truth: np.ndarray) -> Dict[str, Any]:
+    tp = int((flags & truth).sum())
+    precision = tp / int(flags.sum()) if flags.sum() else 0.0
+    recall = tp / int(truth.sum()) if truth.sum() else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "flagged": int(flags.sum()),
+        "errors": int(truth.sum()),
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(f1, 4),
+    }
+
+
+def evaluate_detection(
+    dataset: str,
+    history_paths: Optional[List[str]] = None,
+    index_names: Optional[List[str]] = None,
+    root: str = TESTDATA_DIR,
+    clean_sample: float = EVAL_CLEAN_SAMPLE,
+) -> Dict[str, Any]:
+    """
+    Precision/recall of the detector on testdata/<dataset>/dirty.csv,
+    with errors defined as cells that differ from clean.csv.
+    Args:
+        dataset: Folder under root holding dirty.csv and clean.csv.
+        history_paths: KB JSONL files (history logs, rules) to learn from.
+        index_names: Indexes to learn from instead of / besides files.
+        clean_sample: Share of rows (drawn with a fixed seed) whose clean.csv values are
+            the detector's clean sample; those rows are left out of the scores. 0 learns from the KB alone.
+    Returns:
+        {"status", "overall", "columns": {col: scores + "checks"}, "gated_share", "sample_rows"}
+    """
+    try:
+        if not 0 <= clean_sample < 1:
+            return {"status": "fail", "message": "clean_sample must be in [0, 1)"}
+        folder = os.path.join(root, dataset)
+        dirty = pd.read_csv(os.path.join(folder, "dirty.csv"), dtype=str, keep_default_na=False)
+        clean = _align(dirty, pd.read_csv(os.path.join(folder, "clean.csv"), dtype=str, keep_default_na=False))
+        dirty = dirty.iloc[:len(clean)]
+        sampled = np.random.default_rng(0).random(len(clean)) < clean_sample
+        sample = clean[sampled]
+        clean, dirty = clean[~sampled], dirty[~sampled]
+
+        columns, all_flags, all_truth = {}, [], []
+        for col in dirty.columns:
+            knowledge = ColumnKnowledge()
+            if history_paths:
+                knowledge = knowledge_from_files(col, history_paths)
+            if index_names:
+                knowledge.merge(knowledge_from_indexes(col, index_names))
+            values = dirty[col]
+            flags, reasons = ColumnDetector(knowledge).fit(sample[col]).predict(values)
+            truth = (values.to_numpy() != clean[col].to_numpy())
+            columns[col] = {**_scores(flags, truth), "checks": {k: int(v.sum()) for k, v in reasons.items() if v.any()}}
+            all_flags.append(flags)
+            all_truth.append(truth)
+
+        flags, truth = np.concatenate(all_flags), np.concatenate(all_truth)
+        return {
+            "status": "success",
+            "dataset": dataset,
+            "cells": int(len(flags)),
+            "gated_share": round(float(flags.mean()), 4) if len(flags) else 0.0,
+            "sample_rows": int(sampled.sum()),
+            "overall": _scores(flags, truth),
+            "columns": columns,
+        }
+    except Exception as e:
+        print("ERROR in evaluate_detection:", e)
+        return {"status": "fail", "message": str(e)}
@@ -1,9 +1,94 @@
+import os
+import hashlib
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable
 import random
 
+from core.retrieval_cache import LRUCache
+from core.domain_kb.profile import profile_columns, format_profile
+
+# Max number of columns whose rules are generated concurrently
+RULEGEN_MAX_WORKERS = int(os.getenv("RULEGEN_MAX_WORKERS", "8"))
+RULE_CACHE_SIZE = int(os.getenv("RULE_CACHE_SIZE", "5000"))
+
+# Generated rules keyed by (table, column, sample fingerprint, model)
+_rule_cache = LRUCache(RULE_CACHE_SIZE)
+
 # Step 1: Stratified Sampling
+class StratifiedReservoir:
+    """
+    Streaming stratified sampler with memory proportional to the sample.
+
+    Every row gets a uniform random key. A row is kept if its key is below
+    ``frac`` (proportional share of every stratum), if it has the smallest key
+    in its stratum (at least one row per stratum), or if it is among the
+    ``min_rows`` smallest keys overall (top-up for small inputs). All three
+    sets are maintained with vectorized ops per chunk.
+    """
+
+    def __init__(self, frac: float = 0.1, min_rows: int = 100, stratify_cols: List[str] = None, seed: int = 42):
+        self.frac = frac
+        self.min_rows = min_rows
+        self.stratify_cols = stratify_cols or []
+        self.rng = np.random.default_rng(seed)
+        self.kept = None
+        self.rows_seen = 0
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        # idxmin / nsmallest below give labels, used as positions: work on a RangeIndex
+        chunk = chunk.reset_index(drop=True).assign(
+            _key=self.rng.random(len(chunk)),
+            _row=np.arange(self.rows_seen, self.rows_seen + len(chunk)),
+        )
+        if self.stratify_cols:
+            chunk["_stratum"] = pd.util.hash_pandas_object(chunk[self.stratify_cols], index=False).to_numpy()
+        else:
+            chunk["_stratum"] = 0
+        self.rows_seen += len(chunk)
+
+        candidates = chunk if self.kept is None else pd.concat([self.kept, chunk], ignore_index=True)
+        keep = candidates["_key"].to_numpy() < self.frac
+        keep[candidates.groupby("_stratum")["_key"].idxmin().to_numpy()] = True
+        keep[candidates["_key"].nsmallest(self.min_rows).index.to_numpy()] = True
+        self.kept = candidates[keep].reset_index(drop=True)
+
+    def result(self) -> pd.DataFrame:
+        if self.kept is None:
+            return pd.DataFrame()
+        kept = self.kept
+        n = max(int(self.rows_seen * self.frac), self.min_rows)
+
+        # Stratum representatives first, then the proportional share, then the top-up, each by key
+        first = np.zeros(len(kept), dtype=bool)
+        first[kept.groupby("_stratum")["_key"].idxmin().to_numpy()] = True
+        proportional = kept["_key"].to_numpy() < self.frac
+        priority = np.where(first, 0, np.where(proportional, 1, 2))
+        base = int((priority < 2).sum())
+        limit = min(n, max(base, self.min_rows))
+
+        order = np.lexsort((kept["_key"].to_numpy(), priority))[:limit]
+        sampled = kept.iloc[order].sort_values("_row")
+        return sampled.set_index("_row").rename_axis(None).drop(columns=["_key", "_stratum"])
+
+
+# Only columns with at most this many distinct values are used as strata
+STRATIFY_MAX_CARDINALITY = int(os.getenv("STRATIFY_MAX_CARDINALITY", "50"))
+SAMPLE_CHUNKSIZE = int(os.getenv("SAMPLE_CHUNKSIZE", "50000"))
+
+
+def bounded_strata_columns(df: pd.DataFrame, stratify_cols: List[str] = None, max_cardinality: int = STRATIFY_MAX_CARDINALITY) -> List[str]:
+    """Pick categorical columns (or the requested ones) whose cardinality is bounded."""
+    if stratify_cols is None:
+        stratify_cols = df.select_dtypes(include=['object', 'category', 'string']).columns.tolist()
+    stratify_cols = [c for c in stratify_cols if c in df.columns]
+    if not stratify_cols:
+        return []
+    distinct = df[stratify_cols].nunique(dropna=False)
+    return [c for c in stratify_cols if distinct[c] <= max_cardinality]
+
+
 def stratified_sample(df: pd.DataFrame, frac: float = 0.1, min_rows: int = 100, stratify_cols: List[str] = None) -> pd.DataFrame:
     """
     Perform stratified sampling on the dataframe.
@@ -11,53 +96,114 @@ def stratified_sample(df: pd.DataFrame, frac: float = 0.1, min_rows: int = 100,
         df: Clean dataframe.
         frac: Fraction to sample (default 0.1).
         min_rows: Minimum number of rows (default 100).
-        stratify_cols: Columns to stratify on (categorical columns by default).
+        stratify_cols: Columns to stratify on (bounded-cardinality categorical columns by default).
     Returns:
         Sampled dataframe.
     """
-    if stratify_cols is None:
-        # Auto-detect categorical columns for stratification
-        stratify_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
-        if not stratify_cols:
-            # If no categorical columns, fallback to random sample
-            n = max(int(len(df) * frac), min_rows)
-            return df.sample(n=n, random_state=42)
-    # Use pandas groupby sample
-    grouped = df.groupby(stratify_cols, group_keys=False)
-    n = max(int(len(df) * frac), min_rows)
-    sampled = grouped.apply(lambda x: x.sample(max(1, int(np.ceil(len(x) * frac))), random_state=42))
-    if len(sampled) < min_rows:
-        # If not enough, upsample randomly
-        sampled = pd.concat([sampled, df.drop(sampled.index).sample(n=min_rows-len(sampled), random_state=42)])
-    return sampled.head(n)
+    sampler = StratifiedReservoir(frac, min_rows, bounded_strata_columns(df, stratify_cols))
+    sampler.update(df)
+    sampled = sampler.result()
+    sampled.index = df.index[sampled.index]
+    return sampled
+
+
+def stratified_sample_csv(source, frac: float = 0.1, min_rows: int = 100, stratify_cols: List[str] = None, chunksize: int = SAMPLE_CHUNKSIZE) -> pd.DataFrame:
+    """
+    Stratified sample of a CSV that is streamed in chunks, never loaded whole.
+    Args:
+        source: Path or file object of the CSV.
+        frac: Fraction to sample (default 0.1).
+        min_rows: Minimum number of rows (default 100).
+        stratify_cols: Columns to stratify on; strata are chosen from the first chunk.
+        chunksize: Rows per chunk.
+    Returns:
+        Sampled dataframe indexed by row number in the file.
+    """
+    sampler = None
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        if sampler is None:
+            sampler = StratifiedReservoir(frac, min_rows, bounded_strata_columns(chunk, stratify_cols))
+        sampler.update(chunk)
+    return sampler.result() if sampler is not None else pd.DataFrame()
 
 # Step 2: LLM-driven Rule Generation
-def generate_rules_with_llm(sample: pd.DataFrame, llm_func, table: str = "data") -> List[Dict[str, Any]]:
+def sample_fingerprint(prompt: str) -> str:
+    """Fingerprint of the column sample as it is shown to the LLM."""
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+
+
+def run_rule_prompts(
+    table: str,
+    prompts: Dict[str, str],
+    llm_func: Callable[[str], str],
+    model: str = "default",
+    max_workers: int = RULEGEN_MAX_WORKERS,
+) -> Dict[str, Any]:
+    """
+    Ask the LLM for one rule per column, concurrently and through the rule cache.
+    Args:
+        table: Table name (part of the cache key).
+        prompts: {column: prompt}.
+        llm_func: Function to call LLM, should accept prompt and return result.
+        model: Model name (part of the cache key).
+        max_workers: Max number of concurrent LLM calls.
+    Returns:
+        {column: rule} for successful calls and {column: Exception} for failed
+        ones; failures are not cached.
+    """
+    results = {}
+    pending = {}
+    for col, prompt in prompts.items():
+        key = (table, col, sample_fingerprint(prompt), model)
+        cached = _rule_cache.get(key)
+        if cached is not None:
+            results[col] = cached
+        else:
+            pending[col] = (key, prompt)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as pool:
+            futures = {col: pool.submit(llm_func, prompt) for col, (_, prompt) in pending.items()}
+            for col, future in futures.items():
+                try:
+                    results[col] = future.result()
+                    _rule_cache.put(pending[col][0], results[col])
+                except Exception as e:
+                    results[col] = e
+    return results
+
+
+def generate_rules_with_llm(sample: pd.DataFrame, llm_func, table: str = "data", model: str = "default") -> List[Dict[str, Any]]:
     """
     Use LLM to generate rules for each column.
     Args:
         sample: Sampled dataframe.
         llm_func: Function to call LLM, should accept prompt and return result.
         table: Table name for the rules.
+        model: Name of the model behind llm_func (used for caching).
     Returns:
         List of rule dicts with format: {"id", "table", "column", "domain_rule"}
     """
+    # A compact column profile replaces raw values in the prompt
+    profiles = profile_columns(sample)
+    prompts = {
+        col: f"Analyze the following profile of column '{col}' and generate a concise domain rule for format, units, valid ranges, canonical forms, and domain constraints. Profile: {format_profile(col, profiles[col])}"
+        for col in sample.columns
+    }
+    generated = run_rule_prompts(table, prompts, llm_func, model)
+
     rules = []
-    rule_id = 1
-    for col in sample.columns:
-        prompt = f"Analyze the following values for column '{col}' and generate a concise domain rule for format, units, valid ranges, canonical forms, and domain constraints. Values: {sample[col].dropna().head(10).tolist()}"
-        try:
-            domain_rule = llm_func(prompt)
-        except:
+    for rule_id, col in enumerate(sample.columns, 1):
+        domain_rule = generated[col]
+        if isinstance(domain_rule, Exception):
             domain_rule = f"Column '{col}' requires valid data in appropriate format"
-        
+
         rules.append({
             "id": str(rule_id),
             "table": table,
             "column": col,
             "domain_rule": domain_rule
         })
-        rule_id += 1
     return rules
 
 # Step 3: Human Review is handled via API/frontend, not in backend logic
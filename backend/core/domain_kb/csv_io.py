@@ -0,0 +1,103 @@
+import os
+import hashlib
+import pandas as pd
+from typing import List, Optional
+
+from core.retrieval_cache import LRUCache
+
+# "pyarrow" switches whole-file reads to the multithreaded Arrow CSV parser
+CSV_ENGINE = os.getenv("CSV_ENGINE", "c")
+FRAME_CACHE_SIZE = int(os.getenv("FRAME_CACHE_SIZE", "16"))
+# Memory budget of the cached frames (deep size); larger frames are parsed but not cached
+FRAME_CACHE_BYTES = int(os.getenv("FRAME_CACHE_BYTES", str(256 << 20)))
+READ_CHUNKSIZE = int(os.getenv("READ_CHUNKSIZE", "10000"))
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+# Parsed (projected) frames keyed by (content hash, columns, n_rows, dropna)
+_frames = LRUCache(FRAME_CACHE_SIZE, max_bytes=FRAME_CACHE_BYTES, sizeof=frame_bytes)
+
+
+def content_hash(fileobj, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a seekable file object, read in blocks; leaves it rewound."""
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(block_size), b""):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def read_csv_header(fileobj) -> List[str]:
+    fileobj.seek(0)
+    header = pd.read_csv(fileobj, nrows=0).columns.tolist()
+    fileobj.seek(0)
+    return header
+
+
+def _engine(engine: Optional[str]) -> str:
+    engine = engine or CSV_ENGINE
+    if engine == "pyarrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return "c"
+    return engine
+
+
+def read_csv_upload(
+    fileobj,
+    columns: Optional[List[str]] = None,
+    n_rows: Optional[int] = None,
+    dropna: bool = False,
+    engine: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Read an uploaded CSV reading only what the caller needs.
+    Args:
+        fileobj: Seekable file object (e.g. UploadFile.file, a spooled temp file).
+        columns: Columns to parse (default all); unknown names are ignored.
+        n_rows: Stop once this many rows are collected (default all).
+        dropna: Count only rows without nulls in the selected columns towards n_rows.
+        engine: pandas CSV engine (default CSV_ENGINE); pyarrow is used for whole-file reads only.
+    Returns:
+        Parsed dataframe. Identical uploads are served from a parsed-frame cache.
+    """
+    key = (content_hash(fileobj), tuple(columns) if columns else None, n_rows, dropna)
+    cached = _frames.get(key)
+    if cached is not None:
+        return cached.copy()
+
+    usecols = None
+    if columns:
+        header = set(read_csv_header(fileobj))
+        usecols = [c for c in columns if c in header]
+
+    if n_rows is None:
+        df = pd.read_csv(fileobj, usecols=usecols, engine=_engine(engine))
+        if dropna:
+            df = df.dropna()
+    else:
+        # Chunked read so we stop as soon as enough rows are collected
+        parts, collected = [], 0
+        with pd.read_csv(fileobj, usecols=usecols, chunksize=READ_CHUNKSIZE) as reader:
+            for chunk in reader:
+                if dropna:
+                    chunk = chunk.dropna()
+                parts.append(chunk.head(n_rows - collected))
+                collected += len(parts[-1])
+                if collected >= n_rows:
+                    break
+        if not parts:
+            fileobj.seek(0)
+            parts = [pd.read_csv(fileobj, usecols=usecols, nrows=0)]
+        df = pd.concat(parts)
+    fileobj.seek(0)
+
+    if usecols is not None:
+        df = df[usecols]  # keep the requested column order
+    _frames.put(key, df)
+    return df.copy()
@@ -0,0 +1,85 @@
+import pandas as pd
+from typing import List, Dict, Any
+
+# Number of frequent values / patterns kept per column
+PROFILE_TOP_K = 5
+
+
+def value_patterns(values: pd.Series) -> pd.Series:
+    """
+    Map values to character-class shapes: uppercase -> A, lowercase -> a,
+    digit -> 9, runs collapsed to "+" (e.g. "12.0 oz." -> "9+.9 a+.").
+    """
+    return (
+        # Python regexes: Arrow-backed strings (pandas 3 with pyarrow) reject the backreference below
+        values.astype(str).astype(object)
+        .str.replace(r"[A-Z]", "A", regex=True)
+        .str.replace(r"[a-z]", "a", regex=True)
+        .str.replace(r"[0-9]", "9", regex=True)
+        .str.replace(r"(.)\1+", r"\1+", regex=True)
+    )
+
+
+def profile_columns(df: pd.DataFrame, columns: List[str] = None, top_k: int = PROFILE_TOP_K) -> Dict[str, Dict[str, Any]]:
+    """
+    Compute a compact statistical profile for each column.
+    Args:
+        df: Dataframe to profile.
+        columns: Columns to profile (default all).
+        top_k: Number of frequent values and patterns to keep.
+    Returns:
+        {column: {"dtype", "rows", "null_rate", "distinct", "top_values",
+                  "patterns", "length", "numeric"}}
+    """
+    columns = list(df.columns) if columns is None else columns
+    frame = df[columns]
+    # Whole-frame reductions first, then per-column string work on non-null values only
+    null_rates = (frame.isna() | frame.astype(str).apply(lambda s: s.str.strip() == "")).mean()
+    distinct = frame.nunique(dropna=True)
+
+    profiles = {}
+    for col in columns:
+        values = frame[col].dropna()
+        text = values.astype(str)
+        total = max(len(text), 1)
+
+        top_values = text.value_counts().head(top_k)
+        patterns = value_patterns(text).value_counts().head(top_k)
+        lengths = text.str.len()
+        numbers = pd.to_numeric(values, errors="coerce").dropna()
+
+        profiles[col] = {
+            "dtype": str(frame[col].dtype),
+            "rows": int(len(frame)),
+            "null_rate": float(null_rates[col]),
+            "distinct": int(distinct[col]),
+            "top_values": [(v, round(c / total, 3)) for v, c in top_values.items()],
+            "patterns": [(p, round(c / total, 3)) for p, c in patterns.items()],
+            "length": (int(lengths.min()), int(lengths.max()), round(float(lengths.mean()), 1)) if len(lengths) else None,
+            "numeric": (
+                {"share": round(len(numbers) / total, 3), "min": float(numbers.min()), "max": float(numbers.max())}
+                if len(numbers) else None
+            ),
+        }
+    return profiles
+
+
+def format_profile(col: str, profile: Dict[str, Any]) -> str:
+    """Render a column profile as one compact line for an LLM prompt."""
+    parts = [
+        f"column: {col}",
+        f"dtype: {profile['dtype']}",
+        f"nulls: {profile['null_rate']:.0%}",
+        f"distinct: {profile['distinct']}/{profile['rows']}",
+    ]
+    if profile["top_values"]:
+        parts.append("top values: " + ", ".join(f"{v!r} ({s:.0%})" for v, s in profile["top_values"]))
+    if profile["patterns"]:
+        parts.append("patterns: " + ", ".join(f"{p!r} ({s:.0%})" for p, s in profile["patterns"]))
+    if profile["length"]:
+        lo, hi, mean = profile["length"]
+        parts.append(f"length: {lo}-{hi} (mean {mean})")
+    if profile["numeric"]:
+        n = profile["numeric"]
+        parts.append(f"numeric: {n['share']:.0%} in [{n['min']:g}, {n['max']:g}]")
+    return " | ".join(parts)
@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Optional
+
+from core.index import build_payload, row_to_sentence, embed_lines, _ensure_collection, _upload_points, _delete_points, _delete_source
+from core.domain_kb.construct import save_rules, load_rules
+from core.shared_state import file_lock, state_path
+
+RULES_DIR = os.getenv("RULES_DIR", "testdata/knowledge_base")
+# Index that receives a dataset's saved rules
+RULE_INDEX_TEMPLATE = os.getenv("RULE_INDEX_TEMPLATE", "domain_kb_{dataset}")
+
+
+def rule_key(rule: Dict[str, Any]) -> str:
+    """Stable identity of a rule: its id, else its (table, column)."""
+    if rule.get("id") not in (None, ""):
+        return str(rule["id"])
+    return f"{rule.get('table')}:{rule.get('column')}"
+
+
+def _digest(rules: List[Dict[str, Any]]) -> str:
+    return hashlib.sha256(json.dumps(rules, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class RuleStore:
+    """
+    Domain-KB rules on disk with an mtime-validated in-memory cache.
+
+    Every save appends a version record (added / changed / removed rule keys)
+    to ``domain_kb_<dataset>.versions.jsonl`` and pushes only the delta into
+    the dataset's KB index.
+    """
+
+    def __init__(self, root: str = RULES_DIR):
+        self.root = root
+        self.lock = threading.Lock()
+        self._cache: Dict[str, tuple] = {}  # dataset -> (mtime_ns, size, rules)
+
+    def path(self, dataset: str) -> str:
+        return os.path.join(self.root, f"domain_kb_{dataset}.jsonl")
+
+    def versions_path(self, dataset: str) -> str:
+        return os.path.join(self.root, f"domain_kb_{dataset}.versions.jsonl")
+
+    def lock_path(self, dataset: str) -> str:
+        return state_path(RULE_INDEX_TEMPLATE.format(dataset=dataset), "rules.lock")
+
+    def exists(self, dataset: str) -> bool:
+        return os.path.exists(self.path(dataset))
+
+    def load(self, dataset: str) -> List[Dict[str, Any]]:
+        """Return the saved rules, rereading the file only if it changed on disk."""
+        path = self.path(dataset)
+        stat = os.stat(path)
+        with self.lock:
+            cached = self._cache.get(dataset)
+            if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+                cached = (stat.st_mtime_ns, stat.st_size, load_rules(path))
+                self._cache[dataset] = cached
+            return [dict(r) for r in cached[2]]
+
+    def history(self, dataset: str) -> List[Dict[str, Any]]:
+        path = self.versions_path(dataset)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def save(self, dataset: str, rules: List[Dict[str, Any]], sync_index: bool = True) -> Dict[str, Any]:
+        """
+        Save rules as a new version and sync the delta into the KB index.
+        Args:
+            dataset: Dataset name.
+            rules: Full reviewed rule list.
+            sync_index: Push added/changed/removed rules into the dataset's index.
+        Returns:
+            {"path", "version", "added", "changed", "removed", "index_sync"}
+        Raises:
+            ValueError: if two rules share an id (or, without ids, a table and column);
+                they would collapse into one point and one version entry.
+        """
+        keys = [rule_key(r) for r in rules]
+        duplicates = sorted(k for k, n in Counter(keys).items() if n > 1)
+        if duplicates:
+            raise ValueError(f"duplicate rule ids: {duplicates}")
+        # Version number, delta and versions.jsonl append must see every other save, in any worker
+        with file_lock(self.lock_path(dataset)):
+            old = {rule_key(r): r for r in self.load(dataset)} if self.exists(dataset) else {}
+            new = dict(zip(keys, rules))
+            added = [k for k in new if k not in old]
+            changed = [k for k in new if k in old and old[k] != new[k]]
+            removed = [k for k in old if k not in new]
+
+            history = self.history(dataset)
+            version = history[-1]["version"] + 1 if history else 1
+
+            path = self.path(dataset)
+            save_rules(rules, path)
+
+            result = {
+                "path": path,
+                "version": version,
+                "added": len(added),
+                "changed": len(changed),
+                "removed": len(removed),
+            }
+            synced = False
+            if sync_index:
+                # Push every rule if the index has never been synced (or the last sync failed);
+                # otherwise only the delta
+                full_sync = not history or not history[-1].get("index_synced", False)
+                upserts = list(new.values()) if full_sync else [new[k] for k in added + changed]
+                try:
+                    result["index_sync"] = sync_rules_to_index(
+                        dataset, upserts, removed, full_sync=full_sync,
+                        positions={k: i for i, k in enumerate(new)},
+                    )
+                    synced = True
+                except Exception as e:
+                    # Rules are saved either way; the next save does a full sync
+                    print("ERROR syncing rules to index:", e)
+                    result["index_sync"] = {"status": "fail", "message": str(e)}
+
+            with open(self.versions_path(dataset), "a") as f:
+                f.write(json.dumps({
+                    "version": version,
+                    "saved_at": time.time(),
+                    "count": len(rules),
+                    "sha256": _digest(rules),
+                    "added": added,
+                    "changed": changed,
+                    "removed": removed,
+                    "index_synced": synced,
+                }, ensure_ascii=False) + "\n")
+        return result
+
+
+def rule_point_id(index_name: str, key: str) -> str:
+    # Deterministic ids make re-saving a rule an overwrite, not a duplicate
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{index_name}/rule/{key}"))
+
+
+def sync_rules_to_index(
+    dataset: str,
+    upserts: List[Dict[str, Any]],
+    removed_keys: List[str],
+    full_sync: bool = False,
+    positions: Optional[Dict[str, int]] = None,
+) -> Dict[str, Any]:
+    """
+    Embed and upsert added/changed rules and delete removed ones.
+
+    A full sync first drops every rule point that came from the rules file,
+    including ones uploaded by hand before the store managed it.
+    """
+    index_name = RULE_INDEX_TEMPLATE.format(dataset=dataset)
+    source = os.path.basename(rule_store.path(dataset))
+    positions = positions or {}
+
+    _ensure_collection(index_name)
+    if full_sync:
+        _delete_source(index_name, source, doc_type="rule")
+
+    if upserts:
+        lines = [row_to_sentence(r) for r in upserts]
+        _upload_points(
+            index_name,
+            [rule_point_id(index_name, rule_key(rule)) for rule in upserts],
+            embed_lines(lines),
+            [build_payload(rule, line, source, positions.get(rule_key(rule), 0)) for rule, line in zip(upserts, lines)],
+        )
+
+    _delete_points(index_name, [rule_point_id(index_name, k) for k in removed_keys])
+    return {"status": "success", "index_name": index_name, "upserted": len(upserts), "deleted": len(removed_keys)}
+
+
+rule_store = RuleStore()
@@ -0,0 +1,164 @@
+import os
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from core.detect import MISSING_TOKENS
+
+# A pivot determines the target if, over its repeated values, this share of rows agrees with the group majority
+FD_MIN_STRENGTH = float(os.getenv("FD_MIN_STRENGTH", "0.9"))
+# Per cell: the group needs this many rows and this majority share before it overrides the LLM
+FD_MIN_SUPPORT = int(os.getenv("FD_MIN_SUPPORT", "3"))
+FD_MIN_CONFIDENCE = float(os.getenv("FD_MIN_CONFIDENCE", "0.7"))
+
+
+def _text(values) -> pd.Series:
+    text = pd.Series(values, dtype=object).reset_index(drop=True)
+    return text.where(text.notna(), "").astype(str)
+
+
+def _present(text: pd.Series) -> pd.Series:
+    return ~text.str.strip().str.lower().isin(MISSING_TOKENS)
+
+
+class DependencyRepairer:
+    """
+    Approximate functional dependencies pivot -> target, repaired by group majority.
+
+    ``partial_fit`` accumulates (pivot value, target value) counts per pivot
+    column, chunk by chunk. A pivot column is a dependency if rows sharing a
+    pivot value mostly share the target value (FD_MIN_STRENGTH). ``predict``
+    then gives each cell the majority target value of its pivot group, with
+    confidence = majority share, whenever the group is large and one-sided
+    enough; the most confident dependency wins.
+    """
+
+    def __init__(self, pivot_names: List[str]):
+        self.pivot_names = list(pivot_names)
+        self.pair_counts: Dict[str, Optional[pd.Series]] = {name: None for name in self.pivot_names}
+        self._tables: Optional[Dict[str, pd.DataFrame]] = None
+
+    def partial_fit(self, target_values, pivot_rows) -> "DependencyRepairer":
+        """
+        Args:
+            target_values: Target cells.
+            pivot_rows: One list of pivot values per target cell (pivot_data "values").
+        """
+        target = _text(target_values)
+        pivots = pd.DataFrame(list(pivot_rows), columns=self.pivot_names)
+        for name in self.pivot_names:
+            pivot = _text(pivots[name])
+            keep = (_present(pivot) & _present(target)).to_numpy()
+            counts = pd.DataFrame({"pivot": pivot[keep], "target": target[keep]}).groupby(["pivot", "target"]).size()
+            previous = self.pair_counts[name]
+            self.pair_counts[name] = counts if previous is None else previous.add(counts, fill_value=0)
+        self._tables = None
+        return self
+
+    def fit(self, target_values, pivot_rows) -> "DependencyRepairer":
+        return self.partial_fit(target_values, pivot_rows)
+
+    def dependencies(self) -> Dict[str, Dict[str, float]]:
+        """Strength and coverage of every pivot column that passes FD_MIN_STRENGTH."""
+        return {name: stats for name, (stats, _) in self._fit_tables().items()}
+
+    def _fit_tables(self) -> Dict[str, tuple]:
+        if self._tables is not None:
+            return self._tables
+        tables = {}
+        for name, counts in self.pair_counts.items():
+            if counts is None or counts.empty:
+                continue
+            by_pivot = counts.groupby(level="pivot")
+            support = by_pivot.sum()
+            top = by_pivot.max()
+            repeated = support >= 2
+            if not repeated.any():
+                continue
+            strength = float(top[repeated].sum() / support[repeated].sum())
+            if strength < FD_MIN_STRENGTH:
+                continue
+            majority = by_pivot.idxmax().map(lambda key: key[1])
+            table = pd.DataFrame({"value": majority, "support": support, "confidence": top / support})
+            table = table[(table["support"] >= FD_MIN_SUPPORT) & (table["confidence"] >= FD_MIN_CONFIDENCE)]
+            stats = {"strength": round(strength, 4), "coverage": round(float(support[repeated].sum() / support.sum()), 4)}
+            tables[name] = (stats, table)
+        self._tables = tables
+        return tables
+
+    def predict(self, pivot_rows) -> pd.DataFrame:
+        """
+        Returns:
+            DataFrame aligned with pivot_rows: value, confidence, support, pivot
+            (NaN / None where no dependency determines the cell).
+        """
+        pivots = pd.DataFrame(list(pivot_rows), columns=self.pivot_names)
+        n = len(pivots)
+        result = pd.DataFrame({
+            "value": pd.Series([None] * n, dtype=object),
+            "confidence": np.full(n, np.nan),
+            "support": np.zeros(n, dtype=np.int64),
+            "pivot": pd.Series([None] * n, dtype=object),
+        })
+        for name, (_, table) in self._fit_tables().items():
+            if table.empty:
+                continue
+            hit = _text(pivots[name]).map(table["confidence"])
+            better = (hit > result["confidence"].fillna(-1)).to_numpy()
+            if not better.any():
+                continue
+            keys = _text(pivots[name])[better]
+            result.loc[better, "value"] = keys.map(table["value"]).to_numpy()
+            result.loc[better, "confidence"] = hit[better].to_numpy()
+            result.loc[better, "support"] = keys.map(table["support"]).to_numpy().astype(np.int64)
+            result.loc[better, "pivot"] = name
+        return result
+
+
+def repair_by_dependencies(target_values: list, pivot_names: List[str], pivot_rows: list,
+                           repairer: Optional[DependencyRepairer] = None) -> pd.DataFrame:
+    """Fit on the given rows (unless a fitted repairer is passed) and predict them."""
+    if repairer is None:
+        repairer = DependencyRepairer(pivot_names).fit(target_values, pivot_rows)
+    return repairer.predict(pivot_rows)
+
+
+def evaluate_dependencies(dataset: str, target: str, pivots: List[str], root: str = "testdata") -> Dict[str, Any]:
+    """
+    Accuracy of dependency repair for one column of testdata/<dataset>/dirty.csv
+    against clean.csv: how many cells it determines, and how many of those end
+    up equal to the clean value.
+    """
+    from core.detect import _align
+
+    try:
+        folder = os.path.join(root, dataset)
+        dirty = pd.read_csv(os.path.join(folder, "dirty.csv"), dtype=str, keep_default_na=False)
+        clean = _align(dirty, pd.read_csv(os.path.join(folder, "clean.csv"), dtype=str, keep_default_na=False))
+        dirty = dirty.iloc[:len(clean)]
+        missing = [c for c in [target, *pivots] if c not in dirty.columns]
+        if missing:
+            return {"status": "fail", "message": f"columns not in dirty.csv: {missing}"}
+
+        pivot_rows = list(dirty[pivots].itertuples(index=False, name=None))
+        repairer = DependencyRepairer(pivots).fit(dirty[target], pivot_rows)
+        predicted = repairer.predict(pivot_rows)
+        determined = predicted["pivot"].notna().to_numpy()
+        truth = clean[target].to_numpy()
+        dirty_values = dirty[target].to_numpy()
+        errors = dirty_values != truth
+        correct = determined & (predicted["value"].to_numpy() == truth)
+        return {
+            "status": "success",
+            "cells": int(len(truth)),
+            "errors": int(errors.sum()),
+            "dependencies": repairer.dependencies(),
+            "determined": int(determined.sum()),
+            "determined_correct": int(correct.sum()),
+            "errors_fixed": int((correct & errors).sum()),
+            "errors_introduced": int((determined & ~correct & ~errors).sum()),
+        }
+    except Exception as e:
+        print("ERROR in evaluate_dependencies:", e)
+        return {"status": "fail", "message": str(e)}
@@ -0,0 +1,225 @@
+import os
+import time
+import uuid
+import threading
+from typing import List, Dict, Any, Optional
+
+from qdrant_client import models
+
+from core import qdrant_client
+from core.index import build_payload, row_to_sentence, embed_lines, _ensure_collection, _upload_points
+from core.local_index import get_local_index
+from core.layout import physical_name, tenant_filter
+from core.shared_state import file_lock, state_path
+
+FEEDBACK_FLUSH_SIZE = int(os.getenv("FEEDBACK_FLUSH_SIZE", "64"))
+FEEDBACK_FLUSH_INTERVAL = float(os.getenv("FEEDBACK_FLUSH_INTERVAL", "30"))
+# Failed flushes a mapping survives before it is dropped (and counted in "dropped")
+FEEDBACK_MAX_RETRIES = int(os.getenv("FEEDBACK_MAX_RETRIES", "5"))
+# Source name of feedback points; "history" in it marks them as history-log evidence
+FEEDBACK_SOURCE = "history_log_feedback"
+
+
+def feedback_point_id(index_name: str, mapping: tuple) -> str:
+    # One point per (table, column, dirty, clean) mapping, however often it is accepted
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{index_name}/feedback/" + "\x1f".join(map(str, mapping))))
+
+
+def _field_is(key: str, value) -> models.Condition:
+    # Null fields are left out of compact payloads: match "missing or null", not the value None
+    if value is None:
+        return models.IsEmptyCondition(is_empty=models.PayloadField(key=key))
+    return models.FieldCondition(key=key, match=models.MatchValue(value=value))
+
+
+def _mapping_exists(index_name: str, table, column, dirty, clean) -> bool:
+    """Is this dirty -> clean mapping already in the index (from any source)?"""
+    local_index = get_local_index(index_name)
+    if local_index is not None:
+        return bool(local_index.ids_where(
+            lambda p: (p.get("column"), p.get("dirty_value"), p.get("clean_value")) == (column, dirty, clean)
+            and (table is None or p.get("table") == table)
+        ))
+    must = [_field_is("column", column), _field_is("dirty_value", dirty), _field_is("clean_value", clean)]
+    if table is not None:
+        must.append(_field_is("table", table))
+    return qdrant_client.count(
+        collection_name=physical_name(index_name),
+        count_filter=tenant_filter(index_name, models.Filter(must=must)),
+        exact=True,
+    ).count > 0
+
+
+class FeedbackBuffer:
+    """
+    Write-behind buffer turning reviewed repairs into history-log points.
+
+    Accepted repairs (and rejected ones the user corrected by hand) become
+    dirty -> clean mappings. They are held in memory, de-duplicated, and
+    flushed in embedded batches once FEEDBACK_FLUSH_SIZE mappings are pending
+    or the oldest has waited FEEDBACK_FLUSH_INTERVAL seconds. A mapping whose
+    write fails is retried on later flushes, up to max_retries times.
+    """
+
+    def __init__(
+        self,
+        flush_size: int = FEEDBACK_FLUSH_SIZE,
+        flush_interval: float = FEEDBACK_FLUSH_INTERVAL,
+        max_retries: int = FEEDBACK_MAX_RETRIES,
+    ):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending: Dict[tuple, Dict[str, Any]] = {}  # (index, table, column, dirty, clean) -> row
+        self.failures: Dict[tuple, int] = {}  # key -> failed flushes so far
+        self.oldest: Optional[float] = None
+        self.stats = {
+            "received": 0, "buffered": 0, "skipped": 0, "duplicates": 0,
+            "written": 0, "flushes": 0, "errors": 0, "dropped": 0,
+        }
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="feedback-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            with self.lock:
+                due = bool(self.pending) and (
+                    len(self.pending) >= self.flush_size
+                    or time.time() - self.oldest >= self.flush_interval
+                )
+            if due:
+                self.flush()
+
+    def add(self, index_name: str, items: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Buffer reviewed repairs.
+        Args:
+            index_name: History-log index the mappings go to.
+            items: {"table", "column", "dirty_value", "repaired_value", "accepted", "corrected_value"}
+        Returns:
+            {"buffered", "skipped", "pending"}
+        """
+        buffered = skipped = 0
+        now = time.time()
+        with self.lock:
+            for item in items:
+                clean = item.get("repaired_value") if item.get("accepted", True) else item.get("corrected_value")
+                if clean is None or clean == item.get("dirty_value"):
+                    skipped += 1  # rejected without a correction, or nothing changed
+                    continue
+                key = (index_name, item.get("table"), item.get("column"), item.get("dirty_value"), clean)
+                if key in self.pending:
+                    self.stats["duplicates"] += 1
+                    continue
+                self.pending[key] = {
+                    "table": item.get("table"),
+                    "column": item.get("column"),
+                    "dirty_value": item.get("dirty_value"),
+                    "clean_value": clean,
+                    "evidence": "user_feedback" if item.get("accepted", True) else "user_correction",
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)),
+                }
+                if self.oldest is None:
+                    self.oldest = now
+                buffered += 1
+            self.stats["received"] += len(items)
+            self.stats["buffered"] += buffered
+            self.stats["skipped"] += skipped
+            pending = len(self.pending)
+
+        self._ensure_worker()
+        if pending >= self.flush_size:
+            self._wakeup.set()
+        return {"buffered": buffered, "skipped": skipped, "pending": pending}
+
+    def flush(self) -> Dict[str, Any]:
+        """Write all pending mappings now; mappings that failed go back into the buffer."""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending, self.oldest = self.pending, {}, None
+            if not batch:
+                return {"written": 0, "duplicates": 0}
+
+            by_index: Dict[str, List[tuple]] = {}
+            for key in batch:
+                by_index.setdefault(key[0], []).append(key)
+
+            written = duplicates = 0
+            failed: List[tuple] = []
+            for index_name, keys in by_index.items():
+                # Check-then-write under a lock shared with the other workers' buffers
+                with file_lock(state_path(index_name, "feedback.lock")):
+                    done, failed_here = self._write_index(index_name, keys, batch)
+                written += done[0]
+                duplicates += done[1]
+                failed += failed_here
+
+            with self.lock:
+                failed_keys = set(failed)
+                for k in batch:
+                    if k not in failed_keys:
+                        self.failures.pop(k, None)
+                for k in failed:
+                    self.failures[k] = self.failures.get(k, 0) + 1
+                    if self.failures[k] > self.max_retries:
+                        self.failures.pop(k)
+                        self.stats["dropped"] += 1
+                        continue
+                    self.pending.setdefault(k, batch[k])
+                if self.pending and self.oldest is None:
+                    self.oldest = time.time()
+                self.stats["errors"] += len(failed)
+                self.stats["written"] += written
+                self.stats["duplicates"] += duplicates
+                self.stats["flushes"] += 1
+            return {"written": written, "duplicates": duplicates, "failed": len(failed)}
+
+    def _write_index(self, index_name: str, keys: List[tuple], batch: Dict[tuple, Dict[str, Any]]):
+        """Write one index's mappings. Returns ((written, duplicates), keys that failed)."""
+        try:
+            _ensure_collection(index_name)
+        except Exception as e:
+            print("ERROR flushing feedback:", e)
+            return (0, 0), keys
+
+        fresh, failed = [], []
+        for k in keys:
+            try:
+                if not _mapping_exists(*k):
+                    fresh.append(k)
+            except Exception as e:
+                print("ERROR checking feedback mapping:", e)
+                failed.append(k)
+        duplicates = len(keys) - len(fresh) - len(failed)
+        if not fresh:
+            return (0, duplicates), failed
+
+        rows = [batch[k] for k in fresh]
+        lines = [row_to_sentence(r) for r in rows]
+        try:
+            _upload_points(
+                index_name,
+                [feedback_point_id(index_name, k[1:]) for k in fresh],
+                embed_lines(lines),
+                [build_payload(row, line, FEEDBACK_SOURCE, i) for i, (row, line) in enumerate(zip(rows, lines))],
+            )
+        except Exception as e:
+            print("ERROR flushing feedback:", e)
+            return (0, duplicates), failed + fresh
+        return (len(rows), duplicates), failed
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"pending": len(self.pending), **self.stats}
+
+
+feedback_buffer = FeedbackBuffer()
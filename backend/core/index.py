@@ -1,21 +1,30 @@
+import os
 import time
 import json
+import numpy as np
 import pandas as pd
 from fastapi import UploadFile
 from qdrant_client import models
 from typing import List
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Any
 
 # from core import es_client  # <-- remove
 from core import qdrant_client, sentence_model
-
-
-# ---------- List indexes (Qdrant collections only) ----------
-async def get_indexes() -> dict:
+from core.local_index import get_local_index, create_local_index, drop_local_index, LOCAL_INDEX_MAX_POINTS
+from core.lexical_index import get_lexical_index, create_lexical_index, drop_lexical_index
+from core.retrieval_cache import bump_index_version
+from core.payload_store import intern_payload, get_row_store, drop_row_store
+from core.layout import (
+    physical_name, physical_ids, tenant_filter, tag_payloads,
+    index_exists, list_indexes, create_index_storage, drop_index_storage,
+)
+
+
+# ---------- List indexes (collections, or tenants of the shared collection) ----------
+def get_indexes() -> dict:
     try:
-        resp = qdrant_client.get_collections()
-        names = [c.name for c in resp.collections]
+        names = list_indexes()
         return {"status": "success", "indexes": names}
     except Exception as e:
         return {"status": "fail", "message": str(e)}
@@ -24,20 +33,16 @@ async def get_indexes() -> dict:
 
 
 # ---------- Create index (Qdrant collection) ----------
-async def create_index(index_name: str) -> dict:
+def create_index(index_name: str) -> dict:
     try:
-        if qdrant_client.collection_exists(collection_name=index_name):
+        if index_exists(index_name):
             return {"status": "fail", "message": "index already exists"}
 
-        qdrant_client.recreate_collection(
-            collection_name=index_name,
-            vectors_config=models.VectorParams(
-                size=sentence_model.get_sentence_embedding_dimension(),
-                distance=models.Distance.COSINE,
-            ),
-            # (Optional) enable payload indexing if you plan to filter by fields
-            # optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0)
-        )
+        create_index_storage(index_name, sentence_model.get_sentence_embedding_dimension())
+        # New collections start with an in-process copy; it is dropped if they outgrow it
+        create_local_index(index_name)
+        create_lexical_index(index_name)
+        bump_index_version(index_name)
         return {"status": "success"}
 
     except Exception as e:
@@ -54,27 +59,37 @@ class UpsertRequest(BaseModel):
     index_name: str
     rows: List[UpsertRow]
 
-async def upsert_rows(req: UpsertRequest) -> dict:
+class PointFilter(BaseModel):
+    table: Optional[str] = None
+    column: Optional[str] = None
+    doc_type: Optional[str] = None          # 'rule' | 'log' | 'record'
+    source: Optional[str] = None            # file the points came from (payload table_name)
+    ingested_after: Optional[float] = None  # epoch seconds, inclusive
+    ingested_before: Optional[float] = None
+
+class DeletePointsRequest(BaseModel):
+    index_name: str
+    filter: PointFilter
+
+class UpdatePointsRequest(BaseModel):
+    index_name: str
+    filter: PointFilter
+    set: Dict[str, Optional[str]]
+
+def upsert_rows(req: UpsertRequest) -> dict:
     index_name = req.index_name
     rows = [r.dict() for r in req.rows]
 
     # create collection if missing
-    if not qdrant_client.collection_exists(collection_name=index_name):
-        qdrant_client.recreate_collection(
-            collection_name=index_name,
-            vectors_config=models.VectorParams(
-                size=sentence_model.get_sentence_embedding_dimension(),
-                distance=models.Distance.COSINE,
-            ),
-        )
+    _ensure_collection(index_name)
 
-    points = []
     next_id = int(time.time() * 1e9)
 
     lines = [row_to_sentence(r) for r in rows]
-    vecs = [sentence_model.encode(t).tolist() for t in lines]
+    vecs = embed_lines(lines)
 
-    for i, (row, vec, line) in enumerate(zip(rows, vecs, lines)):
+    payloads = []
+    for i, (row, line) in enumerate(zip(rows, lines)):
         doc_type = "rule" if (row.get("domain_rule") or row.get("rule")) else "log"
         payload = {
             "values": line,
@@ -86,18 +101,336 @@ async def upsert_rows(req: UpsertRequest) -> dict:
             "clean_value": row.get("clean_value"),
             "table_name": index_name,
             "row_number": i,
+            "ingested_at": time.time(),
         }
-        points.append(models.PointStruct(id=next_id, vector=vec, payload=payload))
-        next_id += 1
+        payloads.append(payload)
+
+    _upload_points(index_name, list(range(next_id, next_id + len(rows))), vecs, payloads)
 
-    if points:
-        qdrant_client.upsert(collection_name=index_name, points=points)
+    return {"status": "success", "upserted": len(rows)}
+
+
+
+
+
+
+# --- Create a collection (with its local copies) unless it already exists ---
+def _ensure_collection(index_name: str) -> bool:
+    if index_exists(index_name):
+        return False
+    create_index_storage(index_name, sentence_model.get_sentence_embedding_dimension())
+    create_local_index(index_name)
+    create_lexical_index(index_name)
+    return True
+
+
+# --- Embed one-liners in batches straight into a float32 matrix ---
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", "64"))
+
+
+def embed_lines(lines: List[str]) -> np.ndarray:
+    if not lines:
+        return np.empty((0, sentence_model.get_sentence_embedding_dimension()), dtype=np.float32)
+    return np.asarray(
+        sentence_model.encode(lines, batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True),
+        dtype=np.float32,
+    )
+
+
+# --- Write columnar points (ids, vector matrix, payloads) and keep the in-process copies in step ---
+UPLOAD_BATCH_SIZE = int(os.getenv("UPLOAD_BATCH_SIZE", "256"))
+# Cap on the serialized size of one upload request
+UPLOAD_BATCH_BYTES = int(os.getenv("UPLOAD_BATCH_BYTES", str(8 << 20)))
+UPLOAD_PARALLEL = int(os.getenv("UPLOAD_PARALLEL", "1"))
+
+
+def _upload_batch_size(vectors: np.ndarray, payloads: List[dict]) -> int:
+    # Vectors go over the wire as JSON floats (~10 bytes each); payload size sampled
+    sample = payloads[:64]
+    payload_bytes = len(json.dumps(sample, ensure_ascii=False, default=str)) / len(sample)
+    point_bytes = vectors.shape[1] * 10 + payload_bytes
+    return max(1, min(UPLOAD_BATCH_SIZE, int(UPLOAD_BATCH_BYTES // point_bytes)))
+
+
+def _upload_points(index_name: str, ids: list, vectors, payloads: List[dict]) -> None:
+    _write_points(index_name, physical_ids(index_name, ids), vectors, payloads)
+
+
+# ids here are already as stored in Qdrant (e.g. read back by a scroll)
+def _write_points(index_name: str, ids: list, vectors, payloads: List[dict]) -> None:
+    if len(ids) == 0:
+        return
+    vectors = np.asarray(vectors, dtype=np.float32)
+    payloads = tag_payloads(index_name, payloads)
+    # The store gets the compact layout; the in-process copies keep full payloads
+    stored = payloads
+    if PAYLOAD_LAYOUT == "compact":
+        # Row extras go to the side store first, so no reader sees a marker without its row
+        stored = _offload_row_extra(index_name, ids, [compact_payload(p) for p in payloads])
+    # upload_collection slices the matrix itself; no per-point objects or tolist() here
+    qdrant_client.upload_collection(
+        collection_name=physical_name(index_name),
+        vectors=vectors,
+        payload=stored,
+        ids=ids,
+        batch_size=_upload_batch_size(vectors, stored),
+        parallel=UPLOAD_PARALLEL,
+        wait=True,
+    )
+    # Invalidate cached retrieval results for this index
+    bump_index_version(index_name)
+
+    local_index = get_local_index(index_name, include_building=True)
+    if local_index is not None:
+        local_index.add(ids, vectors, payloads)
+
+    lexical_index = get_lexical_index(index_name)
+    if lexical_index is not None:
+        lexical_index.add(ids, payloads)
+
+
+# --- Delete points by id from Qdrant and the in-process copies ---
+def _delete_points(index_name: str, ids: list) -> None:
+    if not ids:
+        return
+    ids = physical_ids(index_name, ids)
+    qdrant_client.delete(
+        collection_name=physical_name(index_name),
+        points_selector=models.PointIdsList(points=ids),
+    )
+    bump_index_version(index_name)
+    get_row_store(index_name).delete(ids)
+    for index in (get_local_index(index_name, include_building=True), get_lexical_index(index_name)):
+        if index is not None:
+            index.delete(ids)
+
+
+# --- Payload filter -> (Qdrant filter, matching predicate for the local copies) ---
+_FILTER_KEYS = {"table": "table", "column": "column", "doc_type": "doc_type", "source": "table_name"}
+
+
+def build_point_filter(spec: Dict[str, Any]):
+    conditions, checks = [], []
+    for field, key in _FILTER_KEYS.items():
+        value = spec.get(field)
+        if value is not None:
+            conditions.append(models.FieldCondition(key=key, match=models.MatchValue(value=value)))
+            checks.append(lambda p, key=key, value=value: p.get(key) == value)
+
+    after, before = spec.get("ingested_after"), spec.get("ingested_before")
+    if after is not None or before is not None:
+        # Points ingested before ingested_at existed never match a time range
+        conditions.append(models.FieldCondition(key="ingested_at", range=models.Range(gte=after, lte=before)))
+        checks.append(lambda p: p.get("ingested_at") is not None
+                      and (after is None or p["ingested_at"] >= after)
+                      and (before is None or p["ingested_at"] <= before))
+
+    if not conditions:
+        raise ValueError("filter must set at least one of: " + ", ".join(list(_FILTER_KEYS) + ["ingested_after", "ingested_before"]))
+    return models.Filter(must=conditions), (lambda p: all(check(p) for check in checks))
+
+
+# --- Delete every point matching a payload filter ---
+def _delete_where(index_name: str, spec: Dict[str, Any]) -> None:
+    qdrant_filter, matches = build_point_filter(spec)
+    row_store = get_row_store(index_name)
+    if row_store.exists():
+        row_store.delete(_ids_where(index_name, qdrant_filter))
+    qdrant_client.delete(
+        collection_name=physical_name(index_name),
+        points_selector=models.FilterSelector(filter=tenant_filter(index_name, qdrant_filter)),
+    )
+    bump_index_version(index_name)
+    for index in (get_local_index(index_name, include_building=True), get_lexical_index(index_name)):
+        if index is not None:
+            index.delete(index.ids_where(matches))
+
+
+# --- Delete every point that came from one source file ---
+def _delete_source(index_name: str, source: str, doc_type: Optional[str] = None) -> None:
+    _delete_where(index_name, {"source": source, "doc_type": doc_type})
+
+
+# ---------- Selective maintenance by payload filter ----------
+# Fields that feed row_to_sentence: changing them means re-embedding the point
+EMBEDDED_FIELDS = {"table", "column", "dirty_value", "clean_value", "rule"}
+RESERVED_FIELDS = {"values", "row", "row_extra", "rule_key", "table_name", "row_number", "ingested_at"}
+
+
+def _count_where(index_name: str, qdrant_filter) -> int:
+    return qdrant_client.count(
+        collection_name=physical_name(index_name), count_filter=tenant_filter(index_name, qdrant_filter), exact=True
+    ).count
+
+
+def _ids_where(index_name: str, qdrant_filter, batch_size: int = 1000) -> list:
+    ids, offset = [], None
+    while True:
+        records, offset = qdrant_client.scroll(
+            collection_name=physical_name(index_name),
+            scroll_filter=tenant_filter(index_name, qdrant_filter),
+            limit=batch_size,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False,
+        )
+        ids.extend(r.id for r in records)
+        if offset is None:
+            return ids
+
+
+def delete_points(req: DeletePointsRequest) -> dict:
+    try:
+        if not index_exists(req.index_name):
+            return {"status": "fail", "message": "index does not exist"}
+        spec = req.filter.dict()
+        qdrant_filter, _ = build_point_filter(spec)
+        deleted = _count_where(req.index_name, qdrant_filter)
+        if deleted:
+            _delete_where(req.index_name, spec)
+        return {"status": "success", "deleted": deleted}
+    except Exception as e:
+        print("ERROR in delete_points:", e)
+        return {"status": "fail", "message": str(e)}
 
-    return {"status": "success", "upserted": len(points)}
 
+def update_points(req: UpdatePointsRequest, batch_size: int = 256) -> dict:
+    """
+    Set payload fields on every point matching a filter.
 
+    Metadata-only changes are a single set_payload call. Changes to fields
+    the one-liner is built from (table, column, dirty/clean value, rule)
+    re-embed just the matching points and upsert them under the same ids.
+    """
+    try:
+        index_name = req.index_name
+        if not index_exists(index_name):
+            return {"status": "fail", "message": "index does not exist"}
+        reserved = RESERVED_FIELDS & set(req.set)
+        if reserved:
+            return {"status": "fail", "message": f"cannot set reserved fields: {sorted(reserved)}"}
+        if not req.set:
+            return {"status": "fail", "message": "nothing to set"}
+        qdrant_filter, matches = build_point_filter(req.filter.dict())
+
+        if not EMBEDDED_FIELDS & set(req.set):
+            updated = _count_where(index_name, qdrant_filter)
+            if updated:
+                qdrant_client.set_payload(
+                    collection_name=physical_name(index_name),
+                    payload=req.set,
+                    points=tenant_filter(index_name, qdrant_filter),
+                )
+                bump_index_version(index_name)
+                for index in (get_local_index(index_name, include_building=True), get_lexical_index(index_name)):
+                    if index is not None:
+                        index.set_payload(index.ids_where(matches), req.set)
+            return {"status": "success", "updated": updated, "reembedded": 0}
+
+        # Collect first: the rewritten points may stop matching the filter
+        records, offset = [], None
+        while True:
+            page, offset = qdrant_client.scroll(
+                collection_name=physical_name(index_name),
+                scroll_filter=tenant_filter(index_name, qdrant_filter),
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+            records.extend(page)
+            if offset is None:
+                break
+        for r in records:
+            r.payload = expand_payload(r.payload, index_name, r.id)
+
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            rows = []
+            for r in batch:
+                row = {**(r.payload.get("row") or {}), **req.set}
+                if "rule" in req.set and "domain_rule" in row:
+                    row["domain_rule"] = req.set["rule"]
+                rows.append(row)
+            lines = [row_to_sentence(row) for row in rows]
+            payloads = []
+            for r, row, line in zip(batch, rows, lines):
+                payload = {**r.payload, **req.set, **build_payload(row, line, r.payload.get("table_name"), r.payload.get("row_number"))}
+                if r.payload.get("ingested_at") is not None:
+                    payload["ingested_at"] = r.payload["ingested_at"]
+                payloads.append(payload)
+            _write_points(index_name, [r.id for r in batch], embed_lines(lines), payloads)
+
+        return {"status": "success", "updated": len(records), "reembedded": len(records)}
+    except Exception as e:
+        print("ERROR in update_points:", e)
+        return {"status": "fail", "message": str(e)}
 
 
+# --- Build the lexical index for a collection that predates it ---
+def rebuild_lexical_index(index_name: str, batch_size: int = 1000):
+    lexical_index = create_lexical_index(index_name)
+    offset = None
+    while True:
+        records, offset = qdrant_client.scroll(
+            collection_name=physical_name(index_name),
+            scroll_filter=tenant_filter(index_name),
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=False,
+        )
+        if records:
+            lexical_index.add([r.id for r in records], [expand_payload(r.payload, index_name, r.id) for r in records])
+        if offset is None:
+            break
+    return lexical_index
+
+
+# --- Backfill the local copy of a collection that predates it ---
+def build_local_copy(index_name: str, batch_size: int = 1000) -> dict:
+    """
+    Give an existing collection its in-process copy (vectors read back from
+    Qdrant, nothing re-embedded). Collections above LOCAL_INDEX_MAX_POINTS
+    are skipped and stay Qdrant-only. Searches ignore the copy until it is
+    complete; writes made meanwhile by any process land in it as well.
+    """
+    try:
+        if not index_exists(index_name):
+            return {"status": "fail", "message": "index does not exist"}
+        if get_local_index(index_name) is not None:
+            return {"status": "success", "built": False, "reason": "already has a local copy"}
+        points = _count_where(index_name, None)
+        if points > LOCAL_INDEX_MAX_POINTS:
+            return {"status": "success", "built": False, "points": points,
+                    "reason": f"more than {LOCAL_INDEX_MAX_POINTS} points; served by Qdrant only"}
+
+        local_index = create_local_index(index_name, building=True)
+        offset = None
+        while True:
+            records, offset = qdrant_client.scroll(
+                collection_name=physical_name(index_name),
+                scroll_filter=tenant_filter(index_name),
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            if records and not local_index.add(
+                [r.id for r in records], [r.vector for r in records],
+                [expand_payload(r.payload, index_name, r.id) for r in records],
+            ):
+                return {"status": "success", "built": False, "reason": "collection outgrew the local copy"}
+            if offset is None:
+                break
+        local_index.mark_ready()
+        return {"status": "success", "built": True, "points": len(local_index)}
+    except Exception as e:
+        print("ERROR in build_local_copy:", e)
+        local_index = get_local_index(index_name, include_building=True)
+        if local_index is not None and not local_index.ready():
+            drop_local_index(index_name)
+        return {"status": "fail", "message": str(e)}
 
 
 # --- Build one consistent sentence for both KB rules and logs ---
@@ -115,6 +448,188 @@ def row_to_sentence(row: dict) -> str:
     # fallback: minimal structured line
     return f"Record | table: {table} | column: {column}"
 
+# --- Unified payload (same keys for rules & logs) ---
+def build_payload(row: dict, line: str, source: str, row_number: int) -> dict:
+    # Detect doc type once and surface in payload
+    doc_type = "rule" if ("domain_rule" in row or "rule" in row) else (
+               "log" if ("dirty_value" in row or "clean_value" in row) else "record")
+    return intern_payload({
+        "values": line,                # the one-liner
+        "row": row,                    # original JSON
+        "doc_type": doc_type,          # 'rule' | 'log' | 'record'
+        "table": row.get("table"),
+        "column": row.get("column"),
+        "dirty_value": row.get("dirty_value"),
+        "clean_value": row.get("clean_value"),
+        "rule": row.get("domain_rule") or row.get("rule"),
+        "table_name": source,
+        "row_number": row_number,
+        "ingested_at": time.time(),    # epoch seconds, for time-range maintenance
+    })
+
+
+# ---------- Payload layout in the store ----------
+# "compact": the one-liner and the fields duplicated from the raw row are not stored;
+# expand_payload rebuilds them on read. "full": payloads are stored as built above.
+PAYLOAD_LAYOUT = os.getenv("PAYLOAD_LAYOUT", "compact")
+# Keep the raw row's other keys (ids, timestamps, ...) in the store; false moves them to the
+# side store (core/payload_store.py, PAYLOAD_STORE_DIR) and keeps only the indexed fields
+PAYLOAD_KEEP_ROW = os.getenv("PAYLOAD_KEEP_ROW", "true").lower() == "true"
+_ROW_FIELDS = ("table", "column", "dirty_value", "clean_value")
+# Marks a compact payload whose "row_extra" is in the side store
+ROW_EXTRA_STORED = "row_extra_stored"
+
+
+def _row_from_fields(payload: dict) -> dict:
+    row = {k: payload[k] for k in _ROW_FIELDS if k in payload}
+    rule_key = payload.get("rule_key", "domain_rule")
+    if "rule" in payload and rule_key:
+        row[rule_key] = payload["rule"]
+    return row
+
+
+def compact_payload(payload: dict) -> dict:
+    """
+    Full payload -> compact one: drops "values", null fields and every row key
+    that the top-level fields already carry. Whatever cannot be rebuilt
+    exactly goes in "row_extra" (or "values" itself, if the one-liner would differ).
+    """
+    if "values" not in payload and "row" not in payload:
+        return payload  # already compact
+    row = payload.get("row") or {}
+    compact = {k: v for k, v in payload.items() if k not in ("values", "row") and v is not None}
+    if "rule" in compact:
+        if row.get("domain_rule") == compact["rule"]:
+            pass
+        elif row.get("rule") == compact["rule"]:
+            compact["rule_key"] = "rule"
+        else:
+            compact["rule_key"] = ""  # rule set on the point, not taken from the row
+    rebuilt = _row_from_fields(compact)
+    extra = {k: v for k, v in row.items() if k not in rebuilt or rebuilt[k] != v or v is None}
+    if extra:
+        compact["row_extra"] = extra
+        rebuilt.update(extra)
+    if payload.get("values") is not None and row_to_sentence(rebuilt) != payload["values"]:
+        compact["values"] = payload["values"]
+    return compact
+
+
+def _offload_row_extra(index_name: str, ids: list, stored: List[dict], write: bool = True) -> List[dict]:
+    """With PAYLOAD_KEEP_ROW=false, move compact payloads' "row_extra" to the side store."""
+    if PAYLOAD_KEEP_ROW:
+        return stored
+    moved_ids, moved, result = [], [], []
+    for pid, payload in zip(ids, stored):
+        if "row_extra" in payload:
+            moved_ids.append(pid)
+            moved.append(payload["row_extra"])
+            payload = {k: v for k, v in payload.items() if k != "row_extra"}
+            payload[ROW_EXTRA_STORED] = True
+        result.append(payload)
+    if moved and write:
+        get_row_store(index_name).put(moved_ids, moved)
+    return result
+
+
+def expand_payload(payload: Optional[dict], index_name: Optional[str] = None, point_id=None) -> dict:
+    """
+    Stored payload (either layout) -> full payload with "values" and "row".
+    Pass the index and the point id as stored to restore row extras kept
+    in the side store.
+    """
+    payload = payload or {}
+    if "row" in payload and "values" in payload:
+        return intern_payload(payload)
+    row = _row_from_fields(payload)
+    extra = payload.get("row_extra")
+    if extra is None and payload.get(ROW_EXTRA_STORED) and index_name is not None:
+        extra = get_row_store(index_name).get(point_id)
+    row.update(extra or {})
+    full = {k: v for k, v in payload.items() if k not in ("row_extra", "rule_key", ROW_EXTRA_STORED)}
+    full.setdefault("values", row_to_sentence(row))
+    full["row"] = row
+    full.setdefault("table_name", None)
+    full.setdefault("row_number", None)
+    return intern_payload(full)
+
+
+def _payload_bytes(payload: dict) -> int:
+    return len(json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"))
+
+
+class MigratePayloadsRequest(BaseModel):
+    index_name: str
+    layout: Optional[str] = None     # "compact" | "full"; default PAYLOAD_LAYOUT
+    dry_run: Optional[bool] = False  # only report bytes per point
+
+
+def migrate_payloads(req: MigratePayloadsRequest, batch_size: int = 256) -> dict:
+    """
+    Rewrite an index's stored payloads into another layout (vectors untouched)
+    and report the average serialized payload size per point before and after.
+    """
+    try:
+        index_name = req.index_name
+        layout = req.layout or PAYLOAD_LAYOUT
+        if layout not in ("compact", "full"):
+            return {"status": "fail", "message": "layout must be compact or full"}
+        if not index_exists(index_name):
+            return {"status": "fail", "message": "index does not exist"}
+
+        points = rewritten = before = after = 0
+        offset = None
+        while True:
+            records, offset = qdrant_client.scroll(
+                collection_name=physical_name(index_name),
+                scroll_filter=tenant_filter(index_name),
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+            ids = [r.id for r in records]
+            current = [r.payload or {} for r in records]
+            targets = [expand_payload(payload, index_name, pid) for payload, pid in zip(current, ids)]
+            if layout == "compact":
+                targets = _offload_row_extra(
+                    index_name, ids, [compact_payload(t) for t in targets], write=not req.dry_run
+                )
+            operations = []
+            for pid, payload, target in zip(ids, current, targets):
+                points += 1
+                before += _payload_bytes(payload)
+                after += _payload_bytes(target)
+                if target != payload:
+                    operations.append(models.OverwritePayloadOperation(
+                        overwrite_payload=models.SetPayload(payload=target, points=[pid])
+                    ))
+            if operations and not req.dry_run:
+                qdrant_client.batch_update_points(
+                    collection_name=physical_name(index_name), update_operations=operations, wait=True
+                )
+                rewritten += len(operations)
+                if layout == "full":
+                    # The rows are whole in the store again
+                    get_row_store(index_name).delete([pid for pid, p in zip(ids, current) if p.get(ROW_EXTRA_STORED)])
+            if offset is None:
+                break
+
+        if rewritten:
+            bump_index_version(index_name)
+        return {
+            "status": "success",
+            "layout": layout,
+            "points": points,
+            "rewritten": rewritten,
+            "bytes_per_point_before": round(before / points, 1) if points else 0.0,
+            "bytes_per_point_after": round(after / points, 1) if points else 0.0,
+            "reduction": round(1 - after / before, 4) if before else 0.0,
+        }
+    except Exception as e:
+        print("ERROR in migrate_payloads:", e)
+        return {"status": "fail", "message": str(e)}
+
 # --- Normalize file content to list[dict] ---
 def parse_json_text(fname: str, text: str) -> List[dict]:
     fname = (fname or "").lower()
@@ -125,12 +640,12 @@ def parse_json_text(fname: str, text: str) -> List[dict]:
     return data if isinstance(data, list) else [data]
 
 # ---------- Upsert data from JSON / JSONL into Qdrant ----------
-async def update_index(index_name: str, files: List[UploadFile]) -> dict:
+def update_index(index_name: str, files: List[UploadFile]) -> dict:
     try:
-        if not qdrant_client.collection_exists(collection_name=index_name):
+        if not index_exists(index_name):
             return {"status": "fail", "message": "index does not exist"}
 
-        points: List[models.PointStruct] = []
+        ids, vectors, payloads = [], [], []
         next_id = int(time.time() * 1e9)  # unique-ish base
 
         for f in files:
@@ -138,7 +653,8 @@ async def update_index(index_name: str, files: List[UploadFile]) -> dict:
             if not (fname.lower().endswith(".json") or fname.lower().endswith(".jsonl")):
                 return {"status": "fail", "message": f"Only .json/.jsonl allowed: {fname}"}
 
-            text = (await f.read()).decode("utf-8")
+            # Called on a worker thread (api/index.py), so the blocking read is fine
+            text = f.file.read().decode("utf-8")
             rows = parse_json_text(fname, text)
 
             # ensure dicts
@@ -147,36 +663,13 @@ async def update_index(index_name: str, files: List[UploadFile]) -> dict:
 
             # embed one-liners
             lines = [row_to_sentence(r) for r in rows]
-            vecs  = [sentence_model.encode(t).tolist() for t in lines]
-
-            for i, (row, vec, line) in enumerate(zip(rows, vecs, lines)):
-                # Detect doc type once and surface in payload
-                doc_type = "rule" if ("domain_rule" in row or "rule" in row) else (
-                           "log" if ("dirty_value" in row or "clean_value" in row) else "record")
-
-                points.append(
-                    models.PointStruct(
-                        id=next_id,
-                        vector=vec,
-                        payload={
-                            # unified payload (same keys for rules & logs)
-                            "values": line,                # the one-liner
-                            "row": row,                    # original JSON
-                            "doc_type": doc_type,          # 'rule' | 'log' | 'record'
-                            "table": row.get("table"),
-                            "column": row.get("column"),
-                            "dirty_value": row.get("dirty_value"),
-                            "clean_value": row.get("clean_value"),
-                            "rule": row.get("domain_rule") or row.get("rule"),
-                            "table_name": fname,
-                            "row_number": i,
-                        },
-                    )
-                )
-                next_id += 1
+            vectors.append(embed_lines(lines))
+            payloads.extend(build_payload(row, line, fname, i) for i, (row, line) in enumerate(zip(rows, lines)))
+            ids.extend(range(next_id, next_id + len(rows)))
+            next_id += len(rows)
 
-        if points:
-            qdrant_client.upsert(collection_name=index_name, points=points)
+        if ids:
+            _upload_points(index_name, ids, np.concatenate(vectors), payloads)
 
         return {"status": "success"}
     except Exception as e:
@@ -303,12 +796,19 @@ async def update_index(index_name: str, files: List[UploadFile]) -> dict:
 
 
 # ---------- Delete collection ----------
-async def delete_index(index_name: str) -> dict:
+def delete_index(index_name: str) -> dict:
     try:
-        if not qdrant_client.collection_exists(collection_name=index_name):
+        if not index_exists(index_name):
             return {"status": "fail", "message": "index does not exist"}
 
-        qdrant_client.delete_collection(collection_name=index_name)
+        drop_index_storage(index_name)
+        drop_local_index(index_name)
+        drop_lexical_index(index_name)
+        drop_row_store(index_name)
+        bump_index_version(index_name)
+        # Imported here: log_sync builds on this module
+        from core.log_sync import clear_watermarks
+        clear_watermarks(index_name)
         return {"status": "success"}
 
     except Exception as e:
@@ -0,0 +1,142 @@
+import os
+import json
+import uuid
+import threading
+from typing import List, Optional
+
+from qdrant_client import models
+
+from core import qdrant_client
+
+# "collection": one Qdrant collection per index (default)
+# "shared": every index is a tenant of SHARED_COLLECTION, partitioned by TENANT_KEY
+INDEX_LAYOUT = os.getenv("INDEX_LAYOUT", "collection")
+SHARED_COLLECTION = os.getenv("SHARED_COLLECTION", "astraclean_shared")
+TENANT_KEY = "tenant"
+TENANT_REGISTRY_PATH = os.getenv("TENANT_REGISTRY_PATH", "tenants.json")
+# Payloads live on disk (read on demand); only indexed payload fields stay in RAM
+QDRANT_ON_DISK_PAYLOAD = os.getenv("QDRANT_ON_DISK_PAYLOAD", "true").lower() == "true"
+
+_registry_lock = threading.Lock()
+
+
+def is_shared() -> bool:
+    return INDEX_LAYOUT == "shared"
+
+
+# ---------- Logical -> physical mapping ----------
+def physical_name(index_name: str) -> str:
+    """Qdrant collection that holds a logical index."""
+    return SHARED_COLLECTION if is_shared() else index_name
+
+
+def physical_ids(index_name: str, ids: list) -> list:
+    """
+    Point ids as stored in Qdrant. In the shared layout ids are namespaced
+    by index so two tenants can never overwrite each other's points.
+    """
+    if not is_shared():
+        return list(ids)
+    return [str(uuid.uuid5(uuid.NAMESPACE_URL, f"{index_name}/point/{pid}")) for pid in ids]
+
+
+def tenant_filter(index_name: str, base: Optional[models.Filter] = None) -> Optional[models.Filter]:
+    """Restrict a filter (or nothing) to one logical index."""
+    if not is_shared():
+        return base
+    condition = models.FieldCondition(key=TENANT_KEY, match=models.MatchValue(value=index_name))
+    if base is None:
+        return models.Filter(must=[condition])
+    return models.Filter(must=[condition, *(base.must or [])], should=base.should, must_not=base.must_not)
+
+
+def tag_payloads(index_name: str, payloads: List[dict]) -> List[dict]:
+    if not is_shared():
+        return payloads
+    return [{**p, TENANT_KEY: index_name} for p in payloads]
+
+
+# ---------- Tenant registry ----------
+def _load_registry() -> List[str]:
+    if not os.path.exists(TENANT_REGISTRY_PATH):
+        return []
+    with open(TENANT_REGISTRY_PATH, "r") as f:
+        return json.load(f)
+
+
+def _save_registry(names: List[str]) -> None:
+    tmp = TENANT_REGISTRY_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(sorted(set(names)), f, indent=2)
+    os.replace(tmp, TENANT_REGISTRY_PATH)
+
+
+def _tenants_with_points() -> List[str]:
+    if not qdrant_client.collection_exists(collection_name=SHARED_COLLECTION):
+        return []
+    resp = qdrant_client.facet(collection_name=SHARED_COLLECTION, key=TENANT_KEY, limit=10000, exact=False)
+    return [hit.value for hit in resp.hits]
+
+
+# ---------- Storage lifecycle ----------
+def index_exists(index_name: str) -> bool:
+    if not is_shared():
+        return qdrant_client.collection_exists(collection_name=index_name)
+    with _registry_lock:
+        if index_name in _load_registry():
+            return True
+    # Created by another process: it exists once it holds points
+    if not qdrant_client.collection_exists(collection_name=SHARED_COLLECTION):
+        return False
+    return qdrant_client.count(
+        collection_name=SHARED_COLLECTION, count_filter=tenant_filter(index_name), exact=False
+    ).count > 0
+
+
+def list_indexes() -> List[str]:
+    if not is_shared():
+        return [c.name for c in qdrant_client.get_collections().collections]
+    with _registry_lock:
+        names = set(_load_registry())
+    return sorted(names | set(_tenants_with_points()))
+
+
+def create_index_storage(index_name: str, vector_size: int) -> None:
+    """Create the collection for an index, or register it as a tenant of the shared one."""
+    if not is_shared():
+        qdrant_client.recreate_collection(
+            collection_name=index_name,
+            vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+            on_disk_payload=QDRANT_ON_DISK_PAYLOAD,
+        )
+        return
+
+    if not qdrant_client.collection_exists(collection_name=SHARED_COLLECTION):
+        qdrant_client.create_collection(
+            collection_name=SHARED_COLLECTION,
+            vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+            on_disk_payload=QDRANT_ON_DISK_PAYLOAD,
+            # Every search is tenant-filtered: build per-tenant graphs, no global one
+            hnsw_config=models.HnswConfigDiff(payload_m=16, m=0),
+        )
+        qdrant_client.create_payload_index(
+            collection_name=SHARED_COLLECTION,
+            field_name=TENANT_KEY,
+            field_schema=models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True),
+        )
+    with _registry_lock:
+        _save_registry(_load_registry() + [index_name])
+
+
+def drop_index_storage(index_name: str) -> None:
+    """Delete an index's collection, or only its tenant's points in the shared one."""
+    if not is_shared():
+        qdrant_client.delete_collection(collection_name=index_name)
+        return
+    if qdrant_client.collection_exists(collection_name=SHARED_COLLECTION):
+        qdrant_client.delete(
+            collection_name=SHARED_COLLECTION,
+            points_selector=models.FilterSelector(filter=tenant_filter(index_name)),
+        )
+    with _registry_lock:
+        _save_registry([n for n in _load_registry() if n != index_name])
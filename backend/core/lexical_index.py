@@ -0,0 +1,331 @@
+import os
+import re
+import json
+import math
+import uuid
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from core.local_index import LocalHit
+from core.shared_state import file_lock
+from core.payload_store import intern_payload
+
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", "lexical_index")
+NGRAM_SIZE = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into whole-word terms plus character n-grams of each word.
+
+    The n-grams give typo-tolerant matching ("birminghxm" still shares most
+    trigrams with "birmingham"); whole words keep exact matches on top.
+    """
+    terms = []
+    for word in _WORD_RE.findall(str(text).lower()):
+        terms.append("w:" + word)
+        padded = f"#{word}#"
+        if len(padded) <= NGRAM_SIZE:
+            terms.append(padded)
+            continue
+        terms.extend(padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1))
+    return terms
+
+
+class LexicalIndex:
+    """
+    In-process BM25 inverted index over word and character n-gram terms.
+
+    Documents are appended to ``<name>.jsonl`` at ingestion time; postings
+    are kept in memory and rebuilt from that file on first use.
+
+    The file is shared by every process. Writes hold an exclusive file lock
+    and first catch up with the file. Appends by other processes are read
+    incrementally from the last offset consumed. Rewrites (replace, delete,
+    payload updates) write a new ``<name>.generation`` token, which makes
+    every other process reload the whole file.
+    """
+
+    def __init__(self, name: str, root: str = LEXICAL_INDEX_DIR):
+        self.name = name
+        self.path = os.path.join(root, f"{name}.jsonl")
+        self.generation_path = os.path.join(root, f"{name}.generation")
+        self.lock_path = os.path.join(root, f".{name}.lock")
+        self.lock = threading.RLock()
+        self.generation: Optional[str] = None
+        self._offset = 0  # bytes of the file already indexed
+        self._reset()
+
+    def _reset(self) -> None:
+        self.ids: List[Any] = []
+        self.payloads: List[Optional[dict]] = []
+        self.doc_len: List[int] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.position: Dict[Any, int] = {}
+        self.total_len = 0
+        self.live = 0
+
+    # ---------- Persistence ----------
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _disk_generation(self) -> Optional[str]:
+        try:
+            with open(self.generation_path, "r") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _new_generation(self) -> None:
+        self.generation = uuid.uuid4().hex
+        tmp = self.generation_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(self.generation)
+        os.replace(tmp, self.generation_path)
+
+    def load(self) -> "LexicalIndex":
+        with self.lock, file_lock(self.lock_path, shared=True):
+            self._load()
+        return self
+
+    def _load(self) -> None:
+        self._reset()
+        self._offset = 0
+        self.generation = self._disk_generation()
+        self._read_appended()
+
+    def _read_appended(self) -> None:
+        # Index the complete lines written after self._offset
+        if not self.exists():
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            tail = f.read()
+        tail = tail[: tail.rfind(b"\n") + 1]
+        for line in tail.decode("utf-8").splitlines():
+            if line.strip():
+                doc = json.loads(line)
+                self._index(doc["id"], doc["text"], intern_payload(doc["payload"]))
+        self._offset += len(tail)
+
+    def _stale(self) -> bool:
+        if self._disk_generation() != self.generation:
+            return True
+        try:
+            return os.path.getsize(self.path) > self._offset
+        except FileNotFoundError:
+            return False
+
+    def _catch_up(self) -> None:
+        # Caller holds the file lock
+        if self._disk_generation() != self.generation:
+            self._load()
+        else:
+            self._read_appended()
+
+    def refresh(self) -> "LexicalIndex":
+        """Pick up what other processes wrote since the file was last read."""
+        if self._stale():
+            with self.lock, file_lock(self.lock_path, shared=True):
+                self._catch_up()
+        return self
+
+    def _rewrite(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            for pid, payload in zip(self.ids, self.payloads):
+                if payload is not None:
+                    f.write(json.dumps({"id": pid, "text": payload["values"], "payload": payload}, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+        self._new_generation()
+        # Memory already matches the compacted file (deleted docs are tombstones there)
+        self._offset = os.path.getsize(self.path)
+
+    def create(self) -> "LexicalIndex":
+        with self.lock, file_lock(self.lock_path):
+            self._reset()
+            self._rewrite()
+        return self
+
+    def drop(self) -> None:
+        with self.lock, file_lock(self.lock_path):
+            self._reset()
+            self._offset, self.generation = 0, None
+            for path in (self.path, self.generation_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    # ---------- Writes ----------
+    def _index(self, pid, text: str, payload: dict) -> None:
+        if pid in self.position:
+            self._unindex(pid)
+        doc = len(self.ids)
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc] = tf
+        length = sum(terms.values())
+        self.ids.append(pid)
+        self.payloads.append(payload)
+        self.doc_len.append(length)
+        self.position[pid] = doc
+        self.total_len += length
+        self.live += 1
+
+    def _unindex(self, pid) -> None:
+        doc = self.position.pop(pid)
+        for term in set(tokenize(self.payloads[doc]["values"])):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_len -= self.doc_len[doc]
+        self.doc_len[doc] = 0
+        self.payloads[doc] = None
+        self.live -= 1
+
+    def add(self, ids: List[Any], payloads: List[dict]) -> None:
+        """
+        Index documents by their ``values`` one-liner; re-adding an id replaces it.
+        Nothing is written if another process dropped the index meanwhile.
+        """
+        with self.lock, file_lock(self.lock_path):
+            if not self.exists():
+                self._reset()
+                return
+            self._catch_up()
+            replaced = any(pid in self.position for pid in ids)
+            for pid, payload in zip(ids, payloads):
+                self._index(pid, payload["values"], payload)
+            if replaced:
+                self._rewrite()
+            else:
+                with open(self.path, "a") as f:
+                    for pid, payload in zip(ids, payloads):
+                        f.write(json.dumps({"id": pid, "text": payload["values"], "payload": payload}, ensure_ascii=False) + "\n")
+                self._offset = os.path.getsize(self.path)
+
+    def delete(self, ids: List[Any]) -> int:
+        with self.lock, file_lock(self.lock_path):
+            if not self.exists():
+                return 0
+            self._catch_up()
+            removed = 0
+            for pid in ids:
+                if pid in self.position:
+                    self._unindex(pid)
+                    removed += 1
+            if removed:
+                self._rewrite()
+            return removed
+
+    def set_payload(self, ids: List[Any], fields: Dict[str, Any]) -> int:
+        """Merge ``fields`` into stored payloads; callers re-add documents whose text changes."""
+        with self.lock, file_lock(self.lock_path):
+            if not self.exists():
+                return 0
+            self._catch_up()
+            updated = 0
+            for pid in ids:
+                doc = self.position.get(pid)
+                if doc is not None:
+                    self.payloads[doc] = {**self.payloads[doc], **fields}
+                    updated += 1
+            if updated:
+                self._rewrite()
+            return updated
+
+    # ---------- Reads ----------
+    def ids_where(self, predicate) -> List[Any]:
+        """Ids of points whose payload satisfies ``predicate``."""
+        self.refresh()
+        with self.lock:
+            return [pid for pid, payload in zip(self.ids, self.payloads) if payload is not None and predicate(payload)]
+
+    def search(self, query: str, limit: int) -> List[LocalHit]:
+        """Return the top ``limit`` documents by BM25 score, best first."""
+        self.refresh()
+        with self.lock:
+            if self.live == 0 or limit <= 0:
+                return []
+            avg_len = self.total_len / self.live
+            doc_len = np.asarray(self.doc_len, dtype=np.float32)
+            scores = np.zeros(len(self.ids), dtype=np.float32)
+            for term, qtf in Counter(tokenize(query)).items():
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (self.live - len(postings) + 0.5) / (len(postings) + 0.5))
+                docs = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+                tf = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[docs] / avg_len)
+                scores[docs] += qtf * idf * tf * (BM25_K1 + 1) / (tf + norm)
+            ids, payloads = self.ids, self.payloads
+
+        k = min(limit, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [LocalHit(ids[j], float(scores[j]), payloads[j]) for j in top]
+
+
+# ---------- Registry ----------
+_indexes: Dict[str, LexicalIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def get_lexical_index(index_name: str) -> Optional[LexicalIndex]:
+    """Return the lexical index for a collection, or None if it was never built."""
+    with _registry_lock:
+        index = _indexes.get(index_name)
+        if index is None:
+            index = LexicalIndex(index_name)
+            if not index.exists():
+                return None
+            _indexes[index_name] = index.load()
+        elif not index.exists():
+            del _indexes[index_name]
+            return None
+        return index
+
+
+def create_lexical_index(index_name: str) -> LexicalIndex:
+    with _registry_lock:
+        index = (_indexes.pop(index_name, None) or LexicalIndex(index_name)).create()
+        _indexes[index_name] = index
+        return index
+
+
+def drop_lexical_index(index_name: str) -> None:
+    with _registry_lock:
+        index = _indexes.pop(index_name, None) or LexicalIndex(index_name)
+        index.drop()
+
+
+def reciprocal_rank_fusion(ranked_lists: List[list], k: int = 60) -> List[tuple]:
+    """
+    Fuse several ranked hit lists by reciprocal rank.
+
+    Args:
+        ranked_lists: Lists of hits (anything with ``.id``), best first.
+        k: RRF damping constant.
+
+    Returns:
+        [(fused_score, [hit from each list that contained it]), ...] best first.
+    """
+    fused: Dict[Any, list] = {}
+    for hits in ranked_lists:
+        for rank, hit in enumerate(hits):
+            entry = fused.setdefault(hit.id, [0.0, []])
+            entry[0] += 1.0 / (k + rank + 1)
+            entry[1].append(hit)
+    return sorted((tuple(v) for v in fused.values()), key=lambda x: -x[0])
@@ -3,8 +3,7 @@ def call_llm(prompt: str) -> str:
     Generic LLM calling interface, input prompt, return model output (synchronous version, suitable for rule generation scenarios).
     """
     # Assume there is a default model
-    model_name = list(initialized_models.keys())[0]
-    model = initialized_models[model_name]
+    model = initialized_models[default_model_name()]
     wrapped_text = model.prompt_wrapper(prompt)
     response = model.generate(wrapped_text, None)
     # Assume response is a dict, get the value field
@@ -13,7 +12,8 @@ def call_llm(prompt: str) -> str:
     return str(response)
 from typing import Optional
 from core import initialized_models
-from core.preprocess import prompt_preprocess
+from core.preprocess import prompt_preprocess, pack_context
+from core.batching import llm_batcher
 
 
 async def prompt_with_data(
@@ -24,6 +24,7 @@ async def prompt_with_data(
     pivot_names: list[str],
     pivot_values: list[list],
     retrieved_list: list[list],
+    context_token_budget: Optional[int] = None,
 ) -> dict:
 
     # Get model from initialized models
@@ -36,11 +37,15 @@ async def prompt_with_data(
 
     retrieved_list = [x if x != None and len(x) > 0 else None for x in retrieved_list]
 
-    # Get the result for each target value
-    results = []
+    # Build every row's prompt first; rows (and other requests' rows) are generated as a shared batch
+    prompts, context_counts = [], []
     for target_row_value, pivot_row_values, retrieved in zip(
         target_values, pivot_values, retrieved_list
     ):
+        # Keep the best, de-duplicated evidence that fits the row's token budget
+        packed, context_tokens = pack_context(retrieved, context_token_budget)
+        retrieved = packed or None
+
         # Create prompt using context
         prompt = prompt_preprocess(
             description,
@@ -51,21 +56,28 @@ async def prompt_with_data(
             retrieved,
         )
         print("CREATED PROMPT:", prompt)
-        try:
-            wrapped_text = model.prompt_wrapper(prompt)  # Creates final prompt
-            # print("WRAPPED TEXT:", wrapped_text)
-            response = model.generate(
-                wrapped_text, retrieved  # None if no context given
-            )  # Generates response, return dict with 'value' and 'citation'
-            # print("RESPONSE:", response)
-        except Exception as e:
-            print("THERE FOR WAS ERROR IN LLM.py")
-            return {"status": "fail", "message": str(e)}
-
-        results.append(response)
+        prompts.append((prompt, retrieved))
+        context_counts.append(context_tokens)
+
+    try:
+        wrapped = [(model.prompt_wrapper(prompt), retrieved) for prompt, retrieved in prompts]  # Creates final prompts
+        # Each response is a dict with 'value' and 'citation'
+        results = await llm_batcher.submit_many(wrapped, key=model_name)
+    except Exception as e:
+        print("THERE FOR WAS ERROR IN LLM.py")
+        return {"status": "fail", "message": str(e)}
+
+    for response, context_tokens in zip(results, context_counts):
+        if isinstance(response, dict):
+            response["context_tokens"] = context_tokens
     return {"status": "success", "results": results}
 
 
+def default_model_name() -> str:
+    # call_llm always uses the first initialized model
+    return list(initialized_models.keys())[0]
+
+
 def get_models() -> dict:
     cloud = {"name": "Cloud Models", "options": []}
     local = {"name": "Local Models", "options": []}
@@ -82,3 +94,15 @@ def get_models() -> dict:
         return {"status": "fail", "message": str(e)}
 
     return {"status": "success", "models": model_names}
+
+
+def get_backend_status() -> dict:
+    # Per-host routing state of pooled local models
+    return {
+        "status": "success",
+        "backends": {
+            name: model.client.status()
+            for name, model in initialized_models.items()
+            if hasattr(getattr(model, "client", None), "status")
+        },
+    }
@@ -0,0 +1,327 @@
+import os
+import json
+import uuid
+import shutil
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from core.shared_state import file_lock
+from core.payload_store import intern_payload
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "local_index")
+# Collections above this size are left to Qdrant alone
+LOCAL_INDEX_MAX_POINTS = int(os.getenv("LOCAL_INDEX_MAX_POINTS", "5000"))
+
+
+class LocalHit:
+    """Search hit shaped like a Qdrant ``ScoredPoint`` (id, score, payload)."""
+
+    __slots__ = ("id", "score", "payload", "rerank_score")
+
+    def __init__(self, id, score: float, payload: dict, rerank_score: Optional[float] = None):
+        self.id = id
+        self.score = score
+        self.payload = payload
+        self.rerank_score = rerank_score
+
+
+class LocalIndex:
+    """
+    Exact in-process vector index for small collections.
+
+    Embeddings are L2-normalized and kept in one contiguous float32 matrix
+    (``vectors.npy``, memory-mapped on load). Payloads and point ids live next
+    to it in ``points.jsonl``. Cosine similarity is a dot product on normalized
+    rows, so a batch of queries is answered with a single matrix multiply.
+
+    Several processes (web workers, the log-sync CLI) share the files. Every
+    write takes an exclusive file lock, reloads whatever another process
+    wrote since, applies its change on top and writes a new ``generation``
+    token; reads reload when the token on disk differs from the one in memory.
+    """
+
+    def __init__(self, name: str, root: str = LOCAL_INDEX_DIR):
+        self.name = name
+        self.path = os.path.join(root, name)
+        # Outside the index folder so it survives drop()
+        self.lock_path = os.path.join(root, f".{name}.lock")
+        self.lock = threading.RLock()
+        self.ids: List[Any] = []
+        self.payloads: List[dict] = []
+        self.vectors: Optional[np.ndarray] = None
+        self.generation: Optional[str] = None
+
+    # ---------- Persistence ----------
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.npy")
+
+    @property
+    def _points_path(self) -> str:
+        return os.path.join(self.path, "points.jsonl")
+
+    @property
+    def _generation_path(self) -> str:
+        return os.path.join(self.path, "generation")
+
+    @property
+    def _building_path(self) -> str:
+        return os.path.join(self.path, "building")
+
+    def exists(self) -> bool:
+        return os.path.isdir(self.path)
+
+    def ready(self) -> bool:
+        """False while the copy is being backfilled from Qdrant (see build_local_copy)."""
+        return self.exists() and not os.path.exists(self._building_path)
+
+    def _disk_generation(self) -> Optional[str]:
+        try:
+            with open(self._generation_path, "r") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> "LocalIndex":
+        with self.lock, file_lock(self.lock_path, shared=True):
+            self._load()
+        return self
+
+    def _load(self) -> None:
+        # Caller holds the file lock, so points and vectors are from the same write
+        self.ids, self.payloads = [], []
+        if os.path.exists(self._points_path):
+            with open(self._points_path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        point = json.loads(line)
+                        self.ids.append(point["id"])
+                        self.payloads.append(intern_payload(point["payload"]))
+        if os.path.exists(self._vectors_path):
+            self.vectors = np.load(self._vectors_path, mmap_mode="r")
+        else:
+            self.vectors = None
+        self.generation = self._disk_generation()
+
+    def refresh(self) -> "LocalIndex":
+        """Reload if another process wrote to the index since it was read."""
+        if self._disk_generation() != self.generation:
+            with self.lock, file_lock(self.lock_path, shared=True):
+                if self._disk_generation() != self.generation:
+                    self._load()
+        return self
+
+    def _begin_write(self) -> bool:
+        # Caller holds self.lock and the exclusive file lock
+        if not self.exists():
+            # Dropped by another process (outgrown or deleted); don't resurrect a partial copy
+            self.ids, self.payloads, self.vectors, self.generation = [], [], None, None
+            return False
+        if self._disk_generation() != self.generation:
+            self._load()
+        return True
+
+    def _commit(self) -> None:
+        # A fresh token per write: a dropped and recreated index never matches an old one
+        self.generation = uuid.uuid4().hex
+        tmp = self._generation_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(self.generation)
+        os.replace(tmp, self._generation_path)
+
+    def _save(self, vectors: np.ndarray) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        tmp_vectors = self._vectors_path + ".tmp.npy"
+        np.save(tmp_vectors, np.ascontiguousarray(vectors, dtype=np.float32))
+        os.replace(tmp_vectors, self._vectors_path)
+        self._save_points()
+        self.vectors = np.load(self._vectors_path, mmap_mode="r")
+
+    def _save_points(self) -> None:
+        tmp_points = self._points_path + ".tmp"
+        with open(tmp_points, "w") as f:
+            for pid, payload in zip(self.ids, self.payloads):
+                f.write(json.dumps({"id": pid, "payload": payload}, ensure_ascii=False) + "\n")
+        os.replace(tmp_points, self._points_path)
+        self._commit()
+
+    def create(self, building: bool = False) -> "LocalIndex":
+        with self.lock, file_lock(self.lock_path):
+            self._drop()
+            os.makedirs(self.path, exist_ok=True)
+            if building:
+                open(self._building_path, "w").close()
+            self._commit()
+        return self
+
+    def mark_ready(self) -> None:
+        with self.lock, file_lock(self.lock_path):
+            if os.path.exists(self._building_path):
+                os.remove(self._building_path)
+
+    def drop(self) -> None:
+        with self.lock, file_lock(self.lock_path):
+            self._drop()
+
+    def _drop(self) -> None:
+        self.ids, self.payloads, self.vectors, self.generation = [], [], None, None
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    # ---------- Writes ----------
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, ids: List[Any], vectors, payloads: List[dict]) -> bool:
+        """
+        Upsert points into the index.
+
+        Returns False (and drops the local copy) once the collection outgrows
+        ``LOCAL_INDEX_MAX_POINTS``, or if another process already dropped it;
+        from then on it is served by Qdrant only.
+        """
+        if len(ids) == 0:
+            return True
+        new_vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self.lock, file_lock(self.lock_path):
+            if not self._begin_write():
+                return False
+            position = {pid: i for i, pid in enumerate(self.ids)}
+            current = (
+                np.array(self.vectors, dtype=np.float32)
+                if self.vectors is not None
+                else np.empty((0, new_vectors.shape[1]), dtype=np.float32)
+            )
+            # A batch may repeat an id; like Qdrant, keep its last occurrence
+            last = {pid: row for row, pid in enumerate(ids)}
+            appended = []
+            for row, (pid, payload) in enumerate(zip(ids, payloads)):
+                if last[pid] != row:
+                    continue
+                if pid in position:
+                    current[position[pid]] = new_vectors[row]
+                    self.payloads[position[pid]] = payload
+                else:
+                    position[pid] = len(self.ids)
+                    self.ids.append(pid)
+                    self.payloads.append(payload)
+                    appended.append(row)
+
+            if len(self.ids) > LOCAL_INDEX_MAX_POINTS:
+                self._drop()
+                return False
+
+            self._save(np.concatenate([current, new_vectors[appended]]))
+        return True
+
+    def delete(self, ids: List[Any]) -> int:
+        with self.lock, file_lock(self.lock_path):
+            if not self._begin_write():
+                return 0
+            drop = set(ids)
+            keep = [i for i, pid in enumerate(self.ids) if pid not in drop]
+            removed = len(self.ids) - len(keep)
+            if removed and self.vectors is not None:
+                vectors = np.asarray(self.vectors)[keep]
+                self.ids = [self.ids[i] for i in keep]
+                self.payloads = [self.payloads[i] for i in keep]
+                self._save(vectors)
+            return removed
+
+    def set_payload(self, ids: List[Any], fields: Dict[str, Any]) -> int:
+        """Merge ``fields`` into the payloads of ``ids``; vectors are left alone."""
+        with self.lock, file_lock(self.lock_path):
+            if not self._begin_write():
+                return 0
+            targets = set(ids)
+            updated = 0
+            for i, pid in enumerate(self.ids):
+                if pid in targets:
+                    self.payloads[i] = {**self.payloads[i], **fields}
+                    updated += 1
+            if updated:
+                self._save_points()
+            return updated
+
+    # ---------- Reads ----------
+    def ids_where(self, predicate) -> List[Any]:
+        """Ids of points whose payload satisfies ``predicate``."""
+        self.refresh()
+        with self.lock:
+            return [pid for pid, payload in zip(self.ids, self.payloads) if payload is not None and predicate(payload)]
+
+    def search(self, query_vectors, limit: int) -> List[List[LocalHit]]:
+        """
+        Exact top-k cosine search for a batch of query vectors.
+
+        Args:
+            query_vectors: Array of shape (n_queries, dim) or (dim,).
+            limit: Number of hits per query.
+
+        Returns:
+            One list of hits per query, best first.
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        self.refresh()
+        with self.lock:
+            if self.vectors is None or len(self.ids) == 0 or limit <= 0:
+                return [[] for _ in range(len(queries))]
+            scores = _normalize(queries) @ self.vectors.T
+            ids, payloads = self.ids, self.payloads
+
+        k = min(limit, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+
+        return [
+            [LocalHit(ids[j], float(scores[q, j]), payloads[j]) for j in row]
+            for q, row in enumerate(top)
+        ]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+# ---------- Registry ----------
+_indexes: Dict[str, LocalIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def get_local_index(index_name: str, include_building: bool = False) -> Optional[LocalIndex]:
+    """
+    Return the local copy of an index, or None if it is served by Qdrant only.
+
+    Collections created before local copies existed have none until
+    build_local_copy backfills them. A copy still being backfilled is only
+    returned to writers (``include_building``), so searches never see it half-built.
+    """
+    with _registry_lock:
+        index = _indexes.get(index_name)
+        if index is None:
+            index = LocalIndex(index_name)
+            if not index.exists():
+                return None
+            _indexes[index_name] = index.load()
+        elif not index.exists():
+            del _indexes[index_name]
+            return None
+    return index if include_building or index.ready() else None
+
+
+def create_local_index(index_name: str, building: bool = False) -> LocalIndex:
+    with _registry_lock:
+        index = LocalIndex(index_name).create(building)
+        _indexes[index_name] = index
+        return index
+
+
+def drop_local_index(index_name: str) -> None:
+    with _registry_lock:
+        index = _indexes.pop(index_name, None) or LocalIndex(index_name)
+        index.drop()
@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import threading
+from typing import Dict, Any
+
+from core.index import (
+    build_payload, row_to_sentence, embed_lines, _ensure_collection, _upload_points, _delete_source, _count_where,
+)
+from core.layout import index_exists
+
+# History logs are read from this directory only
+SYNC_ROOT = os.getenv("SYNC_ROOT", "testdata/knowledge_base")
+SYNC_STATE_PATH = os.getenv("SYNC_STATE_PATH", "sync_state.json")
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "512"))
+
+_state_lock = threading.Lock()
+
+
+def _load_state() -> Dict[str, Any]:
+    if not os.path.exists(SYNC_STATE_PATH):
+        return {}
+    with open(SYNC_STATE_PATH, "r") as f:
+        return json.load(f)
+
+
+def _save_state(state: Dict[str, Any]) -> None:
+    tmp = SYNC_STATE_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, SYNC_STATE_PATH)
+
+
+def clear_watermarks(index_name: str) -> int:
+    """Forget the watermarks of every log synced into an index (its next sync is a full rebuild)."""
+    prefix = f"{index_name}::"
+    with _state_lock:
+        state = _load_state()
+        stale = [key for key in state if key.startswith(prefix)]
+        for key in stale:
+            del state[key]
+        if stale:
+            _save_state(state)
+    return len(stale)
+
+
+def resolve_sync_path(path: str) -> str:
+    """Resolve a log path inside SYNC_ROOT; refuse anything outside it."""
+    root = os.path.realpath(SYNC_ROOT)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root:
+        raise ValueError(f"path must be inside {SYNC_ROOT}: {path}")
+    if not os.path.isfile(full):
+        raise FileNotFoundError(path)
+    return full
+
+
+def log_point_id(index_name: str, source: str, line_no: int) -> str:
+    # Stable per (index, file, line) so a rebuild overwrites instead of duplicating
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{index_name}/log/{source}/{line_no}"))
+
+
+def sync_history_log(index_name: str, path: str) -> Dict[str, Any]:
+    """
+    Embed and upsert only the lines appended to a JSONL history log since the last sync.
+
+    The watermark per (index, file) is the byte offset of the last complete
+    line consumed plus a SHA-256 of everything before it. A file shorter than
+    the offset (truncated) or with a different prefix (rewritten), or an index
+    that is missing or empty, gets a full rebuild: the file's points are
+    deleted and every line is re-embedded.
+    Args:
+        index_name: Target index (created if missing).
+        path: Log file, relative to SYNC_ROOT.
+    Returns:
+        {"status", "mode": "full" | "incremental", "reason", "upserted", "offset"}
+    """
+    full_path = resolve_sync_path(path)
+    source = os.path.basename(full_path)
+    key = f"{index_name}::{os.path.relpath(full_path, os.path.realpath(SYNC_ROOT))}"
+
+    with _state_lock:
+        watermark = _load_state().get(key)
+
+    size = os.path.getsize(full_path)
+    prefix = hashlib.sha256()
+    mode, reason = "incremental", None
+    if watermark is None:
+        mode, reason = "full", "first sync"
+    elif not index_exists(index_name) or _count_where(index_name, None) == 0:
+        # Dropped or emptied behind the watermark's back; an incremental sync would leave it empty
+        mode, reason = "full", "index missing or empty"
+    elif size < watermark["offset"]:
+        mode, reason = "full", "truncated"
+
+    with open(full_path, "rb") as f:
+        if mode == "incremental":
+            # Hash the already-synced prefix to detect in-place rewrites
+            remaining = watermark["offset"]
+            while remaining:
+                block = f.read(min(remaining, 1 << 20))
+                prefix.update(block)
+                remaining -= len(block)
+            if prefix.hexdigest() != watermark["sha256"]:
+                mode, reason = "full", "rewritten"
+
+        if mode == "full":
+            f.seek(0)
+            prefix = hashlib.sha256()
+            offset, line_no, row_number = 0, 0, 0
+        else:
+            offset, line_no, row_number = watermark["offset"], watermark["lines"], watermark["rows"]
+
+        # Only complete lines; a partially written last line waits for the next sync
+        tail = f.read()
+        tail = tail[: tail.rfind(b"\n") + 1]
+
+    _ensure_collection(index_name)
+    if mode == "full":
+        _delete_source(index_name, source, doc_type="log")
+
+    rows, ids, numbers = [], [], []
+    for raw in tail.decode("utf-8").splitlines():
+        if raw.strip():
+            rows.append(json.loads(raw))
+            ids.append(log_point_id(index_name, source, line_no))
+            numbers.append(row_number)
+            row_number += 1
+        line_no += 1
+
+    for start in range(0, len(rows), SYNC_BATCH_SIZE):
+        batch = rows[start:start + SYNC_BATCH_SIZE]
+        lines = [row_to_sentence(r) for r in batch]
+        payloads = [build_payload(row, line, source, n) for row, line, n in zip(batch, lines, numbers[start:])]
+        _upload_points(index_name, ids[start:start + len(batch)], embed_lines(lines), payloads)
+
+    prefix.update(tail)
+    offset += len(tail)
+    with _state_lock:
+        state = _load_state()
+        state[key] = {
+            "offset": offset,
+            "sha256": prefix.hexdigest(),
+            "lines": line_no,
+            "rows": row_number,
+            "synced_at": time.time(),
+        }
+        _save_state(state)
+
+    return {"status": "success", "mode": mode, "reason": reason, "upserted": len(rows), "offset": offset}
+
+
+if __name__ == "__main__":
+    # e.g. nightly: python -m core.log_sync history_log_beer history_log_beer.jsonl
+    if len(sys.argv) < 3:
+        print("usage: python -m core.log_sync <index_name> <log.jsonl> [<log.jsonl> ...]")
+        sys.exit(1)
+    for log_path in sys.argv[2:]:
+        print(log_path, sync_history_log(sys.argv[1], log_path))
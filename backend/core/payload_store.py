@@ -0,0 +1,132 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+# Raw-row keys kept out of the vector store (PAYLOAD_KEEP_ROW=false) live here, one SQLite file per index
+PAYLOAD_STORE_DIR = os.getenv("PAYLOAD_STORE_DIR", "payload_store")
+# Distinct strings the interning table holds; past that, new strings are used as they are
+PAYLOAD_INTERN_MAX = int(os.getenv("PAYLOAD_INTERN_MAX", "100000"))
+# Payload fields whose values repeat from point to point (same table, column, source file, rule)
+INTERNED_FIELDS = ("table", "column", "doc_type", "table_name", "rule", "domain_rule", "tenant")
+
+
+# ---------- Interning ----------
+class StringTable:
+    """
+    Bounded interning table: equal strings come back as one shared object,
+    so thousands of payloads naming the same table, column or file hold
+    one copy of each name instead of one per point.
+    """
+
+    def __init__(self, max_size: int = PAYLOAD_INTERN_MAX):
+        self.max_size = max_size
+        self.strings: Dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def intern(self, value):
+        if not isinstance(value, str):
+            return value
+        shared = self.strings.get(value)
+        if shared is not None:
+            return shared
+        with self.lock:
+            if len(self.strings) >= self.max_size:
+                return value
+            return self.strings.setdefault(value, value)
+
+
+strings = StringTable()
+
+
+def _intern_fields(fields: dict) -> dict:
+    # Keys too: json.loads gives every point its own copy of "table", "column", ...
+    return {
+        strings.intern(k): strings.intern(v) if k in INTERNED_FIELDS else v
+        for k, v in fields.items()
+    }
+
+
+def intern_payload(payload: Optional[dict]) -> Optional[dict]:
+    """Copy of a payload whose keys and repeated fields (its raw row's too) are shared strings."""
+    if not payload:
+        return payload
+    interned = _intern_fields(payload)
+    if isinstance(interned.get("row"), dict):
+        interned["row"] = _intern_fields(interned["row"])
+    return interned
+
+
+# ---------- Side store for raw-row extras ----------
+class RowStore:
+    """
+    Raw-row keys of one index, keyed by point id, in a SQLite file: readable
+    and writable from every worker, and read one point at a time instead of
+    being held in memory.
+    """
+
+    def __init__(self, index_name: str, root: str = PAYLOAD_STORE_DIR):
+        self.path = os.path.join(root, index_name.replace(os.sep, "_") + ".sqlite")
+        self._local = threading.local()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and not self.exists():
+            conn.close()  # dropped by another process; don't keep writing to the unlinked file
+            conn = None
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS row_extra (id TEXT PRIMARY KEY, row TEXT NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def put(self, ids: List[Any], rows: List[dict]) -> None:
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO row_extra (id, row) VALUES (?, ?)",
+                [(str(pid), json.dumps(row, ensure_ascii=False)) for pid, row in zip(ids, rows)],
+            )
+
+    def get(self, point_id) -> Optional[dict]:
+        if not self.exists():
+            return None
+        found = self._conn().execute("SELECT row FROM row_extra WHERE id = ?", (str(point_id),)).fetchone()
+        return json.loads(found[0]) if found else None
+
+    def delete(self, ids: List[Any]) -> None:
+        if ids and self.exists():
+            with self._conn() as conn:
+                conn.executemany("DELETE FROM row_extra WHERE id = ?", [(str(pid),) for pid in ids])
+
+    def drop(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+
+_row_stores: Dict[str, RowStore] = {}
+_row_stores_lock = threading.Lock()
+
+
+def get_row_store(index_name: str) -> RowStore:
+    with _row_stores_lock:
+        store = _row_stores.get(index_name)
+        if store is None:
+            store = _row_stores[index_name] = RowStore(index_name)
+        return store
+
+
+def drop_row_store(index_name: str) -> None:
+    with _row_stores_lock:
+        store = _row_stores.pop(index_name, None) or RowStore(index_name)
+    store.drop()
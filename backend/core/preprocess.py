@@ -1,5 +1,14 @@
+import os
+import re
 import json
 
+# Default number of context tokens each row may spend in the LLM prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "256"))
+# Character-trigram Jaccard similarity above which two snippets count as duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.9
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
 def search_preprocess(
     index_type, pivot_names, pivot_row_values, target_name, target_row_value
 ):
@@ -41,10 +50,61 @@ def prompt_preprocess(description, target_name, target_row_value,
         "value": "" if val is None else str(val),
         "guidance": description or "Clean or impute the value according to the rule.",
     }
-    # simple + safe: keep only the 'values' strings, first 3
+    # simple + safe: keep only the 'values' strings (already packed to the token budget)
     if context:
-        payload["context"] = [c["values"] for c in context if isinstance(c, dict) and "values" in c][:3]
+        payload["context"] = [c["values"] for c in context if isinstance(c, dict) and "values" in c]
     # if context:
     #     payload["context"] = context  # keep minimal; you control what you put here
         # payload["context"] = "dirty: 13 hrs and 8 min → clean: 788"
-    return json.dumps(payload, ensure_ascii=False)
\ No newline at end of file
+    return json.dumps(payload, ensure_ascii=False)
+
+
+def estimate_tokens(text: str) -> int:
+    # Word pieces and punctuation marks; close to BPE counts for short structured lines
+    return len(_TOKEN_RE.findall(str(text)))
+
+
+def _context_score(item: dict) -> float:
+    # Prefer the reranker's judgement; merged multi-index hits carry "a || b" score strings
+    score = item.get("rerank_score", item.get("score"))
+    if isinstance(score, str):
+        parts = [float(x) for x in score.split("||") if x.strip()]
+        return max(parts) if parts else 0.0
+    return float(score) if score is not None else 0.0
+
+
+def _trigrams(text: str) -> set:
+    norm = " ".join(re.sub(r"[^\w\s]", " ", str(text).lower()).split())
+    return {norm[i:i + 3] for i in range(max(1, len(norm) - 2))}
+
+
+def pack_context(context, token_budget=None):
+    """
+    Fill a token budget with the highest-scoring, de-duplicated evidence.
+
+    Args:
+        context: Retrieved hits for one row ({"values", "score", ...} dicts) or None.
+        token_budget: Max context tokens for the row (defaults to CONTEXT_TOKEN_BUDGET).
+
+    Returns:
+        (packed hits best first, number of context tokens used)
+    """
+    if not context:
+        return [], 0
+    budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+
+    candidates = [c for c in context if isinstance(c, dict) and "values" in c]
+    candidates.sort(key=_context_score, reverse=True)
+
+    packed, kept_grams, used = [], [], 0
+    for item in candidates:
+        grams = _trigrams(item["values"])
+        if any(len(grams & g) / len(grams | g) >= NEAR_DUPLICATE_THRESHOLD for g in kept_grams):
+            continue
+        tokens = estimate_tokens(item["values"])
+        if used + tokens > budget:
+            continue
+        packed.append(item)
+        kept_grams.append(grams)
+        used += tokens
+    return packed, used
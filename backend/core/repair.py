@@ -1,8 +1,15 @@
+import os
 from typing import Optional
 from core.search import search_data
 from core.llm import prompt_with_data, call_llm
+from core.vector_store import VectorStoreUnavailable
+from core.detect import ColumnDetector, detect_cells
+from core.fd_repair import DependencyRepairer, repair_by_dependencies
 import json
 
+# Repair without retrieved context (response flagged "degraded") when the vector store is down
+VECTOR_STORE_FALLBACK = os.getenv("VECTOR_STORE_FALLBACK", "true").lower() == "true"
+
 
 def format_evidence(source_info: dict) -> str:
     """
@@ -278,60 +285,93 @@ async def repair_data(
     reasoner_name: str,
     index_name: list[str],
     index_type: Optional[str],
+    will_rerank: bool = False,
+    top_k: Optional[int] = None,
+    context_token_budget: Optional[int] = None,
+    detect: bool = False,
+    detector: Optional[ColumnDetector] = None,
+    fd_repair: bool = False,
+    fd_model: Optional[DependencyRepairer] = None,
 ) -> dict:
 
+    if (fd_repair or fd_model is not None) and pivot_names and len(pivot_data) == len(target_data):
+        return await _repair_with_dependencies(
+            entity_description, target_name, target_data, pivot_names, pivot_data, reasoner_name,
+            index_name, index_type, will_rerank, top_k, context_token_budget, detect, detector, fd_model,
+        )
+
+    if detect or detector is not None:
+        return await _repair_flagged(
+            entity_description, target_name, target_data, pivot_names, pivot_data, reasoner_name,
+            index_name, index_type, will_rerank, top_k, context_token_budget, detector,
+        )
+
     retrieved_list = []
- 
-    if index_name is not None:
-        if len(index_name) == 1:
-            # Only one index → just use [0]
-            search_results = await search_data(
-                entity_description,
-                index_name[0],
-                index_type,
-                target_name,
-                target_data,
-                pivot_names,
-                pivot_data,
-                False,
-            )
-            if search_results["status"] == "fail":
-                return search_results
-            retrieved_list = search_results["results"]
+    degraded = None
 
-        else:
-            # Multiple indices → accumulate results
-            for idx_name in index_name:
+    try:
+        if index_name is not None:
+            if len(index_name) == 1:
+                # Only one index → just use [0]
                 search_results = await search_data(
                     entity_description,
-                    idx_name,
+                    index_name[0],
                     index_type,
                     target_name,
                     target_data,
                     pivot_names,
                     pivot_data,
-                    False,
+                    will_rerank,
+                    top_k,
                 )
                 if search_results["status"] == "fail":
                     return search_results
-                retrieved_list.extend(search_results["results"])
-
-            # Merge results into retrieved_list itself
-            if len(retrieved_list) > 1:
-                half = len(retrieved_list) // 2
-                first_half = retrieved_list[:half]
-                second_half = retrieved_list[half:]
-
-                retrieved_list = [
-                    [
-                        {
-                            "values": f"{f[0]['values']} || {s[0]['values']}",
-                            "table_name": f"{f[0]['table_name']} || {s[0]['table_name']}",
-                            "score": f"{f[0]['score']} || {s[0]['score']}",
-                        }
+                retrieved_list = search_results["results"]
+
+            else:
+                # Multiple indices → accumulate results
+                for idx_name in index_name:
+                    search_results = await search_data(
+                        entity_description,
+                        idx_name,
+                        index_type,
+                        target_name,
+                        target_data,
+                        pivot_names,
+                        pivot_data,
+                        will_rerank,
+                        top_k,
+                    )
+                    if search_results["status"] == "fail":
+                        return search_results
+                    retrieved_list.extend(search_results["results"])
+
+                # Merge results into retrieved_list itself
+                if len(retrieved_list) > 1:
+                    half = len(retrieved_list) // 2
+                    first_half = retrieved_list[:half]
+                    second_half = retrieved_list[half:]
+
+                    # Head entry pairs the best hit of each index (used for conflict analysis);
+                    # any further top-k hits follow so the context packer can use them
+                    retrieved_list = [
+                        [
+                            {
+                                "values": f"{f[0]['values']} || {s[0]['values']}",
+                                "table_name": f"{f[0]['table_name']} || {s[0]['table_name']}",
+                                "score": f"{f[0]['score']} || {s[0]['score']}",
+                            }
+                        ] + f[1:] + s[1:]
+                        if f and s else f + s
+                        for f, s in zip(first_half, second_half)
                     ]
-                    for f, s in zip(first_half, second_half)
-                ]
+    except VectorStoreUnavailable as e:
+        # Vector store down: repair from the LLM alone rather than failing the request
+        if not VECTOR_STORE_FALLBACK:
+            return {"status": "fail", "message": str(e)}
+        print("WARNING vector store unavailable, repairing without retrieval:", e)
+        retrieved_list = []
+        degraded = str(e)
 
     # Call model with nearest tuples and target tuple
     prompt_results = await prompt_with_data(
@@ -342,6 +382,7 @@ async def repair_data(
         pivot_names,
         pivot_data,
         retrieved_list,
+        context_token_budget,
     )
 
 
@@ -368,4 +409,119 @@ async def repair_data(
         }
     
     # Return final results to frontend
-    return {"status": "success", "results": results}
+    response = {"status": "success", "results": results}
+    if degraded is not None:
+        response["degraded"] = True
+        response["degraded_reason"] = degraded
+    return response
+
+
+async def _repair_flagged(
+    entity_description, target_name, target_data, pivot_names, pivot_data, reasoner_name,
+    index_name, index_type, will_rerank, top_k, context_token_budget, detector=None,
+) -> dict:
+    """
+    Error-detection gate: only cells the detector flags go through retrieval
+    and the LLM; the rest come back unchanged with "skipped": True.
+    Args:
+        detector: Detector to use (e.g. one per table step); if None one is
+            learned from the clean values in index_name.
+    """
+    values = [t.get("value") for t in target_data]
+    try:
+        if detector is not None:
+            flags, _ = detector.predict(values)
+        else:
+            flags = detect_cells(target_name, values, index_name)
+    except VectorStoreUnavailable as e:
+        # No KB to learn from: the statistical checks alone still work
+        print("WARNING vector store unavailable, detecting without the knowledge base:", e)
+        flags = detect_cells(target_name, values)
+
+    flagged = [i for i, flag in enumerate(flags) if flag]
+    results = [
+        {"value": value, "table_name": None, "row_number": None, "citation": None, "skipped": True}
+        for value in values
+    ]
+    response = {"status": "success", "results": results, "flagged": len(flagged), "cells": len(values)}
+    if not flagged:
+        return response
+
+    repaired = await repair_data(
+        entity_description,
+        target_name,
+        [target_data[i] for i in flagged],
+        pivot_names,
+        [pivot_data[i] for i in flagged] if len(pivot_data) == len(target_data) else pivot_data,
+        reasoner_name,
+        index_name,
+        index_type,
+        will_rerank,
+        top_k,
+        context_token_budget,
+    )
+    if repaired["status"] == "fail":
+        return repaired
+    for i, result in zip(flagged, repaired["results"]):
+        results[i] = result
+    for key in ("degraded", "degraded_reason"):
+        if key in repaired:
+            response[key] = repaired[key]
+    return response
+
+
+async def _repair_with_dependencies(
+    entity_description, target_name, target_data, pivot_names, pivot_data, reasoner_name,
+    index_name, index_type, will_rerank, top_k, context_token_budget, detect=False, detector=None, fd_model=None,
+) -> dict:
+    """
+    Functional-dependency stage: cells whose pivot group (e.g. same zip) agrees
+    on one target value with enough support take the group majority directly,
+    with its confidence; only the rest go on to detection/retrieval/the LLM.
+    Args:
+        fd_model: Already fitted DependencyRepairer (e.g. over a whole table); if
+            None one is fitted on this request's rows.
+    """
+    values = [t.get("value") for t in target_data]
+    pivot_rows = [p.get("values") for p in pivot_data]
+    predicted = repair_by_dependencies(values, pivot_names, pivot_rows, fd_model)
+    determined = predicted["pivot"].notna().to_numpy()
+
+    results = [None] * len(target_data)
+    for i in determined.nonzero()[0]:
+        row = predicted.iloc[i]
+        results[i] = {
+            "value": row["value"],
+            "table_name": f"dependency: {row['pivot']} -> {target_name}",
+            "row_number": None,
+            "citation": None,
+            "confidence": round(float(row["confidence"]), 4),
+            "dependency": {"pivot": row["pivot"], "support": int(row["support"])},
+        }
+
+    rest = [i for i in range(len(target_data)) if not determined[i]]
+    response = {"status": "success", "results": results, "determined": int(determined.sum())}
+    if rest:
+        repaired = await repair_data(
+            entity_description,
+            target_name,
+            [target_data[i] for i in rest],
+            pivot_names,
+            [pivot_data[i] for i in rest],
+            reasoner_name,
+            index_name,
+            index_type,
+            will_rerank,
+            top_k,
+            context_token_budget,
+            detect,
+            detector,
+        )
+        if repaired["status"] == "fail":
+            return repaired
+        for i, result in zip(rest, repaired["results"]):
+            results[i] = result
+        for key in ("flagged", "degraded", "degraded_reason"):
+            if key in repaired:
+                response[key] = repaired[key]
+    return response
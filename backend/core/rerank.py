@@ -0,0 +1,79 @@
+import os
+import threading
+
+from core.local_index import LocalHit
+from core.retrieval_cache import LRUCache
+
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "50000"))
+# With the embedding sidecar running, it holds the cross-encoder for all workers
+EMBEDDING_SOCKET = os.getenv("EMBEDDING_SOCKET")
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_cross_encoder():
+    """
+    The cross-encoder, on first use: the sidecar's (EmbeddingClient.predict)
+    when EMBEDDING_SOCKET is set, else a CPU copy in this worker.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                if EMBEDDING_SOCKET:
+                    from embedding_service import EmbeddingClient
+
+                    _model = EmbeddingClient(EMBEDDING_SOCKET)
+                else:
+                    from sentence_transformers import CrossEncoder
+
+                    _model = CrossEncoder(RERANK_MODEL, device="cpu")
+    return _model
+
+
+# Cross-encoder scores keyed by (query, candidate text)
+score_cache = LRUCache(RERANK_CACHE_SIZE)
+
+
+def rerank_batch(queries: list[str], hits_per_query: list[list], top_k: int) -> list[list[LocalHit]]:
+    """
+    Rerank candidate hits for many queries with one batched cross-encoder pass.
+
+    Args:
+        queries: One query string per target value.
+        hits_per_query: Candidate hits (Qdrant ScoredPoints or LocalHits) per query.
+        top_k: Number of hits to keep per query after reranking.
+
+    Returns:
+        Hits per query ordered by cross-encoder score. The original retrieval
+        score is kept in ``score``; the cross-encoder score is in ``rerank_score``.
+    """
+    scores_by_key, pending = {}, []
+    for query, hits in zip(queries, hits_per_query):
+        for hit in hits:
+            key = (query, hit.payload["values"])
+            if key in scores_by_key:
+                continue
+            cached = score_cache.get(key)
+            scores_by_key[key] = cached
+            if cached is None:
+                pending.append(key)
+
+    if pending:
+        scores = get_cross_encoder().predict([list(k) for k in pending], batch_size=RERANK_BATCH_SIZE)
+        for key, score in zip(pending, scores):
+            scores_by_key[key] = float(score)
+            score_cache.put(key, float(score))
+
+    reranked = []
+    for query, hits in zip(queries, hits_per_query):
+        scored = [
+            LocalHit(hit.id, hit.score, hit.payload, scores_by_key[(query, hit.payload["values"])])
+            for hit in hits
+        ]
+        scored.sort(key=lambda h: -h.rerank_score)
+        reranked.append(scored[:top_k])
+    return reranked
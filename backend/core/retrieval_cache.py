@@ -0,0 +1,119 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from core.shared_state import shared_counter, state_path
+
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "20000"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "20000"))
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU map. With ``max_bytes``, entries are also weighed by
+    ``sizeof`` and evicted until their total fits; a single entry larger than
+    the budget is not cached at all.
+    """
+
+    def __init__(self, max_size: int, max_bytes: Optional[int] = None, sizeof: Optional[Callable[[Any], int]] = None):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.lock = threading.Lock()
+        self.items: "OrderedDict" = OrderedDict()
+        self.sizes: dict = {}
+        self.bytes = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        size = int(self.sizeof(value)) if self.max_bytes is not None and self.sizeof else 0
+        with self.lock:
+            if key in self.items:
+                del self.items[key]
+                self.bytes -= self.sizes.pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self.items[key] = value
+            self.sizes[key] = size
+            self.bytes += size
+            while len(self.items) > self.max_size or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                evicted, _ = self.items.popitem(last=False)
+                self.bytes -= self.sizes.pop(evicted)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.items.clear()
+            self.sizes.clear()
+            self.bytes = 0
+
+
+# ---------- Index versions ----------
+# Every write to an index bumps its version, which is part of every cache key,
+# so stale entries are never hit again and simply age out of the LRU. The
+# counters are memory-mapped files under INDEX_STATE_DIR, so a write by any
+# worker (or the log-sync CLI) invalidates the caches of all of them at once.
+def get_index_version(index_name: str) -> int:
+    return shared_counter(state_path(index_name, "version")).value()
+
+
+def bump_index_version(index_name: str) -> int:
+    return shared_counter(state_path(index_name, "version")).bump()
+
+
+# ---------- Retrieval results ----------
+_results = LRUCache(RETRIEVAL_CACHE_SIZE)
+
+
+def _result_key(index_name: str, query: str, filters: Optional[dict], top_k: int) -> tuple:
+    frozen = json.dumps(filters or {}, sort_keys=True, default=str)
+    return (index_name, get_index_version(index_name), query, frozen, top_k)
+
+
+def get_cached_results(index_name: str, query: str, filters: Optional[dict], top_k: int):
+    """Return cached formatted hits for a query, or None on a miss."""
+    hits = _results.get(_result_key(index_name, query, filters, top_k))
+    return None if hits is None else [dict(h) for h in hits]
+
+
+def put_cached_results(index_name: str, query: str, filters: Optional[dict], top_k: int, hits: list) -> None:
+    _results.put(_result_key(index_name, query, filters, top_k), [dict(h) for h in hits])
+
+
+# ---------- Query embeddings ----------
+# Keyed by text only: embeddings depend on the model, not on any index.
+_embeddings = LRUCache(EMBEDDING_CACHE_SIZE)
+
+
+def lookup_embeddings(queries: list[str]) -> tuple:
+    """Cached vectors (None where missing) and the distinct queries still to encode."""
+    vectors = [_embeddings.get(q) for q in queries]
+    missing = list(dict.fromkeys(q for q, v in zip(queries, vectors) if v is None))
+    return vectors, missing
+
+
+def store_embeddings(encoded: dict) -> None:
+    for q, vec in encoded.items():
+        _embeddings.put(q, vec)
+
+
+def encode_queries(model, queries: list[str]):
+    """
+    Encode query texts, reusing cached embeddings and batching the misses.
+
+    Returns:
+        List of 1-D numpy vectors, one per query.
+    """
+    vectors, missing = lookup_embeddings(queries)
+    if missing:
+        encoded = dict(zip(missing, model.encode(missing)))
+        store_embeddings(encoded)
+        vectors = [v if v is not None else encoded[q] for q, v in zip(queries, vectors)]
+    return vectors
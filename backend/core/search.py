@@ -1,11 +1,25 @@
 import re
-from core.preprocess import search_preprocess
-from core import qdrant_client, sentence_model
+import asyncio
+from typing import Optional
+from core.index import rebuild_lexical_index, expand_payload
+from core.local_index import get_local_index, LocalHit
+from core.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from core.rerank import rerank_batch
+from core.retrieval_cache import get_cached_results, put_cached_results
+from core.batching import encode_queries_batched, search_batcher
+from core.layout import physical_name, tenant_filter, index_exists
+from core.vector_store import VectorStoreUnavailable
 
 NO_RERANK_SINGLE_TOP_K = 3
 NO_RERANK_MULTIPLE_TOP_K = 2
 RERANK_SINGLE_TOP_K = 30
 RERANK_MULTIPLE_TOP_K = 15
+# Default number of results per target value handed on to the LLM
+RESULT_TOP_K = 1
+# Default number of reranked results per target value handed on to the LLM
+RERANK_RESULT_TOP_K = 3
+# Damping constant for reciprocal-rank fusion of vector and lexical candidates
+RRF_K = 60
 
 
 async def search_data(
@@ -17,96 +31,185 @@ async def search_data(
     pivot_names: list[str],
     pivot_data: list[dict],
     will_rerank: bool = False,
+    top_k: Optional[int] = None,
 ) -> dict:
     ids = [data["id"] for data in target_data]
     target_values = [data["value"] for data in target_data]
     pivot_values = [data["values"] for data in pivot_data]
 
-    # Check if index exists
-    if not (
-        qdrant_client.collection_exists(collection_name=index_name)
-    ):
-        return {"status": "fail", "message": "index does not exist"}
-
     # Determine the number of top-k results to retrieve based on type of index chosen
     if index_type == "both":
         k = RERANK_MULTIPLE_TOP_K if will_rerank else NO_RERANK_MULTIPLE_TOP_K
     else:
         k = RERANK_SINGLE_TOP_K if will_rerank else NO_RERANK_SINGLE_TOP_K
 
+    # Number of results per row handed on; the candidate pool is never smaller than that
+    if top_k is None:
+        top_k = RERANK_RESULT_TOP_K if will_rerank else RESULT_TOP_K
+    k = max(k, top_k)
+
+    # Repeated dirty values give identical queries; reuse results until the index changes
+    queries = [
+        build_search_query(target_name, tgt, entity_description)
+        for tgt in target_values
+    ]
+    filters = {"index_type": index_type, "rerank": will_rerank}
+    results = [get_cached_results(index_name, q, filters, top_k) for q in queries]
+
+    pending = {}  # distinct uncached query -> its target value
+    for q, tgt, cached in zip(queries, target_values, results):
+        if cached is None:
+            pending.setdefault(q, tgt)
+    if not pending:
+        return {"status": "success", "results": results}
+    pending_queries = list(pending)
+    pending_targets = list(pending.values())
+
+    # Small collections keep an in-process copy; serve those without a Qdrant round-trip
+    local_index = get_local_index(index_name)
+
+    # Check if index exists
+    if local_index is None and not await asyncio.to_thread(index_exists, index_name):
+        return {"status": "fail", "message": "index does not exist"}
+
+    # Encode each distinct query once; embeddings are cached across requests and
+    # misses are encoded in batches shared with concurrent requests
+    query_vectors = None
+    if index_type in ["semantic", "both"]:
+        query_vectors = await encode_queries_batched(pending_queries)
+
+    # Local index: answer all queries with one matrix multiply
+    local_hits = None
+    if local_index is not None and query_vectors is not None:
+        try:
+            local_hits = local_index.search(query_vectors, limit=k)
+        except Exception as e:
+            print("ERROR in local search, falling back to Qdrant:", e)
+            local_hits = None
+
+    # Lexical index is built at ingestion time; collections that predate it are backfilled once
+    lexical_index = None
+    if index_type in ["syntactic", "both"]:
+        try:
+            lexical_index = get_lexical_index(index_name) or await asyncio.to_thread(rebuild_lexical_index, index_name)
+        except VectorStoreUnavailable:
+            raise  # repair_data decides whether to go on without retrieval
+        except Exception as e:
+            print("ERROR loading lexical index", e)
+            return {"status": "fail", "message": str(e)}
+
+    # Qdrant: every row's query (and other requests' queries) goes out in shared query_batch_points calls
+    remote_hits = None
+    if index_type in ["semantic", "both"] and local_hits is None:
+        try:
+            remote_hits = await search_batcher.submit_many(
+                [(vec.tolist(), tenant_filter(index_name), k) for vec in query_vectors],
+                key=physical_name(index_name),
+            )
+        except VectorStoreUnavailable:
+            raise
+        except Exception as e:
+            print("ERROR HERE 111", e)
+            return {"status": "fail", "message": str(e)}
+
     # Retrieve using chosen index
-    results = []
-    for pvt_row, tgt in zip(pivot_values, target_values):
-        # print("*"*50)
-        # print("DOING", pvt_row)
-        search_results = []
+    row_hits = []
+    for row_idx, tgt in enumerate(pending_targets):
+        vector_hits, lexical_hits = [], []
         try:
-            if index_type in ["semantic", "both"]:
-                # Format data into appropriate query format for Qdrant
-                # search_query = search_preprocess(
-                #     index_type="semantic",
-                #     pivot_names=pivot_names,
-                #     pivot_row_values=pvt_row,
-                #     target_name=target_name,
-                #     target_row_value=tgt,
-                # )
-                search_query = build_search_query(target_name, tgt,entity_description)
-
-                # Encode Query using Sentence Transformer
-                search_query_embedding = sentence_model.encode(search_query).tolist()
-                
-                # Get top-k results from Qdrant
-                qdrant_results = qdrant_client.search(
-                    collection_name=index_name,
-                    query_vector=search_query_embedding,
-                    with_payload=True,
-
-                    limit=1,
-                )  # Expected Format: [{"values": str, "table_name": str, "row_number": int, "score": float} , {"values": str, "table_name": str, "row_number": int, "score": float} , ... ]
-                qdrant_results_formatted = [
-                    {
-                        "values": x.payload["values"],
-                        "table_name": x.payload["table_name"],
-                        "row_number": x.payload["row_number"],
-                        "score": x.score
-                    }
-                    for x in qdrant_results
-                ]
-
-                search_results.append(qdrant_results_formatted)
-                
+            if index_type in ["semantic", "both"] and local_hits is not None:
+                vector_hits = local_hits[row_idx]
+
+            elif index_type in ["semantic", "both"]:
+                vector_hits = remote_hits[row_idx]
+                for hit in vector_hits:
+                    hit.payload = expand_payload(hit.payload, index_name, hit.id)
 
             if index_type in ["syntactic", "both"]:
-                # Format data into appropriate query format for ES
-                search_query = search_preprocess(
-                    "syntactic", pivot_names, pvt_row, target_name, tgt
+                lexical_hits = normalize_lexical_scores(
+                    lexical_index.search(build_lexical_query(target_name, tgt), limit=k)
                 )
 
-                search_query_body = {
-                    "_source": ["values", "table_name", "row_number"],
-                    "query": {
-                        "match": {
-                            "values": {"query": search_query, "fuzziness": "AUTO"}
-                        }
-                    },
-                }
-
-
+        except VectorStoreUnavailable:
+            raise
         except Exception as e:
             print("ERROR HERE 111", e)
             return {"status": "fail", "message": str(e)}
 
-        # Flattten in case both indexes are used
-        if search_results != [] and type(search_results[0]) == list:
-            search_results = [item for sublist in search_results for item in sublist]
-        # print("SEARCH RESULTS", type(search_results), type(search_results[0]), search_results)
-        results.append(search_results)
+        if index_type == "both":
+            row_hits.append(fuse_hits(vector_hits, lexical_hits))
+        else:
+            row_hits.append(list(vector_hits or lexical_hits))
+
+    # Rerank the wide candidate pool of every row in one cross-encoder pass
+    cacheable = True
+    if will_rerank and any(row_hits):
+        try:
+            # CPU-bound (or a blocking call to the sidecar); keep it off the event loop
+            row_hits = await asyncio.to_thread(rerank_batch, pending_queries, row_hits, top_k=top_k)
+        except Exception as e:
+            print("ERROR in rerank, keeping retrieval order:", e)
+            row_hits = [hits[:top_k] for hits in row_hits]
+            # Not reranked, so not fit to be served later as reranked results
+            cacheable = False
+    else:
+        row_hits = [hits[:top_k] for hits in row_hits]
+
+    # Expected Format: [{"values": str, "table_name": str, "row_number": int, "score": float}, ...]
+    fresh = {}
+    for q, hits in zip(pending_queries, row_hits):
+        fresh[q] = format_hits(hits)
+        if cacheable:
+            put_cached_results(index_name, q, filters, top_k, fresh[q])
+    results = [
+        cached if cached is not None else [dict(h) for h in fresh[q]]
+        for q, cached in zip(queries, results)
+    ]
 
     # results is 2D list where for each target value, we have a list of top-k results
-    # print("SEARCH RESULTS", type(results), results)
     return {"status": "success", "results": results}
 
 
+def format_hits(hits) -> list[dict]:
+    # Works for Qdrant ScoredPoints and LocalHits alike
+    formatted = []
+    for x in hits:
+        item = {
+            "values": x.payload["values"],
+            "table_name": x.payload["table_name"],
+            "row_number": x.payload["row_number"],
+            "score": x.score
+        }
+        if getattr(x, "rerank_score", None) is not None:
+            item["rerank_score"] = x.rerank_score
+        formatted.append(item)
+    return formatted
+
+
+def normalize_lexical_scores(hits: list) -> list:
+    # BM25 scores are unbounded; scale by the best hit so they sit in (0, 1] like cosine scores
+    if not hits:
+        return hits
+    top = hits[0].score or 1.0
+    return [LocalHit(h.id, h.score / top, h.payload) for h in hits]
+
+
+def fuse_hits(vector_hits: list, lexical_hits: list) -> list:
+    """
+    Combine vector and lexical candidates by reciprocal-rank fusion.
+
+    Fused order comes from RRF; each hit keeps its cosine score when the vector
+    search found it, otherwise its normalized lexical score.
+    """
+    fused = reciprocal_rank_fusion([list(vector_hits), list(lexical_hits)], k=RRF_K)
+    return [hits[0] for _, hits in fused]
+
+
+def build_lexical_query(target_name: str, target_data: str) -> str:
+    # Column name plus the dirty value itself; the n-gram index absorbs typos
+    return f"{target_name} {target_data}"
+
+
 def build_search_query(
     target_name: str,            # column name
     target_data: str,            # dirty value
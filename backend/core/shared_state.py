@@ -0,0 +1,87 @@
+import os
+import mmap
+import fcntl
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Cross-process state of the indexes (version counters) shared by all workers on one host
+INDEX_STATE_DIR = os.getenv("INDEX_STATE_DIR", "index_state")
+
+_COUNTER = struct.Struct("<Q")
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False):
+    """
+    Advisory lock on ``path`` (created if missing) held for the ``with`` block.
+
+    flock locks belong to the open file, so the lock also serialises threads
+    of one process, not only separate processes.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def state_path(name: str, suffix: str) -> str:
+    """File under INDEX_STATE_DIR for one index."""
+    safe = name.replace(os.sep, "_").replace("/", "_")
+    return os.path.join(INDEX_STATE_DIR, f"{safe}.{suffix}")
+
+
+class SharedCounter:
+    """
+    64-bit counter in a small memory-mapped file. Every process that maps
+    the file sees a bump at once, and reading it costs no system call. The
+    file is created by the first bump; until then the counter reads 0.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self._lock = threading.Lock()
+        self._map: Optional[mmap.mmap] = None
+
+    def _open(self, create: bool) -> Optional[mmap.mmap]:
+        with self._lock:
+            if self._map is None:
+                if not os.path.exists(self.path):
+                    if not create:
+                        return None
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    tmp = f"{self.path}.{os.getpid()}.tmp"
+                    with open(tmp, "wb") as f:
+                        f.write(_COUNTER.pack(0))
+                    os.replace(tmp, self.path)
+                with open(self.path, "r+b") as f:
+                    self._map = mmap.mmap(f.fileno(), _COUNTER.size)
+            return self._map
+
+    def value(self) -> int:
+        counter = self._map or self._open(create=False)
+        return 0 if counter is None else _COUNTER.unpack_from(counter, 0)[0]
+
+    def bump(self) -> int:
+        with file_lock(self.lock_path):
+            counter = self._map or self._open(create=True)
+            value = _COUNTER.unpack_from(counter, 0)[0] + 1
+            _COUNTER.pack_into(counter, 0, value)
+            return value
+
+
+_counters: Dict[str, SharedCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def shared_counter(path: str) -> SharedCounter:
+    with _counters_lock:
+        counter = _counters.get(path)
+        if counter is None:
+            counter = _counters[path] = SharedCounter(path)
+        return counter
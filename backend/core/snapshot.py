@@ -0,0 +1,179 @@
+import os
+import json
+import time
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from core import qdrant_client, sentence_model, EMBEDDING_MODEL
+from core.index import _ensure_collection, _upload_points, _write_points, expand_payload
+from core.local_index import drop_local_index
+from core.lexical_index import drop_lexical_index
+from core.retrieval_cache import bump_index_version
+from core.layout import TENANT_KEY, is_shared, physical_name, tenant_filter, index_exists, drop_index_storage
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "1000"))
+
+
+def _json_column(values: list) -> np.ndarray:
+    return np.frombuffer(json.dumps(values, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+
+
+def _read_json(array: np.ndarray):
+    return json.loads(array.tobytes().decode("utf-8"))
+
+
+def _pack_payloads(payloads: List[dict]) -> Dict[str, np.ndarray]:
+    """
+    Store payloads column by column: purely numeric fields become numpy
+    arrays, everything else one JSON array per field.
+    """
+    keys = []
+    for payload in payloads:
+        keys.extend(k for k in payload if k not in keys)
+    columns = {}
+    for key in keys:
+        values = [p.get(key) for p in payloads]
+        numeric = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+        if numeric and all(isinstance(v, int) for v in values):
+            columns[f"num__{key}"] = np.asarray(values, dtype=np.int64)
+        elif numeric:
+            columns[f"num__{key}"] = np.asarray(values, dtype=np.float64)
+        else:
+            columns[f"json__{key}"] = _json_column(values)
+    return columns
+
+
+def _unpack_payloads(data, count: int) -> List[dict]:
+    payloads = [{} for _ in range(count)]
+    for name in data.files:
+        kind, _, key = name.partition("__")
+        if kind == "num":
+            values = data[name].tolist()
+        elif kind == "json":
+            values = _read_json(data[name])
+        else:
+            continue
+        for payload, value in zip(payloads, values):
+            payload[key] = value
+    return payloads
+
+
+def snapshot_path(index_name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{index_name}.npz")
+
+
+def export_snapshot(index_name: str, path: Optional[str] = None, dtype: str = "float32") -> Dict[str, Any]:
+    """
+    Dump a collection's vectors and payloads to one .npz file.
+    Args:
+        index_name: Collection to export.
+        path: Output file (default SNAPSHOT_DIR/<index_name>.npz).
+        dtype: "float32" or "float16" (half the size; plenty for cosine search).
+    Returns:
+        {"status", "path", "points", "bytes"}
+    """
+    try:
+        if dtype not in ("float32", "float16"):
+            return {"status": "fail", "message": "dtype must be float32 or float16"}
+        if not index_exists(index_name):
+            return {"status": "fail", "message": "index does not exist"}
+
+        ids, vectors, payloads, offset = [], [], [], None
+        while True:
+            records, offset = qdrant_client.scroll(
+                collection_name=physical_name(index_name),
+                scroll_filter=tenant_filter(index_name),
+                limit=SNAPSHOT_BATCH_SIZE,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            for r in records:
+                ids.append(r.id)
+                vectors.append(r.vector)
+                # Snapshots hold full payloads whatever the store's layout; import re-applies it
+                payloads.append({k: v for k, v in expand_payload(r.payload, index_name, r.id).items() if k != TENANT_KEY})
+            if offset is None:
+                break
+
+        dim = sentence_model.get_sentence_embedding_dimension()
+        matrix = np.asarray(vectors, dtype=dtype).reshape(len(vectors), -1 if vectors else dim)
+        meta = {
+            "format": SNAPSHOT_FORMAT,
+            "index_name": index_name,
+            "model": EMBEDDING_MODEL,
+            "dim": int(matrix.shape[1]),
+            "distance": "cosine",
+            "dtype": dtype,
+            "points": len(ids),
+            # Shared-layout ids are already namespaced by index_name; logical ids cannot be recovered
+            "namespaced_ids": is_shared(),
+            "exported_at": time.time(),
+        }
+
+        path = path or snapshot_path(index_name)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                meta=_json_column(meta),
+                ids=_json_column(ids),
+                vectors=matrix,
+                **_pack_payloads(payloads),
+            )
+        return {"status": "success", "path": path, "points": len(ids), "bytes": os.path.getsize(path)}
+    except Exception as e:
+        print("ERROR in export_snapshot:", e)
+        return {"status": "fail", "message": str(e)}
+
+
+def import_snapshot(index_name: str, path: str, overwrite: bool = False) -> Dict[str, Any]:
+    """
+    Restore a collection from an export_snapshot file without re-embedding.
+    Args:
+        index_name: Collection to create.
+        path: Snapshot file.
+        overwrite: Replace the collection if it already exists.
+    Returns:
+        {"status", "points", "model"}
+    """
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            meta = _read_json(data["meta"])
+            if meta.get("format") != SNAPSHOT_FORMAT:
+                return {"status": "fail", "message": f"unsupported snapshot format: {meta.get('format')}"}
+            dim = sentence_model.get_sentence_embedding_dimension()
+            if meta["dim"] != dim:
+                return {
+                    "status": "fail",
+                    "message": f"snapshot vectors are {meta['dim']}-d ({meta['model']}), "
+                               f"this server embeds {dim}-d ({EMBEDDING_MODEL})",
+                }
+            ids = _read_json(data["ids"])
+            vectors = data["vectors"].astype(np.float32)
+            payloads = _unpack_payloads(data, len(ids))
+
+        if index_exists(index_name):
+            if not overwrite:
+                return {"status": "fail", "message": "index already exists"}
+            drop_index_storage(index_name)
+            drop_local_index(index_name)
+            drop_lexical_index(index_name)
+            bump_index_version(index_name)
+
+        _ensure_collection(index_name)
+        if meta.get("namespaced_ids") and meta["index_name"] == index_name:
+            # Back into the index they came from: keep the ids as stored instead of namespacing them twice
+            _write_points(index_name, ids, vectors, payloads)
+        else:
+            _upload_points(index_name, ids, vectors, payloads)
+        result = {"status": "success", "points": len(ids), "model": meta["model"]}
+        if meta["model"] != EMBEDDING_MODEL:
+            result["warning"] = f"snapshot was embedded with {meta['model']}, queries use {EMBEDDING_MODEL}"
+        return result
+    except Exception as e:
+        print("ERROR in import_snapshot:", e)
+        return {"status": "fail", "message": str(e)}
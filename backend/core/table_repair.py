@@ -0,0 +1,229 @@
+import io
+import os
+import sys
+import csv
+import json
+import asyncio
+import zipfile
+import tempfile
+from typing import List, Dict, Any, Optional, AsyncIterator
+
+import pandas as pd
+
+from core.repair import repair_data
+from core.detect import ColumnDetector, knowledge_from_indexes
+from core.fd_repair import DependencyRepairer
+from core.vector_store import VectorStoreUnavailable
+from core.domain_kb.csv_io import read_csv_header
+
+TABLE_CHUNK_ROWS = int(os.getenv("TABLE_CHUNK_ROWS", "200"))
+CHANGE_FIELDS = ["row", "column", "dirty_value", "repaired_value", "source", "confidence", "degraded", "error"]
+
+
+def validate_plan(plan: List[Dict[str, Any]], header: List[str]) -> Optional[str]:
+    """
+    Check a column plan against the CSV header.
+    Each step: {"target", "pivots", "index_name", "index_type", "will_rerank", "top_k", "detect", "fd_repair"}
+    Returns an error message, or None if the plan is usable.
+    """
+    if not isinstance(plan, list) or not plan:
+        return "plan must be a non-empty list of column steps"
+    for step in plan:
+        if not isinstance(step, dict) or not step.get("target"):
+            return "every plan step needs a 'target' column"
+        missing = [c for c in [step["target"], *step.get("pivots", [])] if c not in header]
+        if missing:
+            return f"columns not in CSV: {missing}"
+    return None
+
+
+def fit_detectors(plan: List[Dict[str, Any]]) -> Dict[int, ColumnDetector]:
+    """
+    Detectors for steps with "detect": true, one per step, learned from the
+    clean values in the step's indexes (never from the file being repaired).
+    """
+    detectors = {}
+    for i, step in enumerate(plan):
+        if not step.get("detect"):
+            continue
+        knowledge = None
+        if step.get("index_name"):
+            try:
+                knowledge = knowledge_from_indexes(step["target"], step["index_name"])
+            except VectorStoreUnavailable as e:
+                print("WARNING vector store unavailable, detecting without the knowledge base:", e)
+        detectors[i] = ColumnDetector(knowledge)
+    return detectors
+
+
+def fit_dependencies(fileobj, plan: List[Dict[str, Any]], chunk_rows: int = TABLE_CHUNK_ROWS) -> Dict[int, DependencyRepairer]:
+    """Pre-pass for steps with "fd_repair": true: pivot -> target group counts over the whole file."""
+    models = {i: DependencyRepairer(step.get("pivots", [])) for i, step in enumerate(plan)
+              if step.get("fd_repair") and step.get("pivots")}
+    if not models:
+        return models
+    columns = sorted({c for i in models for c in [plan[i]["target"], *plan[i]["pivots"]]})
+    fileobj.seek(0)
+    with pd.read_csv(fileobj, dtype=str, keep_default_na=False, usecols=columns, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            for i, model in models.items():
+                step = plan[i]
+                model.partial_fit(chunk[step["target"]], chunk[step["pivots"]].itertuples(index=False, name=None))
+    return models
+
+
+async def repair_table_chunks(
+    fileobj,
+    plan: List[Dict[str, Any]],
+    reasoner_name: str,
+    entity_description: Optional[str] = None,
+    chunk_rows: int = TABLE_CHUNK_ROWS,
+    context_token_budget: Optional[int] = None,
+) -> AsyncIterator[tuple]:
+    """
+    Repair a CSV chunk by chunk, column step by column step.
+
+    Later steps see earlier steps' repairs in their pivot columns. Only one
+    chunk of rows is held at a time.
+    Args:
+        fileobj: Seekable CSV file object.
+        plan: Column steps (see validate_plan).
+        reasoner_name: LLM used for every step.
+        entity_description: Guidance passed to retrieval and the prompt.
+        chunk_rows: Rows per chunk; one repair_data call per chunk and step.
+    Yields:
+        (repaired chunk dataframe, [change dicts])
+    """
+    # Full passes over the file (and KB scrolls): keep them off the event loop
+    detectors = await asyncio.to_thread(fit_detectors, plan)
+    dependencies = await asyncio.to_thread(fit_dependencies, fileobj, plan, chunk_rows)
+    fileobj.seek(0)
+    # Everything as text so untouched cells round-trip unchanged
+    with pd.read_csv(fileobj, dtype=str, keep_default_na=False, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            changes = []
+            for i, step in enumerate(plan):
+                target, pivots = step["target"], step.get("pivots", [])
+                rows = chunk.index.tolist()
+                target_data = [{"id": int(r), "value": v if v != "" else None} for r, v in zip(rows, chunk[target])]
+                pivot_data = [
+                    {"id": int(r), "values": list(vals)}
+                    for r, vals in zip(rows, chunk[pivots].itertuples(index=False, name=None))
+                ]
+                response = await repair_data(
+                    entity_description,
+                    target,
+                    target_data,
+                    pivots,
+                    pivot_data,
+                    reasoner_name,
+                    step.get("index_name"),
+                    step.get("index_type"),
+                    bool(step.get("will_rerank", False)),
+                    step.get("top_k"),
+                    context_token_budget,
+                    detector=detectors.get(i),
+                    fd_model=dependencies.get(i),
+                )
+                if response["status"] == "fail":
+                    # Leave this step's cells as they were and say why
+                    changes.append({"row": f"{rows[0]}-{rows[-1]}", "column": target, "error": response["message"]})
+                    continue
+
+                degraded = bool(response.get("degraded"))
+                for r, old, result in zip(rows, chunk[target].tolist(), response["results"]):
+                    new = result.get("value") if isinstance(result, dict) else None
+                    if isinstance(result, dict) and result.get("status") == "fail":
+                        changes.append({"row": r, "column": target, "dirty_value": old, "error": result.get("message")})
+                        continue
+                    if new is None or str(new) == old:
+                        continue
+                    chunk.at[r, target] = str(new)
+                    changes.append({
+                        "row": r,
+                        "column": target,
+                        "dirty_value": old,
+                        "repaired_value": str(new),
+                        "source": result.get("table_name"),
+                        "confidence": result.get("confidence"),
+                        "degraded": degraded,
+                    })
+            yield chunk, changes
+
+
+class _StreamSink(io.RawIOBase):
+    """Unseekable write target that hands buffered bytes to the response as they come."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.buffer.extend(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+async def stream_repaired_zip(fileobj, plan, reasoner_name, entity_description=None, chunk_rows=TABLE_CHUNK_ROWS,
+                              context_token_budget=None) -> AsyncIterator[bytes]:
+    """
+    Zip stream with repaired.csv (sent chunk by chunk) and changes.csv.
+    The change log is spooled to a temp file and appended last.
+    """
+    sink = _StreamSink()
+    with tempfile.TemporaryFile("w+", newline="") as change_log:
+        writer = csv.DictWriter(change_log, fieldnames=CHANGE_FIELDS)
+        writer.writeheader()
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            with archive.open("repaired.csv", "w") as repaired:
+                first = True
+                async for chunk, changes in repair_table_chunks(
+                    fileobj, plan, reasoner_name, entity_description, chunk_rows, context_token_budget
+                ):
+                    repaired.write(chunk.to_csv(index=False, header=first).encode("utf-8"))
+                    first = False
+                    writer.writerows(changes)
+                    yield sink.drain()
+            change_log.seek(0)
+            with archive.open("changes.csv", "w") as out:
+                for block in iter(lambda: change_log.read(1 << 16), ""):
+                    out.write(block.encode("utf-8"))
+        yield sink.drain()
+
+
+async def repair_table_files(csv_path: str, plan: list, reasoner_name: str, out_dir: str,
+                             entity_description: Optional[str] = None, chunk_rows: int = TABLE_CHUNK_ROWS) -> dict:
+    """CLI counterpart: write repaired.csv and changes.csv into out_dir."""
+    os.makedirs(out_dir, exist_ok=True)
+    with open(csv_path, "rb") as f:
+        error = validate_plan(plan, read_csv_header(f))
+        if error:
+            return {"status": "fail", "message": error}
+        n_changes = 0
+        with open(os.path.join(out_dir, "repaired.csv"), "w", newline="") as repaired, \
+                open(os.path.join(out_dir, "changes.csv"), "w", newline="") as change_log:
+            writer = csv.DictWriter(change_log, fieldnames=CHANGE_FIELDS)
+            writer.writeheader()
+            first = True
+            async for chunk, changes in repair_table_chunks(f, plan, reasoner_name, entity_description, chunk_rows):
+                chunk.to_csv(repaired, index=False, header=first)
+                first = False
+                writer.writerows(changes)
+                n_changes += len(changes)
+    return {"status": "success", "changes": n_changes, "out_dir": out_dir}
+
+
+if __name__ == "__main__":
+    # e.g. python -m core.table_repair dirty.csv plan.json "Llama 3.1" out/
+    if len(sys.argv) != 5:
+        print("usage: python -m core.table_repair <dirty.csv> <plan.json> <reasoner_name> <out_dir>")
+        sys.exit(1)
+    with open(sys.argv[2], "r") as f:
+        column_plan = json.load(f)
+    print(asyncio.run(repair_table_files(sys.argv[1], column_plan, sys.argv[3], sys.argv[4])))
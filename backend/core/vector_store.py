@@ -0,0 +1,207 @@
+import os
+import time
+import asyncio
+import random
+import threading
+from typing import Callable, Optional
+
+# gRPC needs its port (6334) reachable; if it isn't, make_qdrant_client falls back to REST
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+QDRANT_TIMEOUT = float(os.getenv("QDRANT_TIMEOUT", "30"))
+QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", "20"))
+QDRANT_RETRIES = int(os.getenv("QDRANT_RETRIES", "3"))
+QDRANT_BACKOFF_BASE = float(os.getenv("QDRANT_BACKOFF_BASE", "0.1"))
+QDRANT_BACKOFF_MAX = float(os.getenv("QDRANT_BACKOFF_MAX", "2.0"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+# Safe to repeat: reads never change the store
+READ_METHODS = {
+    "search", "search_batch", "query_points", "query_batch_points", "scroll", "retrieve",
+    "count", "facet", "collection_exists", "get_collection", "get_collections",
+}
+_TRANSIENT_NAMES = {
+    "ResponseHandlingException", "ConnectError", "ConnectTimeout", "ReadTimeout",
+    "WriteTimeout", "PoolTimeout", "RemoteProtocolError",
+}
+_TRANSIENT_STATUS = {429, 502, 503, 504}
+_TRANSIENT_GRPC = {"UNAVAILABLE", "DEADLINE_EXCEEDED", "RESOURCE_EXHAUSTED"}
+
+
+class VectorStoreUnavailable(Exception):
+    """The vector store is down (circuit open, or retries exhausted on a transient error)."""
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def is_transient(exc: Exception) -> bool:
+    """Connection-level failures worth retrying; bad requests and 404s are not."""
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    if type(exc).__name__ in _TRANSIENT_NAMES:
+        return True
+    if getattr(exc, "status_code", None) in _TRANSIENT_STATUS:
+        return True
+    code = getattr(exc, "code", None)
+    if callable(code):  # grpc.RpcError
+        try:
+            return getattr(code(), "name", None) in _TRANSIENT_GRPC
+        except Exception:
+            return False
+    return False
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failures`` consecutive transient errors and rejects calls
+    for ``reset_seconds``; then lets one probe call through (half-open).
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.consecutive = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half_open" if self.clock() - self.opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at < self.reset_seconds or self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.consecutive, self.opened_at, self.probing = 0, None, False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.consecutive += 1
+            if self.probing or self.consecutive >= self.failures:
+                self.opened_at = self.clock()
+            self.probing = False
+
+
+class ResilientQdrantClient:
+    """
+    Drop-in wrapper around a QdrantClient (or any stand-in with the same methods).
+
+    Reads are retried on transient errors with full-jitter exponential
+    backoff; writes are tried once so nothing is applied twice. Calls made
+    on an event-loop thread are tried once too: a backoff sleep there would
+    stall every request on the worker, so retried reads belong in a thread
+    (asyncio.to_thread / run_in_threadpool). Transient
+    failures feed a circuit breaker, and while it is open every call raises
+    VectorStoreUnavailable immediately instead of waiting for timeouts.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        client_factory: Optional[Callable[[], object]] = None,
+        retries: int = QDRANT_RETRIES,
+        backoff_base: float = QDRANT_BACKOFF_BASE,
+        backoff_max: float = QDRANT_BACKOFF_MAX,
+        breaker: Optional[CircuitBreaker] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self._client = client
+        self._client_factory = client_factory or make_qdrant_client
+        self._client_lock = threading.Lock()
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+
+    @property
+    def client(self):
+        # Built on first use so importing the app never blocks on the store
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def call(self, method: str, *args, **kwargs):
+        attempts = self.retries + 1 if method in READ_METHODS and not _on_event_loop() else 1
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise VectorStoreUnavailable(f"vector store circuit open; {method} rejected")
+            try:
+                result = getattr(self.client, method)(*args, **kwargs)
+            except Exception as e:
+                if not is_transient(e):
+                    # The store answered; the request itself was bad
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt + 1 == attempts:
+                    raise VectorStoreUnavailable(f"{method} failed: {e}") from e
+                self._sleep(self._backoff(attempt))
+                continue
+            self.breaker.record_success()
+            return result
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+
+def make_qdrant_client(url: Optional[str] = None, api_key: Optional[str] = None, prefer_grpc: Optional[bool] = None):
+    """
+    REST client with a QDRANT_POOL_SIZE connection pool, or with
+    QDRANT_PREFER_GRPC=true a gRPC one (one multiplexed channel). The gRPC
+    client is probed once; if it can't reach the server, REST is used instead.
+    """
+    import httpx
+    from qdrant_client import QdrantClient
+
+    prefer_grpc = QDRANT_PREFER_GRPC if prefer_grpc is None else prefer_grpc
+
+    def build(grpc: bool):
+        return QdrantClient(
+            url=url or os.getenv("QDRANT_URL"),  # e.g., "https://<cluster>.<region>.cloud.qdrant.io:6333"
+            api_key=api_key or os.getenv("QDRANT_API_KEY"),  # required for cloud
+            prefer_grpc=grpc,
+            timeout=QDRANT_TIMEOUT,
+            # REST connection pool (ignored by the gRPC transport)
+            limits=httpx.Limits(max_connections=QDRANT_POOL_SIZE, max_keepalive_connections=QDRANT_POOL_SIZE),
+        )
+
+    if not prefer_grpc:
+        return build(False)
+    client = build(True)
+    try:
+        client.get_collections()
+        return client
+    except Exception as e:
+        print("WARNING: Qdrant gRPC unreachable, falling back to REST:", e)
+        client.close()
+        return build(False)
@@ -0,0 +1,316 @@
+"""
+Embedding sidecar: one process holds the SentenceTransformer (and, once the
+first rerank request comes in, the CrossEncoder) and serves every uvicorn
+worker over a Unix socket.
+
+    python embedding_service.py              # listens on EMBEDDING_SOCKET
+    EMBEDDING_SOCKET=/tmp/astraclean-embed.sock uvicorn main:app --workers 4
+
+With EMBEDDING_SOCKET set, core/__init__.py uses EmbeddingClient instead of
+loading the model and core/rerank.py sends cross-encoder scoring here, so
+workers only carry the web layer. Requests from all workers are coalesced
+into shared encode batches; batch size, wait window and torch threads are
+tuned here, independently of HTTP concurrency.
+
+Wire format: 4-byte big-endian length + body. Requests are JSON
+({"op": "encode", "texts": [...]}, {"op": "rerank", "pairs": [[query, text], ...]}
+or {"op": "info"}); replies are a JSON header ({"status": "ok", "shape": [n, d],
+"dtype": "float32"}), followed for encode and rerank by one frame of raw
+float32 vectors or scores.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import struct
+import asyncio
+import threading
+from typing import List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_SOCKET = os.getenv("EMBEDDING_SOCKET", "")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+EMBED_SERVICE_BATCH = int(os.getenv("EMBED_SERVICE_BATCH", "256"))
+EMBED_SERVICE_WAIT_MS = float(os.getenv("EMBED_SERVICE_WAIT_MS", "2"))
+EMBED_SERVICE_THREADS = int(os.getenv("EMBED_SERVICE_THREADS", "0"))  # torch intra-op threads; 0 = torch default
+EMBED_SERVICE_DEVICE = os.getenv("EMBED_SERVICE_DEVICE") or None
+# Client side: texts per request (big index builds are split) and how long to wait for the sidecar to come up
+EMBED_CLIENT_CHUNK = int(os.getenv("EMBED_CLIENT_CHUNK", "1024"))
+EMBED_CLIENT_TIMEOUT = float(os.getenv("EMBED_CLIENT_TIMEOUT", "120"))
+EMBED_CONNECT_TIMEOUT = float(os.getenv("EMBED_CONNECT_TIMEOUT", "30"))
+
+_LENGTH = struct.Struct(">I")
+
+
+# ---------- Framing ----------
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks, remaining = [], size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            raise ConnectionError("embedding service closed the connection")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _send_frame(sock: socket.socket, body: bytes) -> None:
+    sock.sendall(_LENGTH.pack(len(body)) + body)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (size,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return _recv_exact(sock, size)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (size,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return await reader.readexactly(size)
+
+
+def _write_frame(writer: asyncio.StreamWriter, body: bytes) -> None:
+    writer.write(_LENGTH.pack(len(body)) + body)
+
+
+# ---------- Client (web workers) ----------
+class EmbeddingServiceError(Exception):
+    pass
+
+
+class EmbeddingClient:
+    """
+    Stand-in for SentenceTransformer backed by the sidecar: same ``encode``
+    and ``get_sentence_embedding_dimension`` calls, plus CrossEncoder's
+    ``predict`` for reranking. One connection per thread; a dropped
+    connection is reopened once per request.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = EMBED_CLIENT_TIMEOUT,
+                 connect_timeout: float = EMBED_CONNECT_TIMEOUT, chunk: int = EMBED_CLIENT_CHUNK):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.chunk = chunk
+        self._local = threading.local()
+        self._dim: Optional[int] = None
+
+    def _connect(self) -> socket.socket:
+        # The sidecar may still be loading the model when the first request comes in
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+                return sock
+            except OSError as e:
+                sock.close()
+                if time.monotonic() >= deadline:
+                    raise EmbeddingServiceError(f"embedding service not reachable at {self.socket_path}: {e}")
+                time.sleep(0.5)
+
+    def _request(self, message: dict, with_payload: bool) -> tuple:
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            if sock is None:
+                sock = self._local.sock = self._connect()
+            try:
+                _send_frame(sock, json.dumps(message).encode("utf-8"))
+                header = json.loads(_recv_frame(sock))
+                payload = _recv_frame(sock) if with_payload and header.get("status") == "ok" else None
+            except (OSError, ConnectionError):
+                sock.close()
+                self._local.sock = None
+                if attempt:
+                    raise
+                continue
+            if header.get("status") != "ok":
+                raise EmbeddingServiceError(header.get("message", "embedding service error"))
+            return header, payload
+
+    def info(self) -> dict:
+        """Model, dimension and batch counters of the sidecar."""
+        header, _ = self._request({"op": "info"}, with_payload=False)
+        return header
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dim is None:
+            self._dim = int(self.info()["dim"])
+        return self._dim
+
+    def encode(self, sentences, batch_size: Optional[int] = None, convert_to_numpy: bool = True, **kwargs):
+        """Same shapes as SentenceTransformer.encode: (n, d) for a list, (d,) for one string."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else [str(s) for s in sentences]
+        parts = []
+        for start in range(0, len(texts), self.chunk):
+            header, payload = self._request({"op": "encode", "texts": texts[start:start + self.chunk]}, with_payload=True)
+            parts.append(np.frombuffer(payload, dtype=header["dtype"]).reshape(header["shape"]))
+        if not parts:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        vectors = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        return vectors[0] if single else vectors
+
+    def predict(self, pairs, batch_size: Optional[int] = None, **kwargs) -> np.ndarray:
+        """Same as CrossEncoder.predict: one relevance score per (query, text) pair."""
+        pairs = [[str(q), str(t)] for q, t in pairs]
+        parts = []
+        for start in range(0, len(pairs), self.chunk):
+            header, payload = self._request({"op": "rerank", "pairs": pairs[start:start + self.chunk]}, with_payload=True)
+            parts.append(np.frombuffer(payload, dtype=header["dtype"]).reshape(header["shape"]))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)
+
+
+# ---------- Server (sidecar) ----------
+class EmbeddingServer:
+    """
+    Coalesces encode requests from all connections: while one batch is being
+    encoded the next one fills up (up to EMBED_SERVICE_BATCH texts). Rerank
+    requests arrive already batched and go straight to the cross-encoder,
+    which is built by ``reranker_factory`` on the first one.
+    """
+
+    def __init__(self, model, max_batch: int = EMBED_SERVICE_BATCH, max_wait_ms: float = EMBED_SERVICE_WAIT_MS,
+                 reranker_factory=None):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.pending: list = []
+        self.wakeup: Optional[asyncio.Event] = None
+        self.batches = 0
+        self.texts = 0
+        self.reranker_factory = reranker_factory or _load_cross_encoder
+        self.reranker = None
+        self._reranker_lock = threading.Lock()
+        self.pairs = 0
+
+    def _rerank(self, pairs: List[list]) -> np.ndarray:
+        with self._reranker_lock:
+            if self.reranker is None:
+                self.reranker = self.reranker_factory()
+        scores = self.reranker.predict(pairs, batch_size=RERANK_BATCH_SIZE)
+        self.pairs += len(pairs)
+        return np.asarray(scores, dtype=np.float32).reshape(len(pairs))
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((texts, future))
+        self.wakeup.set()
+        return await future
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        distinct = list(dict.fromkeys(texts))
+        vectors = np.asarray(self.model.encode(distinct, batch_size=len(distinct), convert_to_numpy=True), dtype=np.float32)
+        position = {t: i for i, t in enumerate(distinct)}
+        return vectors[[position[t] for t in texts]]
+
+    async def batch_loop(self) -> None:
+        while True:
+            if not self.pending:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            if self.max_wait > 0 and sum(len(t) for t, _ in self.pending) < self.max_batch:
+                await asyncio.sleep(self.max_wait)
+            batch, size = [], 0
+            while self.pending and (not batch or size + len(self.pending[0][0]) <= self.max_batch):
+                texts, future = self.pending.pop(0)
+                batch.append((texts, future))
+                size += len(texts)
+            try:
+                vectors = await asyncio.to_thread(self._encode_batch, [t for texts, _ in batch for t in texts])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += size
+            start = 0
+            for texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[start:start + len(texts)])
+                start += len(texts)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    message = json.loads(await _read_frame(reader))
+                except asyncio.IncompleteReadError:
+                    break
+                op = message.get("op")
+                try:
+                    if op == "encode":
+                        vectors = await self.encode(message.get("texts") or [])
+                        header = {"status": "ok", "shape": list(vectors.shape), "dtype": "float32"}
+                        _write_frame(writer, json.dumps(header).encode("utf-8"))
+                        _write_frame(writer, vectors.tobytes())
+                    elif op == "rerank":
+                        scores = await asyncio.to_thread(self._rerank, message.get("pairs") or [])
+                        header = {"status": "ok", "shape": list(scores.shape), "dtype": "float32"}
+                        _write_frame(writer, json.dumps(header).encode("utf-8"))
+                        _write_frame(writer, scores.tobytes())
+                    elif op == "info":
+                        header = {
+                            "status": "ok",
+                            "model": EMBEDDING_MODEL,
+                            "dim": self.model.get_sentence_embedding_dimension(),
+                            "batches": self.batches,
+                            "texts": self.texts,
+                            "rerank_model": RERANK_MODEL if self.reranker is not None else None,
+                            "rerank_pairs": self.pairs,
+                        }
+                        _write_frame(writer, json.dumps(header).encode("utf-8"))
+                    else:
+                        _write_frame(writer, json.dumps({"status": "error", "message": f"unknown op: {op}"}).encode("utf-8"))
+                except Exception as e:
+                    print("ERROR in embedding service:", e)
+                    _write_frame(writer, json.dumps({"status": "error", "message": str(e)}).encode("utf-8"))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: str) -> None:
+        self.wakeup = asyncio.Event()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # stale socket from a previous run
+        server = await asyncio.start_unix_server(self.handle, path=socket_path)
+        os.chmod(socket_path, 0o660)
+        batcher = asyncio.create_task(self.batch_loop())
+        print(f"INFO embedding service ({EMBEDDING_MODEL}) listening on {socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+def _load_cross_encoder():
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(RERANK_MODEL, device=EMBED_SERVICE_DEVICE or "cpu")
+
+
+def main() -> None:
+    if not EMBEDDING_SOCKET:
+        print("EMBEDDING_SOCKET is not set")
+        sys.exit(1)
+    from sentence_transformers import SentenceTransformer
+
+    if EMBED_SERVICE_THREADS > 0:
+        import torch
+        torch.set_num_threads(EMBED_SERVICE_THREADS)
+    model = SentenceTransformer(EMBEDDING_MODEL, device=EMBED_SERVICE_DEVICE)
+    asyncio.run(EmbeddingServer(model).serve(EMBEDDING_SOCKET))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,5 @@
-import os
-from ollama import Client
-
 from .base import LanguageModel
+from .ollama_pool import OllamaPool
 
 
 class Llama3_1(LanguageModel):
@@ -9,7 +7,8 @@ class Llama3_1(LanguageModel):
     def __init__(self):
         super().__init__(type="local")
         self.model = "llama3.1:8b-instruct-q4_K_M"
-        self.client = Client(host=os.getenv("OLLAMA_URL"))
+        # One or more Ollama hosts (OLLAMA_URLS, else OLLAMA_URL), least-outstanding routing
+        self.client = OllamaPool.from_env()
 
     def prompt_wrapper(self, text: str) -> list:
         messages = [
@@ -0,0 +1,164 @@
+import os
+import time
+import random
+import threading
+from typing import Callable, List, Optional
+
+# Comma-separated Ollama hosts; falls back to the single OLLAMA_URL
+OLLAMA_URLS = os.getenv("OLLAMA_URLS", "")
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))
+OLLAMA_ACQUIRE_TIMEOUT = float(os.getenv("OLLAMA_ACQUIRE_TIMEOUT", "120"))
+OLLAMA_MAX_FAILURES = int(os.getenv("OLLAMA_MAX_FAILURES", "3"))
+OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "15"))
+
+
+class NoHealthyHost(Exception):
+    pass
+
+
+def _default_client_factory(url: str):
+    from ollama import Client
+    return Client(host=url)
+
+
+def _is_host_failure(exc: Exception) -> bool:
+    # Ollama answered with a 4xx (bad model name, bad request): not the host's fault
+    status = getattr(exc, "status_code", None)
+    return status is None or status < 0 or status >= 500
+
+
+class _Host:
+    def __init__(self, url: str, client, max_concurrency: int):
+        self.url = url
+        self.client = client
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.outstanding = 0
+        self.failures = 0
+        self.healthy = True
+        self.served = 0
+
+
+class OllamaPool:
+    """
+    Spreads Ollama calls over several hosts.
+
+    Each call goes to the healthy host with the fewest outstanding requests
+    and waits for one of that host's ``max_concurrency`` slots. A host that
+    fails ``max_failures`` times in a row is ejected; a background health
+    check (``client.list()``) puts it back once it answers again. A call that
+    fails on one host is retried on the next best one.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        client_factory: Callable[[str], object] = _default_client_factory,
+        max_concurrency: int = OLLAMA_MAX_CONCURRENCY,
+        acquire_timeout: float = OLLAMA_ACQUIRE_TIMEOUT,
+        max_failures: int = OLLAMA_MAX_FAILURES,
+        health_interval: float = OLLAMA_HEALTH_INTERVAL,
+    ):
+        if not urls:
+            raise ValueError("OllamaPool needs at least one host")
+        self.hosts = [_Host(url, client_factory(url), max_concurrency) for url in urls]
+        self.acquire_timeout = acquire_timeout
+        self.max_failures = max_failures
+        self.health_interval = health_interval
+        self.lock = threading.Lock()
+        self._health_thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "OllamaPool":
+        urls = [u.strip() for u in OLLAMA_URLS.split(",") if u.strip()] or [os.getenv("OLLAMA_URL")]
+        return cls(urls, **kwargs)
+
+    # ---------- Routing ----------
+    def _pick(self, exclude: set) -> Optional[_Host]:
+        with self.lock:
+            candidates = [h for h in self.hosts if h.healthy and h.url not in exclude]
+            if not candidates:
+                return None
+            fewest = min(h.outstanding for h in candidates)
+            host = random.choice([h for h in candidates if h.outstanding == fewest])
+            host.outstanding += 1  # reserve before waiting so concurrent picks spread out
+            return host
+
+    def _release(self, host: _Host, ok: bool, host_failed: bool) -> None:
+        with self.lock:
+            host.outstanding -= 1
+            if ok:
+                host.failures = 0
+                host.served += 1
+            elif host_failed:
+                host.failures += 1
+                if host.failures >= self.max_failures and host.healthy:
+                    host.healthy = False
+                    print(f"WARNING ejecting Ollama host {host.url} after {host.failures} failures")
+        if host_failed:
+            self._ensure_health_check()
+
+    def _call(self, method: str, *args, **kwargs):
+        tried, last_error = set(), None
+        while True:
+            host = self._pick(tried)
+            if host is None:
+                raise NoHealthyHost(f"no healthy Ollama host (tried {sorted(tried)})") from last_error
+            tried.add(host.url)
+            if not host.slots.acquire(timeout=self.acquire_timeout):
+                self._release(host, ok=False, host_failed=False)
+                last_error = TimeoutError(f"{host.url} busy")
+                continue
+            try:
+                result = getattr(host.client, method)(*args, **kwargs)
+            except Exception as e:
+                failed = _is_host_failure(e)
+                self._release(host, ok=False, host_failed=failed)
+                if not failed:
+                    raise
+                last_error = e
+                continue
+            finally:
+                host.slots.release()
+            self._release(host, ok=True, host_failed=False)
+            return result
+
+    def chat(self, **kwargs):
+        return self._call("chat", **kwargs)
+
+    def generate(self, **kwargs):
+        return self._call("generate", **kwargs)
+
+    # ---------- Health ----------
+    def check_health(self) -> None:
+        """Probe ejected hosts and reinstate the ones that answer."""
+        for host in [h for h in self.hosts if not h.healthy]:
+            try:
+                host.client.list()
+            except Exception:
+                continue
+            with self.lock:
+                host.healthy, host.failures = True, 0
+            print(f"INFO Ollama host {host.url} is back")
+
+    def _ensure_health_check(self) -> None:
+        with self.lock:
+            if self._health_thread is not None and self._health_thread.is_alive():
+                return
+            self._health_thread = threading.Thread(target=self._health_loop, name="ollama-health", daemon=True)
+            self._health_thread.start()
+
+    def _health_loop(self) -> None:
+        while True:
+            time.sleep(self.health_interval)
+            self.check_health()
+            with self.lock:
+                if all(h.healthy for h in self.hosts):
+                    self._health_thread = None
+                    return
+
+    def status(self) -> List[dict]:
+        with self.lock:
+            return [
+                {"url": h.url, "healthy": h.healthy, "outstanding": h.outstanding, "failures": h.failures, "served": h.served}
+                for h in self.hosts
+            ]
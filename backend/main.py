@@ -1,3 +1,6 @@
+import os
+import sys
+import subprocess
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.index import router as index_router
@@ -7,6 +10,7 @@ from api.domain_kb import router as domain_kb_router
 from api.domain_kb_column import router as domain_kb_column_router
 import uvicorn
 import core
+from core.feedback import feedback_buffer
 
 app = FastAPI()
 
@@ -26,5 +30,24 @@ app.include_router(domain_kb_router, prefix="/domain_kb", tags=["DomainKB"])
 app.include_router(domain_kb_column_router, prefix="/domain_kb_column", tags=["DomainKB-Column"])
 
 
+@app.on_event("shutdown")
+def flush_feedback():
+    # Don't lose buffered feedback on a clean shutdown
+    feedback_buffer.flush()
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.getenv("WEB_WORKERS", "1"))
+    # With EMBEDDING_SOCKET set, all workers share one embedding sidecar (see embedding_service.py)
+    sidecar = None
+    if os.getenv("EMBEDDING_SOCKET") and os.getenv("EMBEDDING_SERVICE_AUTOSTART", "false").lower() == "true":
+        service = os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_service.py")
+        sidecar = subprocess.Popen([sys.executable, service])
+    try:
+        if workers > 1:
+            uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers)
+        else:
+            uvicorn.run(app, host="0.0.0.0", port=8000)
+    finally:
+        if sidecar is not None:
+            sidecar.terminate()
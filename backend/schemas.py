@@ -26,3 +26,37 @@ class RepairRequest(BaseModel):
     reasoner_name: str
     index_name: list[str]
     index_type: Optional[str] = None
+    will_rerank: Optional[bool] = False
+    top_k: Optional[int] = None
+    context_token_budget: Optional[int] = None
+    detect: Optional[bool] = False  # only repair cells the error detector flags
+    fd_repair: Optional[bool] = False  # fill cells determined by pivot columns (group majority) without the LLM
+
+
+class ColumnarRepairOptions(BaseModel):
+    """RepairRequest without the data; /repair/columnar takes the columns as plain arrays or Arrow."""
+    entity_description: Optional[str] = None
+    target_name: str
+    pivot_names: list[str] = []
+    reasoner_name: str
+    index_name: list[str]
+    index_type: Optional[str] = None
+    will_rerank: Optional[bool] = False
+    top_k: Optional[int] = None
+    context_token_budget: Optional[int] = None
+    detect: Optional[bool] = False
+    fd_repair: Optional[bool] = False
+
+
+class RepairFeedback(BaseModel):
+    table: Optional[str] = None
+    column: str
+    dirty_value: Optional[str] = None
+    repaired_value: Optional[str] = None
+    accepted: bool = True
+    corrected_value: Optional[str] = None  # the user's own fix when the suggestion was rejected
+
+
+class FeedbackRequest(BaseModel):
+    index_name: str  # history-log index the mappings go to
+    items: list[RepairFeedback]
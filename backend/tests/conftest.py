@@ -0,0 +1,79 @@
+import os
+import sys
+import zlib
+import tempfile
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Everything the app writes to disk goes to a scratch folder; set before `core` is imported
+STATE_DIR = tempfile.mkdtemp(prefix="astraclean-tests-")
+os.environ.setdefault("OPENAI_API_KEY", "test")  # GPT3() refuses to start without one
+# The embedding client connects lazily, so importing `core` never loads a model
+os.environ.setdefault("EMBEDDING_SOCKET", os.path.join(STATE_DIR, "embedding.sock"))
+for var, name in {
+    "LOCAL_INDEX_DIR": "local_index",
+    "LEXICAL_INDEX_DIR": "lexical_index",
+    "INDEX_STATE_DIR": "index_state",
+    "SYNC_STATE_PATH": "sync_state.json",
+    "TENANT_REGISTRY_PATH": "tenants.json",
+    "PAYLOAD_STORE_DIR": "payload_store",
+}.items():
+    os.environ[var] = os.path.join(STATE_DIR, name)
+
+DIM = 64
+
+
+class HashingModel:
+    """
+    Deterministic stand-in for SentenceTransformer: hashed character trigrams,
+    so texts that share most of their trigrams get similar vectors.
+    """
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return DIM
+
+    def encode(self, sentences, batch_size=None, convert_to_numpy=True, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vectors = np.zeros((len(texts), DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            padded = f"  {str(text).lower()} "
+            for i in range(len(padded) - 2):
+                vectors[row, zlib.crc32(padded[i:i + 3].encode("utf-8")) % DIM] += 1.0
+        return vectors[0] if single else vectors
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Swap the embedding model for HashingModel wherever it was imported."""
+    import core
+    import core.index
+    import core.batching
+    import core.snapshot
+
+    fake = HashingModel()
+    for module in (core, core.index, core.batching, core.snapshot):
+        monkeypatch.setattr(module, "sentence_model", fake)
+    return fake
+
+
+@pytest.fixture
+def qdrant(monkeypatch):
+    """An in-process Qdrant (qdrant-client local mode) behind the app's resilient client."""
+    from qdrant_client import QdrantClient
+    import core
+
+    client = QdrantClient(":memory:")
+    monkeypatch.setattr(core.qdrant_client, "_client", client)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def index_name(request):
+    """A collection name no other test uses (local copies and versions live in shared folders)."""
+    return f"test_{request.node.name}_{os.urandom(4).hex()}".replace("[", "_").replace("]", "_")
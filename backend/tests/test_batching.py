@@ -0,0 +1,111 @@
+import asyncio
+import threading
+
+import pytest
+
+import core
+import core.batching as batching
+from core.batching import MicroBatcher, _generate_many, encode_queries_batched
+
+
+class CitingModel:
+    """LLM stand-in: echoes the prompt and cites the first retrieved row."""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def generate(self, wrapped, retrieved):
+        with self.lock:
+            self.calls.append((wrapped, retrieved))
+        if wrapped == "boom":
+            raise RuntimeError("model failed")
+        return {"value": wrapped.upper(), "citation": (retrieved or [{}])[0].get("row_number")}
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    model = CitingModel()
+    monkeypatch.setitem(core.initialized_models, "fake", model)
+    return model
+
+
+def test_identical_prompts_are_generated_once(llm):
+    context = [{"row_number": 1}]
+    results = _generate_many("fake", [("al", context), ("al", context), ("ak", context)])
+
+    assert [r["value"] for r in results] == ["AL", "AL", "AK"]
+    assert len(llm.calls) == 2
+    results[0]["context_tokens"] = 5
+    assert "context_tokens" not in results[1]  # callers get their own dicts
+
+
+def test_same_prompt_with_other_context_is_generated_again(llm):
+    results = _generate_many("fake", [("al", [{"row_number": 1}]), ("al", [{"row_number": 2}]), ("al", None)])
+
+    assert [r["citation"] for r in results] == [1, 2, None]
+    assert len(llm.calls) == 3
+
+
+def test_a_failed_prompt_fails_only_itself(llm):
+    results = _generate_many("fake", [("boom", None), ("al", None)])
+    assert isinstance(results[0], RuntimeError) and results[1]["value"] == "AL"
+
+
+def _recording_batcher(**kwargs):
+    seen = []
+
+    def fn(key, items):
+        seen.append((key, list(items)))
+        return [ValueError(item) if item == "bad" else f"{key}:{item}" for item in items]
+
+    return MicroBatcher("test", fn, max_batch=8, **kwargs), seen
+
+
+def test_concurrent_requests_share_batches_without_mixing_keys():
+    batcher, seen = _recording_batcher(max_wait_ms=20)
+
+    async def main():
+        return await asyncio.gather(
+            batcher.submit_many(["a", "b"], key="k1"),
+            batcher.submit_many(["c"], key="k1"),
+            batcher.submit_many(["d"], key="k2"),
+        )
+
+    assert asyncio.run(main()) == [["k1:a", "k1:b"], ["k1:c"], ["k2:d"]]
+    assert sorted(seen) == [("k1", ["a", "b", "c"]), ("k2", ["d"])]
+    assert batcher.stats()["batches"] == 2 and batcher.stats()["largest_batch"] == 3
+
+
+def test_batches_are_capped_at_max_batch():
+    batcher, seen = _recording_batcher(max_wait_ms=5)
+    items = [str(i) for i in range(20)]
+
+    assert asyncio.run(batcher.submit_many(items)) == [f"None:{i}" for i in items]
+    assert [len(batch) for _, batch in seen] == [8, 8, 4]
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_an_item_error_is_raised_to_its_caller_only(enabled):
+    batcher, _ = _recording_batcher(max_wait_ms=5, enabled=enabled)
+
+    async def main():
+        return await asyncio.gather(batcher.submit("bad"), batcher.submit("ok"), return_exceptions=True)
+
+    bad, ok = asyncio.run(main())
+    assert isinstance(bad, ValueError) and ok == "None:ok"
+
+
+def test_query_embeddings_are_encoded_once_and_cached(model, monkeypatch):
+    calls = []
+    encode = model.encode
+    monkeypatch.setattr(model, "encode", lambda texts, **k: calls.append(list(texts)) or encode(texts, **k))
+    batcher = MicroBatcher("embeddings", batching._encode_many, max_batch=64)
+    monkeypatch.setattr(batching, "embedding_batcher", batcher)
+
+    queries = ["batching q1", "batching q2", "batching q1"]
+    first = asyncio.run(encode_queries_batched(queries))
+    second = asyncio.run(encode_queries_batched(queries))
+
+    assert calls == [["batching q1", "batching q2"]]
+    assert (first[0] == first[2]).all() and (second[1] == first[1]).all()
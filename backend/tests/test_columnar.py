@@ -0,0 +1,123 @@
+import re
+import json
+
+import pyarrow as pa
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import api.repair
+from core.columnar import ARROW_MEDIA_TYPE, parse_json_request, parse_arrow_request, to_columns, to_arrow
+
+OPTIONS = {"target_name": "city", "pivot_names": ["state", "zip"], "reasoner_name": "llm", "index_name": ["kb"]}
+CITATION = [{"table_name": "log.jsonl", "row_number": 3}]
+
+
+def _arrow_body(columns, options=OPTIONS):
+    table = pa.table(columns)
+    if options is not None:
+        table = table.replace_schema_metadata({"options": json.dumps(options)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _response():
+    shared = list(CITATION)  # rows often share one citation object
+    return {
+        "status": "success",
+        "degraded": False,
+        "results": [
+            {"value": "Birmingham", "confidence": 0.9, "citation": shared, "row_number": 3},
+            {"value": "Montgomery", "confidence": 0.8, "citation": shared, "row_number": "7"},
+            {"value": None, "citation": None, "conflict": {"values": ["a", "b"]}},
+        ],
+    }
+
+
+def test_json_and_arrow_requests_give_the_same_rows():
+    body = {**OPTIONS, "ids": [10, 11], "target": ["bham", None], "pivots": {"state": ["al", "al"], "zip": ["35004", None]}}
+    options, target_data, pivot_data = parse_json_request(json.dumps(body).encode())
+
+    assert options == OPTIONS
+    assert target_data == [{"id": 10, "value": "bham"}, {"id": 11, "value": None}]
+    assert pivot_data == [{"id": 10, "values": ["al", "35004"]}, {"id": 11, "values": ["al", None]}]
+
+    arrow = _arrow_body({"id": [10, 11], "city": ["bham", None], "state": ["al", "al"], "zip": ["35004", None]})
+    assert parse_arrow_request(arrow) == (options, target_data, pivot_data)
+
+
+@pytest.mark.parametrize("body, message", [
+    ({"target": "bham"}, "'target' array"),
+    ({**OPTIONS, "target": ["a"], "pivots": {"state": ["al"]}}, "pivot columns missing: ['zip']"),
+    ({**OPTIONS, "target": ["a"], "pivots": {"state": ["al"], "zip": []}}, "pivot column zip has 0 entries"),
+    ({**OPTIONS, "target": ["a"], "ids": [1, 2], "pivots": {"state": ["al"], "zip": ["1"]}}, "ids has 2 entries"),
+])
+def test_malformed_json_requests(body, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        parse_json_request(json.dumps(body).encode())
+
+
+def test_malformed_arrow_requests():
+    with pytest.raises(ValueError, match="metadata"):
+        parse_arrow_request(_arrow_body({"city": ["a"]}, options=None))
+    with pytest.raises(ValueError, match="target column 'city'"):
+        parse_arrow_request(_arrow_body({"town": ["a"]}))
+
+
+def test_citations_and_conflicts_are_stored_once():
+    columnar = to_columns(_response(), [10, 11, 12])
+
+    assert columnar["status"] == "success" and columnar["degraded"] is False
+    assert columnar["citations"] == [CITATION] and columnar["conflicts"] == [{"values": ["a", "b"]}]
+    columns = columnar["columns"]
+    assert columns["id"] == [10, 11, 12] and columns["value"] == ["Birmingham", "Montgomery", None]
+    assert columns["citation_ref"] == [0, 0, None] and columns["conflict_ref"] == [None, None, 0]
+    assert "citation" not in columns and "conflict" not in columns
+
+
+def test_arrow_response_round_trips():
+    columnar = to_columns(_response(), [10, 11, 12])
+
+    table = pa.ipc.open_stream(to_arrow(columnar)).read_all()
+
+    assert table.column("value").to_pylist() == ["Birmingham", "Montgomery", None]
+    assert table.column("citation_ref").to_pylist() == [0, 0, None]
+    assert table.column("row_number").to_pylist() == ["3", "7", None]  # mixed types travel as text
+    metadata = table.schema.metadata
+    assert json.loads(metadata[b"citations"]) == [CITATION] and json.loads(metadata[b"status"]) == "success"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    seen = {}
+
+    async def fake_repair_data(entity_description, target_name, target_data, pivot_names, pivot_data, *args, **kwargs):
+        seen.update(target_name=target_name, target_data=target_data, pivot_data=pivot_data)
+        return {"status": "success", "results": [{"value": str(d["value"]).upper()} for d in target_data]}
+
+    monkeypatch.setattr(api.repair, "repair_data", fake_repair_data)
+    app = FastAPI()
+    app.include_router(api.repair.router, prefix="/repair")
+    client = TestClient(app)
+    client.seen = seen
+    return client
+
+
+def test_endpoint_speaks_json_and_arrow(client):
+    body = {**OPTIONS, "target": ["bham", "mgm"], "pivots": {"state": ["al", "al"], "zip": ["1", "2"]}}
+    response = client.post("/repair/columnar", content=json.dumps(body))
+    assert response.status_code == 200
+    assert response.json()["columns"] == {"id": [0, 1], "value": ["BHAM", "MGM"], "citation_ref": [None, None], "conflict_ref": [None, None]}
+
+    arrow = _arrow_body({"id": [5], "city": ["hsv"], "state": ["al"], "zip": ["3"]})
+    response = client.post("/repair/columnar", content=arrow,
+                           headers={"content-type": ARROW_MEDIA_TYPE, "accept": ARROW_MEDIA_TYPE})
+    assert response.headers["content-type"] == ARROW_MEDIA_TYPE
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column("id").to_pylist() == [5] and table.column("value").to_pylist() == ["HSV"]
+    assert client.seen["pivot_data"] == [{"id": 5, "values": ["al", "3"]}]
+
+    bad = client.post("/repair/columnar", content=json.dumps({"target": ["a"]}))
+    assert bad.status_code == 400 and bad.json()["detail"].startswith("invalid columnar request")
@@ -0,0 +1,87 @@
+
+import numpy as np
+import pytest
+
+import core.index
+from conftest import HashingModel
+from core.index import (
+    embed_lines, _upload_batch_size, _upload_points, _ensure_collection, upsert_rows, UpsertRequest,
+)
+from core.local_index import get_local_index
+
+
+class CountingModel(HashingModel):
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, sentences, batch_size=None, convert_to_numpy=True, **kwargs):
+        self.calls.append((len(sentences), batch_size))
+        return super().encode(sentences).astype(np.float64)
+
+
+@pytest.fixture
+def uploads(qdrant, monkeypatch):
+    """Record the arguments of every upload_collection call."""
+    calls = []
+    upload = qdrant.upload_collection
+
+    def recording(**kwargs):
+        calls.append(kwargs)
+        return upload(**kwargs)
+
+    monkeypatch.setattr(qdrant, "upload_collection", recording)
+    return calls
+
+
+def test_embed_lines_is_one_batched_float32_call(monkeypatch):
+    counting = CountingModel()
+    monkeypatch.setattr(core.index, "sentence_model", counting)
+
+    vectors = embed_lines(["a", "b", "c"])
+
+    assert counting.calls == [(3, core.index.ENCODE_BATCH_SIZE)]
+    assert vectors.dtype == np.float32 and vectors.shape == (3, 64)
+    assert embed_lines([]).shape == (0, 64) and len(counting.calls) == 1
+
+
+def test_batch_size_is_bounded_by_count_and_bytes(monkeypatch):
+    vectors = np.zeros((1000, 100), dtype=np.float32)
+    small = [{"values": "x"}] * 1000
+    assert _upload_batch_size(vectors, small) == core.index.UPLOAD_BATCH_SIZE
+
+    monkeypatch.setattr(core.index, "UPLOAD_BATCH_BYTES", 100_000)
+    assert _upload_batch_size(vectors, small) == 100_000 // (100 * 10 + len('{"values": "x"}'))
+    assert _upload_batch_size(vectors, [{"values": "x" * 10**6}]) == 1
+
+
+def test_upload_sends_the_matrix_and_keeps_local_copies_in_step(qdrant, model, index_name, uploads, monkeypatch):
+    monkeypatch.setattr(core.index, "UPLOAD_BATCH_SIZE", 2)
+    _ensure_collection(index_name)
+    lines = [f"row {i}" for i in range(5)]
+    vectors = model.encode(lines).astype(np.float64)
+
+    _upload_points(index_name, [1, 2, 3, 4, 5], vectors, [{"values": line} for line in lines])
+
+    (call,) = uploads
+    assert isinstance(call["vectors"], np.ndarray) and call["vectors"].dtype == np.float32
+    assert call["batch_size"] == 2 and call["ids"] == [1, 2, 3, 4, 5]
+    assert qdrant.count(index_name).count == 5
+
+    hits = get_local_index(index_name).search(model.encode(["row 3"]), limit=1)
+    assert hits[0][0].id == 4 and hits[0][0].payload["values"] == "row 3"
+
+    _upload_points(index_name, [], np.empty((0, 64)), [])
+    assert len(uploads) == 1
+
+
+def test_upsert_rows_embeds_once(qdrant, index_name, uploads, monkeypatch):
+    counting = CountingModel()
+    for module in (core, core.index):
+        monkeypatch.setattr(module, "sentence_model", counting)
+    rows = [{"table": "t", "column": "city", "dirty_value": f"v{i}", "clean_value": "c"} for i in range(4)]
+
+    result = upsert_rows(UpsertRequest(index_name=index_name, rows=rows))
+
+    assert result == {"status": "success", "upserted": 4}
+    assert [n for n, _ in counting.calls] == [4]
+    assert qdrant.count(index_name).count == 4
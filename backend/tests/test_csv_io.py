@@ -0,0 +1,85 @@
+import io
+
+import pandas as pd
+import pytest
+
+import core.domain_kb.csv_io as csv_io
+from core.domain_kb.csv_io import read_csv_upload, read_csv_header, content_hash, frame_bytes
+from core.retrieval_cache import LRUCache
+
+
+def _upload(text: str) -> io.BytesIO:
+    return io.BytesIO(text.encode("utf-8"))
+
+
+CSV = "id,city,state,zip\n" + "".join(
+    f"{i},city {i},{'' if i % 4 == 0 else 'al'},{35000 + i}\n" for i in range(100)
+)
+
+
+@pytest.fixture
+def frames(monkeypatch):
+    cache = LRUCache(16, max_bytes=1 << 20, sizeof=frame_bytes)
+    monkeypatch.setattr(csv_io, "_frames", cache)
+    return cache
+
+
+def test_reads_only_requested_columns_in_requested_order(frames):
+    df = read_csv_upload(_upload(CSV), columns=["zip", "city", "unknown"])
+    assert df.columns.tolist() == ["zip", "city"]
+    assert len(df) == 100
+
+
+def test_stops_after_n_rows_counting_only_complete_rows(frames, monkeypatch):
+    monkeypatch.setattr(csv_io, "READ_CHUNKSIZE", 7)
+    df = read_csv_upload(_upload(CSV), columns=["id", "state"], n_rows=10, dropna=True)
+    assert len(df) == 10
+    assert df["state"].notna().all()
+    assert df["id"].tolist() == [i for i in range(100) if i % 4][:10]
+
+
+def test_header_and_hash_leave_the_file_rewound():
+    upload = _upload(CSV)
+    assert read_csv_header(upload) == ["id", "city", "state", "zip"]
+    assert upload.tell() == 0
+    assert content_hash(upload) == content_hash(_upload(CSV))
+    assert upload.tell() == 0
+
+
+def test_identical_uploads_are_served_from_the_cache(frames, monkeypatch):
+    first = read_csv_upload(_upload(CSV), columns=["city"])
+    first.loc[0, "city"] = "changed"  # callers get copies
+
+    calls = []
+    monkeypatch.setattr(csv_io.pd, "read_csv", lambda *a, **k: calls.append(a) or pd.DataFrame())
+    second = read_csv_upload(_upload(CSV), columns=["city"])
+
+    assert second.loc[0, "city"] == "city 0"
+    assert calls == []  # not parsed again
+
+
+def test_cache_is_bounded_by_memory(frames):
+    frames.max_bytes = 2 * frame_bytes(pd.read_csv(_upload(CSV))) + 1000
+    read_csv_upload(_upload(CSV))
+    read_csv_upload(_upload(CSV + "100,x,al,1\n"))
+    read_csv_upload(_upload(CSV + "101,y,al,2\n"))
+
+    assert len(frames.items) == 2
+    assert frames.bytes <= frames.max_bytes
+
+
+def test_frames_over_the_budget_are_not_cached(frames):
+    frames.max_bytes = 100
+    df = read_csv_upload(_upload(CSV))
+    assert len(df) == 100
+    assert len(frames.items) == 0 and frames.bytes == 0
+
+
+def test_lru_byte_accounting_on_replace():
+    cache = LRUCache(10, max_bytes=10, sizeof=len)
+    cache.put("a", "12345")
+    cache.put("a", "123")
+    cache.put("b", "1234567")
+    assert cache.bytes == 10 and set(cache.items) == {"a", "b"}
+    cache.put("c", "1")
+    assert set(cache.items) == {"b", "c"} and cache.bytes == 8
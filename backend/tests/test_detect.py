@@ -0,0 +1,131 @@
+import json
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import core.local_index
+from core.detect import ColumnDetector, ColumnKnowledge, knowledge_from_files, knowledge_from_indexes, _near_frequent
+from core.index import build_payload, row_to_sentence, _ensure_collection, _upload_points
+
+
+def _brute_force(rare, frequent):
+    def differ(a, b):
+        return sum(x != y and not (x.isdigit() and y.isdigit()) for x, y in zip(a, b))
+
+    return np.array([
+        any(len(r) == len(f) and 1 <= differ(r, f) <= max(1, len(r) // 6) for f in frequent)
+        for r in rare
+    ], dtype=bool)
+
+
+def _words(rng, n, alphabet="abcde1 ", lengths=(1, 4, 6, 7, 12)):
+    return np.array([
+        "".join(rng.choice(list(alphabet), size=rng.choice(lengths))) for _ in range(n)
+    ], dtype=str)
+
+
+@pytest.mark.parametrize("block", [1, 7, 64, 1 << 22])
+def test_near_frequent_matches_brute_force_for_any_block(block):
+    rng = np.random.default_rng(1)
+    frequent = np.unique(_words(rng, 200))
+    rare = np.setdiff1d(_words(rng, 300), frequent)
+
+    assert np.array_equal(_near_frequent(rare, frequent, block=block), _brute_force(rare, frequent))
+
+
+def test_near_frequent_rules():
+    rare = np.array(["birminghxm", "31 patients", "montgomery al", "x", ""])
+    frequent = np.array(["birmingham", "37 patients", "montgomery, al", "y"])
+    assert _near_frequent(rare, frequent).tolist() == [True, False, False, True, False]
+    assert _near_frequent(rare, np.array([], dtype=str)).tolist() == [False] * 5
+
+
+def test_near_frequent_memory_does_not_grow_with_rare_times_frequent():
+    rng = np.random.default_rng(2)
+    frequent = np.unique(_words(rng, 4000, alphabet="abcdefghij", lengths=(16,)))
+    rare = np.setdiff1d(_words(rng, 4000, alphabet="abcdefghij", lengths=(16,)), frequent)
+
+    tracemalloc.start()
+    _near_frequent(rare, frequent, block=1 << 20)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # All pairs at once would be 4000 x 4000 x 16 characters: 256 MB of booleans alone
+    assert peak < 32 << 20
+
+
+def test_detector_flags_typos_variants_and_missing_but_not_known_clean():
+    clean_sample = ["Birmingham"] * 20 + ["Montgomery"] * 20
+    values = clean_sample + ["Birminghxm", "BIRMINGHAM", "", "Mobile"]
+    detector = ColumnDetector(ColumnKnowledge(known_clean=["Mobile"])).fit(clean_sample)
+
+    flags, reasons = detector.predict(values)
+
+    assert flags[-4:].tolist() == [True, True, True, False]
+    assert not flags[:40].any()
+    assert reasons["near_frequent"][-4] and reasons["variant"][-3] and reasons["missing"][-2]
+
+
+def test_partial_fit_over_chunks_equals_one_fit():
+    rng = np.random.default_rng(3)
+    values = list(rng.choice(["al", "ak", "az", "a1", "zz", ""], size=500, p=[0.3, 0.3, 0.3, 0.05, 0.01, 0.04]))
+
+    whole = ColumnDetector().fit(values).predict(values)[0]
+    chunked = ColumnDetector()
+    for start in range(0, len(values), 64):
+        chunked.partial_fit(values[start:start + 64])
+
+    assert np.array_equal(chunked.predict(values)[0], whole)
+
+
+def test_rule_regexes_use_python_syntax():
+    values = ["35004", "35005", "3500", "abcde"] * 5
+    detector = ColumnDetector(ColumnKnowledge(regexes=[r"(?=\d{5}$)\d+"])).fit(["35004", "35005"] * 10)
+
+    flags, reasons = detector.predict(values)
+
+    assert reasons["rule"][:4].tolist() == [False, False, True, True]
+
+
+def test_formats_are_learned_from_clean_values_not_from_the_judged_cells():
+    # A third of the column has the wrong shape: common in the cells, unseen among clean values
+    values = ["256-386-4556"] * 40 + ["256/386/4556"] * 20
+    knowledge = ColumnKnowledge().add_rows([{"clean_value": "256-386-4556"}] * 30)
+
+    flags, reasons = ColumnDetector(knowledge).predict(values)
+
+    assert flags.tolist() == [False] * 40 + [True] * 20
+    assert reasons["rare_pattern"][40:].all()
+
+
+def test_too_few_clean_values_sends_every_cell_on():
+    values = ["Birmingham", "Birminghxm", "Mobile"]
+    detector = ColumnDetector(ColumnKnowledge(known_clean=["Mobile"])).fit(["Birmingham"] * 3)
+
+    flags, reasons = detector.predict(values)
+
+    assert flags.tolist() == [True, True, False] and reasons["unchecked"].all()
+
+
+@pytest.mark.parametrize("local_copy", [True, False])
+def test_indexes_match_column_names_like_files(qdrant, model, index_name, tmp_path, monkeypatch, local_copy):
+    rows = [
+        {"table": "t", "column": "City", "dirty_value": "bham", "clean_value": "Birmingham"},
+        {"table": "t", "column": "zip", "dirty_value": "3500", "clean_value": "35004"},
+        {"name": "UAB Hospital", "city ": "Birmingham"},  # a clean table row
+    ]
+    _ensure_collection(index_name)
+    payloads = [build_payload(row, row_to_sentence(row), "kb.jsonl", n) for n, row in enumerate(rows)]
+    _upload_points(index_name, [0, 1, 2], model.encode([p["values"] for p in payloads]), payloads)
+    if not local_copy:
+        monkeypatch.setattr(core.local_index, "get_local_index", lambda name: None)
+    path = tmp_path / "kb.jsonl"
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+    from_index = knowledge_from_indexes("city", [index_name])
+    from_file = knowledge_from_files("city", [str(path)])
+
+    for knowledge in (from_index, from_file):
+        assert knowledge.known_dirty == {"bham"} and knowledge.known_clean == {"Birmingham"}
+        assert sorted(knowledge.clean_values) == ["Birmingham", "Birmingham"]
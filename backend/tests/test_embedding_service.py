@@ -0,0 +1,93 @@
+import os
+import sys
+import subprocess
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import core.rerank as rerank
+from conftest import BACKEND_DIR, HashingModel
+from core.local_index import LocalHit
+from embedding_service import EmbeddingClient
+
+# The sidecar as main.py starts it, with deterministic stand-ins for both models
+SIDECAR = """
+import sys, asyncio
+sys.path[:0] = [{backend!r}, {tests!r}]
+from conftest import HashingModel
+from embedding_service import EmbeddingServer
+
+
+class OverlapReranker:
+    def predict(self, pairs, batch_size=None):
+        return [len(set(q.split()) & set(t.split())) / (1 + len(t)) for q, t in pairs]
+
+
+asyncio.run(EmbeddingServer(HashingModel(), reranker_factory=OverlapReranker).serve({socket!r}))
+"""
+
+TEXTS = ["birmingham al", "montgomery", "35004", "birmingham al"]
+
+
+@pytest.fixture(scope="module")
+def sidecar(tmp_path_factory):
+    socket_path = str(tmp_path_factory.mktemp("sidecar") / "embed.sock")
+    script = SIDECAR.format(backend=BACKEND_DIR, tests=os.path.join(BACKEND_DIR, "tests"), socket=socket_path)
+    process = subprocess.Popen([sys.executable, "-c", script])
+    try:
+        EmbeddingClient(socket_path, connect_timeout=30).info()  # waits until it listens
+        yield socket_path
+    finally:
+        process.terminate()
+        process.wait(10)
+
+
+def _encode_in_worker(socket_path, queue):
+    queue.put(EmbeddingClient(socket_path).encode(TEXTS).tolist())
+
+
+def test_workers_share_one_model(sidecar):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    workers = [context.Process(target=_encode_in_worker, args=(sidecar, queue)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    results = [np.asarray(queue.get(timeout=60), dtype=np.float32) for _ in workers]
+    for worker in workers:
+        worker.join(60)
+
+    expected = HashingModel().encode(TEXTS)
+    assert np.array_equal(results[0], results[1])
+    assert np.array_equal(results[0], expected)
+
+
+def test_encode_keeps_sentence_transformer_shapes(sidecar):
+    client = EmbeddingClient(sidecar, chunk=3)
+    assert client.get_sentence_embedding_dimension() == HashingModel().get_sentence_embedding_dimension()
+    assert client.encode(TEXTS).shape == (4, client.get_sentence_embedding_dimension())  # split over two requests
+    assert np.array_equal(client.encode("montgomery"), HashingModel().encode("montgomery"))
+    assert client.encode([]).shape == (0, client.get_sentence_embedding_dimension())
+
+
+def test_reranker_is_loaded_in_the_sidecar_on_first_use(sidecar):
+    client = EmbeddingClient(sidecar)
+    assert client.info()["rerank_model"] is None  # embedding-only until someone reranks
+    scores = client.predict([("city birmingham", "birmingham al"), ("city birmingham", "montgomery")])
+
+    assert scores.dtype == np.float32 and scores.shape == (2,)
+    assert scores[0] > scores[1] == 0
+    assert client.info()["rerank_model"] is not None
+
+
+def test_rerank_batch_scores_through_the_sidecar(sidecar, monkeypatch):
+    monkeypatch.setattr(rerank, "EMBEDDING_SOCKET", sidecar)
+    monkeypatch.setattr(rerank, "_model", None)
+    monkeypatch.setattr(rerank, "score_cache", rerank.LRUCache(100))
+    hits = [LocalHit(1, 0.9, {"values": "montgomery"}), LocalHit(2, 0.5, {"values": "birmingham al"})]
+
+    reranked = rerank.rerank_batch(["city birmingham"], [hits], top_k=1)
+
+    assert isinstance(rerank.get_cross_encoder(), EmbeddingClient)
+    assert [h.id for h in reranked[0]] == [2]
+    assert reranked[0][0].score == 0.5 and reranked[0][0].rerank_score > 0
@@ -0,0 +1,95 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+import core.fd_repair as fd_repair
+import core.repair
+from core.fd_repair import DependencyRepairer, evaluate_dependencies
+
+# zip determines city (one typo in 35004); state does not
+ROWS = (
+    [("35004", "al", "Birmingham")] * 5 + [("35004", "al", "bham")]
+    + [("36104", "al", "Montgomery")] * 4
+    + [("35801", "al", "Huntsville")]
+    + [("35005", "al", "Bessemer"), ("35005", "al", ""), ("35005", "al", "N/A")]
+)
+PIVOTS = ["zip", "state"]
+
+
+def _split(rows):
+    return [r[2] for r in rows], [r[:2] for r in rows]
+
+
+def test_majority_of_a_dependent_pivot_group_repairs_the_cell():
+    cities, pivot_rows = _split(ROWS)
+    repairer = DependencyRepairer(PIVOTS).fit(cities, pivot_rows)
+
+    # Missing cities are not evidence; the lone 35801 and the two-value state pivot don't count
+    assert repairer.dependencies() == {"zip": {"strength": 0.9, "coverage": 0.8333}}
+
+    predicted = repairer.predict(pivot_rows)
+    assert predicted["value"].tolist()[:11] == ["Birmingham"] * 6 + ["Montgomery"] * 4 + [None]
+    assert predicted.loc[5, "confidence"] == pytest.approx(5 / 6)
+    assert predicted.loc[5, "support"] == 6 and predicted.loc[5, "pivot"] == "zip"
+    assert predicted["pivot"].tolist()[10:] == [None] * 4  # support below FD_MIN_SUPPORT
+
+
+def test_chunked_fit_matches_one_pass():
+    cities, pivot_rows = _split(ROWS)
+    chunked = DependencyRepairer(PIVOTS)
+    for start in range(0, len(ROWS), 4):
+        chunked.partial_fit(cities[start:start + 4], pivot_rows[start:start + 4])
+    whole = DependencyRepairer(PIVOTS).fit(cities, pivot_rows)
+
+    assert chunked.dependencies() == whole.dependencies()
+    pd.testing.assert_frame_equal(chunked.predict(pivot_rows), whole.predict(pivot_rows))
+
+
+def test_most_confident_dependency_wins(monkeypatch):
+    monkeypatch.setattr(fd_repair, "FD_MIN_STRENGTH", 0.8)
+    rows = [("g", "h", "X")] * 3 + [("g", "k", "Y")] + [("m", "k", "Y")] * 3
+    repairer = DependencyRepairer(["p1", "p2"]).fit([r[2] for r in rows], [r[:2] for r in rows])
+
+    predicted = repairer.predict([("g", "k"), ("g", "z")])
+
+    assert predicted["value"].tolist() == ["Y", "X"]
+    assert predicted["pivot"].tolist() == ["p2", "p1"]
+
+
+def test_determined_cells_skip_the_llm(monkeypatch):
+    asked = []
+
+    async def fake_repair_data(entity_description, target_name, target_data, *args, **kwargs):
+        asked.extend(d["value"] for d in target_data)
+        return {"status": "success", "results": [{"value": "from llm"} for _ in target_data]}
+
+    monkeypatch.setattr(core.repair, "repair_data", fake_repair_data)
+    cities, pivot_rows = _split(ROWS)
+    target_data = [{"id": i, "value": c} for i, c in enumerate(cities)]
+    pivot_data = [{"id": i, "values": list(p)} for i, p in enumerate(pivot_rows)]
+
+    response = asyncio.run(core.repair._repair_with_dependencies(
+        None, "city", target_data, PIVOTS, pivot_data, "llm", None, None, False, None, None,
+    ))
+
+    assert response["determined"] == 10 and asked == cities[10:]
+    assert response["results"][5]["value"] == "Birmingham"
+    assert response["results"][5]["table_name"] == "dependency: zip -> city"
+    assert response["results"][10] == {"value": "from llm"}
+
+
+def test_evaluate_dependencies_against_clean(tmp_path):
+    folder = tmp_path / "cities"
+    folder.mkdir()
+    dirty = pd.DataFrame(ROWS, columns=["zip", "state", "city"])
+    clean = dirty.replace({"city": {"bham": "Birmingham", "": "Bessemer", "N/A": "Bessemer"}})
+    dirty.to_csv(folder / "dirty.csv", index=False)
+    clean.to_csv(folder / "clean.csv", index=False)
+
+    report = evaluate_dependencies("cities", "city", PIVOTS, root=str(tmp_path))
+
+    assert report["status"] == "success" and report["cells"] == 14 and report["errors"] == 3
+    assert (report["determined"], report["determined_correct"]) == (10, 10)
+    assert (report["errors_fixed"], report["errors_introduced"]) == (1, 0)
+    assert evaluate_dependencies("cities", "county", PIVOTS, root=str(tmp_path))["status"] == "fail"
@@ -0,0 +1,103 @@
+import pytest
+
+import core.feedback as feedback
+from core.feedback import FeedbackBuffer
+
+
+def _item(dirty, repaired, column="city", table="t"):
+    return {"table": table, "column": column, "dirty_value": dirty, "repaired_value": repaired, "accepted": True}
+
+
+@pytest.fixture
+def buffer():
+    return FeedbackBuffer(flush_size=1000, flush_interval=3600, max_retries=2)
+
+
+@pytest.fixture(params=["local", "store"])
+def lookup(request, monkeypatch):
+    """Run the duplicate check against the in-process copy and against Qdrant itself."""
+    if request.param == "store":
+        monkeypatch.setattr(feedback, "get_local_index", lambda name: None)
+    return request.param
+
+
+def test_mappings_already_in_the_index_are_not_written_again(buffer, qdrant, model, index_name, lookup):
+    buffer.add(index_name, [_item("bham", "Birmingham"), _item(None, "Unknown")])
+    assert buffer.flush() == {"written": 2, "duplicates": 0, "failed": 0}
+
+    again = FeedbackBuffer(flush_size=1000, flush_interval=3600)
+    again.add(index_name, [_item("bham", "Birmingham"), _item(None, "Unknown"), _item("mgm", "Montgomery")])
+
+    assert again.flush() == {"written": 1, "duplicates": 2, "failed": 0}
+    assert qdrant.count(index_name, exact=True).count == 3
+
+
+def test_a_null_field_does_not_match_a_present_one(buffer, qdrant, model, index_name, lookup):
+    buffer.add(index_name, [_item("", "Unknown")])
+    buffer.flush()
+
+    buffer.add(index_name, [_item(None, "Unknown")])
+    assert buffer.flush()["written"] == 1
+
+
+def test_only_failed_mappings_are_retried(buffer, qdrant, model, index_name, monkeypatch):
+    exists = feedback._mapping_exists
+
+    def flaky(index, table, column, dirty, clean):
+        if dirty == "bad":
+            raise ConnectionError("timed out")
+        return exists(index, table, column, dirty, clean)
+
+    monkeypatch.setattr(feedback, "_mapping_exists", flaky)
+    buffer.add(index_name, [_item("bham", "Birmingham"), _item("bad", "Bad")])
+
+    assert buffer.flush() == {"written": 1, "duplicates": 0, "failed": 1}
+    assert list(buffer.pending) == [(index_name, "t", "city", "bad", "Bad")]
+
+    monkeypatch.setattr(feedback, "_mapping_exists", exists)
+    assert buffer.flush() == {"written": 1, "duplicates": 0, "failed": 0}
+    assert buffer.status()["pending"] == 0 and buffer.failures == {}
+
+
+def test_mappings_are_dropped_after_max_retries(buffer, qdrant, model, index_name, monkeypatch):
+    monkeypatch.setattr(feedback, "_upload_points", lambda *a, **k: (_ for _ in ()).throw(ConnectionError("down")))
+    buffer.add(index_name, [_item("bham", "Birmingham")])
+
+    for _ in range(buffer.max_retries):
+        assert buffer.flush()["failed"] == 1
+        assert buffer.status()["pending"] == 1
+    buffer.flush()
+
+    status = buffer.status()
+    assert status["pending"] == 0 and status["dropped"] == 1 and status["errors"] == 3
+
+
+def test_flush_endpoint_flushes_off_the_event_loop(buffer, qdrant, model, index_name, monkeypatch):
+    import asyncio
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    import api.repair
+
+    buffer.add(index_name, [_item("bham", "Birmingham")])
+    flush = buffer.flush
+    seen = {}
+
+    def checked_flush():
+        try:
+            asyncio.get_running_loop()
+            seen["on_loop"] = True
+        except RuntimeError:
+            seen["on_loop"] = False
+        return flush()
+
+    monkeypatch.setattr(buffer, "flush", checked_flush)
+    monkeypatch.setattr(api.repair, "feedback_buffer", buffer)
+    app = FastAPI()
+    app.include_router(api.repair.router, prefix="/repair")
+
+    response = TestClient(app).post("/repair/feedback/flush")
+
+    assert response.status_code == 200 and response.json()["written"] == 1
+    assert seen == {"on_loop": False}
@@ -0,0 +1,95 @@
+import multiprocessing
+
+from core.lexical_index import LexicalIndex, tokenize, reciprocal_rank_fusion
+from core.local_index import LocalHit
+
+
+def _doc(text):
+    return {"values": text}
+
+
+def test_tokenize_has_words_and_trigrams():
+    terms = tokenize("Birmingham AL, unit B")
+    assert "w:birmingham" in terms and "w:al" in terms
+    assert "#bi" in terms and "am#" in terms and "#al" in terms
+    assert "#b#" in terms  # one-letter words are kept whole
+
+
+def test_typo_still_matches_best_document(tmp_path):
+    index = LexicalIndex("kb", root=str(tmp_path)).create()
+    index.add([1, 2, 3], [_doc("city birmingham"), _doc("city montgomery"), _doc("state alabama")])
+
+    hits = index.search("city birminghxm", limit=2)
+
+    assert hits[0].id == 1
+    assert hits[0].score > hits[1].score
+
+
+def test_writes_through_stale_handles_are_merged(tmp_path):
+    first = LexicalIndex("kb", root=str(tmp_path)).create()
+    second = LexicalIndex("kb", root=str(tmp_path)).load()
+
+    first.add([1], [_doc("alpha")])
+    second.add([2], [_doc("beta")])
+    second.add([1], [_doc("alpha gamma")])  # replacing an id rewrites the file
+
+    assert {h.id for h in first.search("alpha beta", limit=5)} == {1, 2}
+    assert [h.id for h in first.search("gamma", limit=5)] == [1]
+    reloaded = LexicalIndex("kb", root=str(tmp_path)).load()
+    assert sorted(reloaded.position) == [1, 2]
+
+
+def test_appends_from_other_handles_are_read_incrementally(tmp_path):
+    first = LexicalIndex("kb", root=str(tmp_path)).create()
+    first.add([1], [_doc("alpha")])
+    second = LexicalIndex("kb", root=str(tmp_path)).load()
+    second.add([2], [_doc("beta")])
+
+    generation = first.generation
+    assert [h.id for h in first.search("beta", limit=1)] == [2]
+    # Appends don't touch the generation, so nothing was reloaded from scratch
+    assert first.generation == generation
+    assert first.ids == [1, 2]
+
+
+def test_delete_is_seen_by_other_handles(tmp_path):
+    first = LexicalIndex("kb", root=str(tmp_path)).create()
+    first.add([1, 2], [_doc("alpha"), _doc("alpha beta")])
+    second = LexicalIndex("kb", root=str(tmp_path)).load()
+
+    assert second.delete([1]) == 1
+
+    assert [h.id for h in first.search("alpha", limit=5)] == [2]
+    assert first.ids_where(lambda p: True) == [2]
+
+
+def test_add_after_drop_by_another_handle_writes_nothing(tmp_path):
+    first = LexicalIndex("kb", root=str(tmp_path)).create()
+    LexicalIndex("kb", root=str(tmp_path)).load().drop()
+
+    first.add([1], [_doc("alpha")])
+
+    assert not first.exists()
+    assert first.search("alpha", limit=1) == []
+
+
+def _append_in_child(root):
+    LexicalIndex("kb", root=root).load().add([2], [_doc("beta")])
+
+
+def test_search_sees_documents_added_by_another_process(tmp_path):
+    index = LexicalIndex("kb", root=str(tmp_path)).create()
+    index.add([1], [_doc("alpha")])
+
+    child = multiprocessing.get_context("spawn").Process(target=_append_in_child, args=(str(tmp_path),))
+    child.start()
+    child.join(60)
+    assert child.exitcode == 0
+
+    assert [h.id for h in index.search("beta", limit=1)] == [2]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    a, b, c = LocalHit("a", 0.9, {}), LocalHit("b", 0.8, {}), LocalHit("c", 0.7, {})
+    fused = reciprocal_rank_fusion([[a, b], [b, c]], k=60)
+    assert [hits[0].id for _, hits in fused] == ["b", "a", "c"]
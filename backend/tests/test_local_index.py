@@ -0,0 +1,154 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import core.local_index as local_index_module
+from core.local_index import LocalIndex, get_local_index, create_local_index
+
+
+def _vectors(*rows):
+    return np.asarray(rows, dtype=np.float32)
+
+
+def test_search_returns_exact_top_k_by_cosine(tmp_path):
+    index = LocalIndex("kb", root=str(tmp_path)).create()
+    index.add([1, 2, 3], _vectors([1, 0, 0], [0.8, 0.6, 0], [0, 0, 1]), [{"v": 1}, {"v": 2}, {"v": 3}])
+
+    hits = index.search(_vectors([1, 0, 0], [0, 0, 2]), limit=2)
+
+    assert [h.id for h in hits[0]] == [1, 2]
+    assert hits[0][0].score == pytest.approx(1.0)
+    assert hits[0][1].score == pytest.approx(0.8)
+    assert hits[1][0].id == 3
+
+
+def test_add_replaces_existing_ids(tmp_path):
+    index = LocalIndex("kb", root=str(tmp_path)).create()
+    index.add([1], _vectors([1, 0]), [{"v": "old"}])
+    index.add([1], _vectors([0, 1]), [{"v": "new"}])
+
+    reloaded = LocalIndex("kb", root=str(tmp_path)).load()
+    assert reloaded.ids == [1]
+    assert reloaded.payloads == [{"v": "new"}]
+    assert reloaded.search(_vectors([0, 1]), limit=1)[0][0].score == pytest.approx(1.0)
+
+
+def test_add_keeps_last_copy_of_an_id_repeated_in_one_batch(tmp_path):
+    index = LocalIndex("kb", root=str(tmp_path)).create()
+    index.add([1, 2, 1], _vectors([1, 0], [1, 1], [0, 1]), [{"v": "first"}, {"v": 2}, {"v": "last"}])
+
+    reloaded = LocalIndex("kb", root=str(tmp_path)).load()
+    assert reloaded.ids == [2, 1]
+    assert reloaded.payloads == [{"v": 2}, {"v": "last"}]
+    assert reloaded.search(_vectors([0, 1]), limit=1)[0][0].id == 1
+    assert reloaded.search(_vectors([0, 1]), limit=1)[0][0].score == pytest.approx(1.0)
+
+
+def test_writes_through_stale_handles_are_merged(tmp_path):
+    # Two handles on the same files, as in two workers: neither write may be lost
+    first = LocalIndex("kb", root=str(tmp_path)).create()
+    second = LocalIndex("kb", root=str(tmp_path)).load()
+
+    first.add([1], _vectors([1, 0]), [{"v": 1}])
+    second.add([2], _vectors([0, 1]), [{"v": 2}])
+
+    assert sorted(LocalIndex("kb", root=str(tmp_path)).load().ids) == [1, 2]
+    # The first handle picks up the second one's write before searching
+    assert {h.id for h in first.search(_vectors([1, 1]), limit=5)[0]} == {1, 2}
+
+
+def test_delete_and_set_payload_through_stale_handle(tmp_path):
+    first = LocalIndex("kb", root=str(tmp_path)).create()
+    second = LocalIndex("kb", root=str(tmp_path)).load()
+    first.add([1, 2], _vectors([1, 0], [0, 1]), [{"v": 1}, {"v": 2}])
+
+    assert second.set_payload([2], {"tag": "x"}) == 1
+    assert second.delete([1]) == 1
+
+    reloaded = LocalIndex("kb", root=str(tmp_path)).load()
+    assert reloaded.ids == [2]
+    assert reloaded.payloads == [{"v": 2, "tag": "x"}]
+
+
+def _add_in_child(root, pid):
+    LocalIndex("kb", root=root).load().add([pid], _vectors([0, 1]), [{"v": pid}])
+
+
+def test_search_sees_points_added_by_another_process(tmp_path):
+    index = LocalIndex("kb", root=str(tmp_path)).create()
+    index.add([1], _vectors([1, 0]), [{"v": 1}])
+
+    child = multiprocessing.get_context("spawn").Process(target=_add_in_child, args=(str(tmp_path), 2))
+    child.start()
+    child.join(60)
+    assert child.exitcode == 0
+
+    assert [h.id for h in index.search(_vectors([0, 1]), limit=1)[0]] == [2]
+    assert sorted(index.ids_where(lambda p: True)) == [1, 2]
+
+
+def test_write_after_another_process_dropped_the_copy_does_not_resurrect_it(tmp_path):
+    index = LocalIndex("kb", root=str(tmp_path)).create()
+    other = LocalIndex("kb", root=str(tmp_path)).load()
+    other.drop()
+
+    assert index.add([1], _vectors([1, 0]), [{"v": 1}]) is False
+    assert not index.exists()
+
+
+def test_outgrown_copy_is_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_index_module, "LOCAL_INDEX_MAX_POINTS", 2)
+    index = LocalIndex("kb", root=str(tmp_path)).create()
+    assert index.add([1, 2], _vectors([1, 0], [0, 1]), [{}, {}]) is True
+    assert index.add([3], _vectors([1, 1]), [{}]) is False
+    assert not index.exists()
+
+
+def test_copy_being_built_is_hidden_from_readers(index_name):
+    create_local_index(index_name, building=True)
+    assert get_local_index(index_name) is None
+    building = get_local_index(index_name, include_building=True)
+    assert building is not None
+
+    building.mark_ready()
+    assert get_local_index(index_name) is building
+
+
+def _collection_with_points(qdrant, name, n, dim=4):
+    from qdrant_client import models
+
+    qdrant.create_collection(name, vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE))
+    vectors = np.eye(n, dim, dtype=np.float32) + 0.01
+    payloads = [{"table": "t", "column": "city", "dirty_value": f"d{i}", "clean_value": f"c{i}",
+                 "table_name": "log.jsonl", "row_number": i} for i in range(n)]
+    qdrant.upload_collection(name, vectors=vectors, payload=payloads, ids=list(range(n)), wait=True)
+    return vectors
+
+
+def test_build_local_copy_backfills_existing_collection(qdrant, index_name):
+    from core.index import build_local_copy
+
+    vectors = _collection_with_points(qdrant, index_name, 3)
+    assert get_local_index(index_name) is None
+
+    response = build_local_copy(index_name)
+
+    assert response == {"status": "success", "built": True, "points": 3}
+    local = get_local_index(index_name)
+    hit = local.search(vectors[2], limit=1)[0][0]
+    assert hit.id == 2
+    # Compact payloads from the store come back expanded
+    assert hit.payload["values"] == "Repair log | table: t | column: city | change 'd2' -> 'c2'"
+
+
+def test_build_local_copy_skips_large_collections(qdrant, index_name, monkeypatch):
+    import core.index
+
+    monkeypatch.setattr(core.index, "LOCAL_INDEX_MAX_POINTS", 2)
+    _collection_with_points(qdrant, index_name, 3)
+
+    response = core.index.build_local_copy(index_name)
+
+    assert response["built"] is False and response["points"] == 3
+    assert get_local_index(index_name, include_building=True) is None
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+import core.log_sync as log_sync
+from core.index import expand_payload, delete_index, delete_points, DeletePointsRequest
+from core.log_sync import sync_history_log, resolve_sync_path
+
+
+@pytest.fixture
+def log_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_sync, "SYNC_ROOT", str(tmp_path))
+    return tmp_path
+
+
+def _line(i):
+    return json.dumps({"table": "t", "column": "city", "dirty_value": f"bham {i}", "clean_value": "Birmingham"}) + "\n"
+
+
+def _write(path, lines, mode="w"):
+    with open(path, mode) as f:
+        f.write("".join(lines))
+
+
+def _dirty_values(qdrant, index_name):
+    points, _ = qdrant.scroll(index_name, limit=100, with_payload=True)
+    return sorted(expand_payload(p.payload)["row"]["dirty_value"] for p in points)
+
+
+def test_only_appended_lines_are_embedded(qdrant, model, index_name, log_dir):
+    log = log_dir / "history.jsonl"
+    _write(log, [_line(0), _line(1)])
+    first = sync_history_log(index_name, "history.jsonl")
+    assert (first["mode"], first["reason"], first["upserted"]) == ("full", "first sync", 2)
+
+    _write(log, [_line(2), '{"table": "t", "col'], mode="a")  # last line still being written
+    appended = sync_history_log(index_name, "history.jsonl")
+    assert (appended["mode"], appended["upserted"]) == ("incremental", 1)
+    assert appended["offset"] == len(_line(0) + _line(1) + _line(2))
+
+    assert sync_history_log(index_name, "history.jsonl")["upserted"] == 0
+    assert _dirty_values(qdrant, index_name) == ["bham 0", "bham 1", "bham 2"]
+
+
+@pytest.mark.parametrize("reason, lines", [
+    ("rewritten", [_line(5), _line(6), _line(7)]),
+    ("truncated", [_line(5)]),
+])
+def test_changed_prefix_rebuilds_the_source(qdrant, model, index_name, log_dir, reason, lines):
+    log = log_dir / "history.jsonl"
+    _write(log, [_line(0), _line(1)])
+    sync_history_log(index_name, "history.jsonl")
+
+    _write(log, lines)
+    rebuilt = sync_history_log(index_name, "history.jsonl")
+
+    assert (rebuilt["mode"], rebuilt["reason"], rebuilt["upserted"]) == ("full", reason, len(lines))
+    assert _dirty_values(qdrant, index_name) == [json.loads(l)["dirty_value"] for l in lines]
+
+
+def test_sync_after_deleting_the_index_rebuilds_it(qdrant, model, index_name, log_dir):
+    _write(log_dir / "history.jsonl", [_line(0), _line(1)])
+    sync_history_log(index_name, "history.jsonl")
+
+    assert delete_index(index_name)["status"] == "success"
+    resynced = sync_history_log(index_name, "history.jsonl")
+
+    assert (resynced["mode"], resynced["reason"], resynced["upserted"]) == ("full", "first sync", 2)
+    assert _dirty_values(qdrant, index_name) == ["bham 0", "bham 1"]
+
+
+def test_emptied_index_gets_a_full_rebuild(qdrant, model, index_name, log_dir):
+    _write(log_dir / "history.jsonl", [_line(0), _line(1)])
+    sync_history_log(index_name, "history.jsonl")
+
+    delete_points(DeletePointsRequest(index_name=index_name, filter={"column": "city"}))
+    resynced = sync_history_log(index_name, "history.jsonl")
+
+    assert (resynced["mode"], resynced["reason"], resynced["upserted"]) == ("full", "index missing or empty", 2)
+    assert _dirty_values(qdrant, index_name) == ["bham 0", "bham 1"]
+
+
+def test_paths_are_confined_to_the_sync_root(log_dir, tmp_path_factory):
+    outside = tmp_path_factory.mktemp("outside") / "secret.jsonl"
+    _write(outside, [_line(0)])
+
+    with pytest.raises(ValueError):
+        resolve_sync_path(str(outside))
+    with pytest.raises(ValueError):
+        resolve_sync_path("../" + outside.parent.name + "/secret.jsonl")
+    with pytest.raises(FileNotFoundError):
+        resolve_sync_path("missing.jsonl")
@@ -0,0 +1,173 @@
+import time
+import threading
+
+import pytest
+
+from language_models.ollama_pool import OllamaPool, NoHealthyHost
+
+
+class ResponseError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class FakeOllama:
+    """Ollama client stand-in: answers with its host name, or fails while ``down``."""
+
+    def __init__(self, url, gate=None):
+        self.url = url
+        self.gate = gate  # calls block until it is set
+        self.down = False
+        self.error = None
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def chat(self, **kwargs):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            if self.gate is not None:
+                self.gate.wait(5)
+            if self.error is not None:
+                raise self.error
+            if self.down:
+                raise ConnectionError(f"{self.url} refused")
+            return {"message": {"content": self.url}}
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def list(self):
+        if self.down:
+            raise ConnectionError(f"{self.url} refused")
+        return {"models": []}
+
+
+def _pool(n=2, gate=None, **kwargs):
+    clients = {}
+
+    def factory(url):
+        clients[url] = FakeOllama(url, gate)
+        return clients[url]
+
+    kwargs.setdefault("health_interval", 3600)
+    pool = OllamaPool([f"h{i}" for i in range(n)], client_factory=factory, **kwargs)
+    return pool, clients
+
+
+def _in_threads(fn, n):
+    results, threads = [], [threading.Thread(target=lambda: results.append(fn())) for _ in range(n)]
+    for t in threads:
+        t.start()
+    return threads, results
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_concurrent_calls_go_to_the_least_busy_hosts():
+    gate = threading.Event()
+    pool, clients = _pool(3, gate=gate, max_concurrency=4)
+
+    threads, results = _in_threads(lambda: pool.chat(model="m")["message"]["content"], 3)
+    _wait_for(lambda: sum(h["outstanding"] for h in pool.status()) == 3)
+    # One call in flight on each host, not three on one
+    assert [h["outstanding"] for h in pool.status()] == [1, 1, 1]
+
+    gate.set()
+    for t in threads:
+        t.join()
+    assert sorted(results) == ["h0", "h1", "h2"]
+    assert all(h["outstanding"] == 0 and h["served"] == 1 for h in pool.status())
+
+
+def test_each_host_runs_at_most_max_concurrency_calls():
+    gate = threading.Event()
+    pool, clients = _pool(1, gate=gate, max_concurrency=2)
+
+    threads, results = _in_threads(lambda: pool.chat(model="m"), 5)
+    _wait_for(lambda: pool.status()[0]["outstanding"] == 5)
+    time.sleep(0.05)
+    assert clients["h0"].active == 2  # the other three wait for a slot
+
+    gate.set()
+    for t in threads:
+        t.join()
+    assert len(results) == 5 and clients["h0"].peak == 2
+
+
+def test_a_busy_host_times_out_instead_of_waiting_forever():
+    gate = threading.Event()
+    pool, _ = _pool(1, gate=gate, max_concurrency=1, acquire_timeout=0.05)
+    threads, _ = _in_threads(lambda: pool.chat(model="m"), 1)
+    _wait_for(lambda: pool.status()[0]["outstanding"] == 1)
+
+    with pytest.raises(NoHealthyHost):
+        pool.chat(model="m")
+
+    gate.set()
+    threads[0].join()
+    # A full host is not a failing one
+    assert pool.status()[0]["healthy"] and pool.status()[0]["failures"] == 0
+
+
+def test_failing_host_is_retried_elsewhere_then_ejected():
+    pool, clients = _pool(2, max_failures=2)
+    clients["h0"].down = True
+
+    for _ in range(20):
+        assert pool.chat(model="m")["message"]["content"] == "h1"
+        if not pool.status()[0]["healthy"]:
+            break
+    assert pool.status()[0] == {"url": "h0", "healthy": False, "outstanding": 0, "failures": 2, "served": 0}
+
+    calls = clients["h0"].calls
+    for _ in range(5):
+        pool.chat(model="m")
+    assert clients["h0"].calls == calls  # ejected hosts get no traffic
+
+
+def test_client_errors_are_not_held_against_the_host():
+    pool, clients = _pool(1, max_failures=1)
+    clients["h0"].error = ResponseError(404)
+
+    with pytest.raises(ResponseError):
+        pool.chat(model="missing")
+    assert clients["h0"].calls == 1  # not retried
+    assert pool.status()[0]["healthy"]
+
+
+def test_no_healthy_host_left():
+    pool, clients = _pool(2, max_failures=1)
+    for client in clients.values():
+        client.down = True
+    with pytest.raises(NoHealthyHost):
+        pool.chat(model="m")
+    with pytest.raises(NoHealthyHost):
+        pool.chat(model="m")
+    assert sum(c.calls for c in clients.values()) == 2
+
+
+def test_health_thread_readmits_hosts_and_stops():
+    pool, clients = _pool(2, max_failures=1, health_interval=0.02)
+    clients["h0"].down = True
+    while pool.status()[0]["healthy"]:
+        pool.chat(model="m")
+    assert pool._health_thread is not None
+
+    time.sleep(0.1)
+    assert not pool.status()[0]["healthy"]  # still failing its probes
+
+    clients["h0"].down = False
+    _wait_for(lambda: pool.status()[0]["healthy"])
+    _wait_for(lambda: pool._health_thread is None)
+    assert pool.status()[0]["failures"] == 0
@@ -0,0 +1,111 @@
+import json
+
+import numpy as np
+import pytest
+
+import core.index
+from core.index import (
+    build_payload, compact_payload, expand_payload, row_to_sentence, _ensure_collection, _upload_points,
+    _delete_points, delete_index, migrate_payloads, MigratePayloadsRequest, ROW_EXTRA_STORED,
+)
+from core.payload_store import StringTable, get_row_store
+
+
+def _full(row, source="log.jsonl", number=0):
+    return build_payload(row, row_to_sentence(row), source, number)
+
+
+ROWS = [
+    {"table": "t", "column": "city", "dirty_value": "bham", "clean_value": "Birmingham", "id": 7, "user": "ann"},
+    {"table": "t", "column": "city", "dirty_value": None, "clean_value": "Unknown"},
+    {"table": "t", "column": "zip", "domain_rule": "five digits"},
+    {"table": "t", "column": "zip", "rule": "five digits", "source": "kb"},
+]
+
+
+@pytest.mark.parametrize("row", ROWS)
+def test_compact_payloads_expand_to_the_full_one(row):
+    full = _full(row)
+    compact = compact_payload(full)
+
+    assert "values" not in compact and "row" not in compact
+    expanded = expand_payload(json.loads(json.dumps(compact)))
+    # Null fields are left out of the store; readers .get() them
+    assert {k: v for k, v in expanded.items() if v is not None} == {k: v for k, v in full.items() if v is not None}
+
+
+def test_compact_drops_the_duplicated_fields():
+    full = _full(ROWS[0])
+    compact = compact_payload(full)
+    assert compact["row_extra"] == {"id": 7, "user": "ann"}
+    assert len(json.dumps(compact)) < len(json.dumps(full)) * 0.7
+
+
+def test_repeated_strings_are_shared_between_payloads():
+    first = expand_payload(json.loads(json.dumps(compact_payload(_full(ROWS[0])))))
+    second = expand_payload(json.loads(json.dumps(compact_payload(_full(ROWS[1], number=1)))))
+
+    assert first["table_name"] is second["table_name"] and first["column"] is second["column"]
+    assert first["row"]["table"] is second["row"]["table"]
+    assert list(first)[0] is list(second)[0]  # keys as well
+
+
+def test_string_table_is_bounded():
+    table = StringTable(max_size=2)
+    a, b = table.intern("".join(["a", "b"])), table.intern("cd")
+    assert table.intern("".join(["a", "b"])) is a
+    overflow = "".join(["e", "f"])
+    assert table.intern(overflow) is overflow and len(table.strings) == 2
+    assert table.intern(3) == 3
+
+
+@pytest.fixture
+def off_index_rows(monkeypatch):
+    monkeypatch.setattr(core.index, "PAYLOAD_KEEP_ROW", False)
+
+
+def _stored(qdrant, index_name, point_id):
+    return qdrant.retrieve(index_name, [point_id], with_payload=True)[0].payload
+
+
+def test_rows_kept_off_index_are_restored_on_read(qdrant, model, index_name, off_index_rows):
+    _ensure_collection(index_name)
+    payloads = [_full(row, number=i) for i, row in enumerate(ROWS)]
+    _upload_points(index_name, [1, 2, 3, 4], model.encode([p["values"] for p in payloads]), payloads)
+
+    stored = _stored(qdrant, index_name, 1)
+    assert "row_extra" not in stored and stored[ROW_EXTRA_STORED] is True
+    assert ROW_EXTRA_STORED not in _stored(qdrant, index_name, 3)  # nothing extra to keep
+
+    for point_id, full in zip([1, 2, 3, 4], payloads):
+        restored = expand_payload(_stored(qdrant, index_name, point_id), index_name, point_id)
+        assert restored["row"] == full["row"] and restored["values"] == full["values"]
+
+    _delete_points(index_name, [1])
+    assert get_row_store(index_name).get(1) is None and get_row_store(index_name).get(4) == {"source": "kb"}
+    core.index._delete_where(index_name, {"column": "zip"})
+    assert get_row_store(index_name).get(4) is None
+
+    delete_index(index_name)
+    assert not get_row_store(index_name).exists()
+
+
+def test_migration_reports_bytes_and_moves_rows_both_ways(qdrant, model, index_name, monkeypatch):
+    monkeypatch.setattr(core.index, "PAYLOAD_LAYOUT", "full")
+    _ensure_collection(index_name)
+    payloads = [_full(row, number=i) for i, row in enumerate(ROWS)]
+    _upload_points(index_name, [1, 2, 3, 4], np.ones((4, model.get_sentence_embedding_dimension())), payloads)
+
+    monkeypatch.setattr(core.index, "PAYLOAD_KEEP_ROW", False)
+    report = migrate_payloads(MigratePayloadsRequest(index_name=index_name, layout="compact", dry_run=True))
+    assert report["rewritten"] == 0 and report["bytes_per_point_after"] < report["bytes_per_point_before"]
+    assert not get_row_store(index_name).exists()  # a dry run writes nothing
+
+    compacted = migrate_payloads(MigratePayloadsRequest(index_name=index_name, layout="compact"))
+    assert compacted["rewritten"] == 4 and compacted["reduction"] > 0.4
+    assert get_row_store(index_name).get(1) == {"id": 7, "user": "ann"}
+
+    restored = migrate_payloads(MigratePayloadsRequest(index_name=index_name, layout="full"))
+    assert restored["rewritten"] == 4
+    assert _stored(qdrant, index_name, 1)["row"] == ROWS[0]
+    assert get_row_store(index_name).get(1) is None
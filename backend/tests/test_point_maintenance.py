@@ -0,0 +1,85 @@
+
+import numpy as np
+import pytest
+
+from core.index import (
+    build_payload, row_to_sentence, expand_payload, _ensure_collection, _upload_points,
+    delete_points, update_points, DeletePointsRequest, UpdatePointsRequest,
+)
+
+ROWS = [
+    ({"table": "t", "column": "city", "dirty_value": "bham", "clean_value": "Birmingham"}, "a.jsonl", 100.0),
+    ({"table": "t", "column": "city", "dirty_value": "mgm", "clean_value": "Montgomery"}, "b.jsonl", 200.0),
+    ({"table": "t", "column": "zip", "dirty_value": "3500", "clean_value": "35004"}, "b.jsonl", 300.0),
+    ({"table": "t", "column": "zip", "domain_rule": "five digits"}, "rules.jsonl", None),  # predates ingested_at
+]
+
+
+@pytest.fixture
+def points(qdrant, model, index_name):
+    _ensure_collection(index_name)
+    payloads = []
+    for n, (row, source, ingested_at) in enumerate(ROWS):
+        payload = build_payload(row, row_to_sentence(row), source, n)
+        payload["ingested_at"] = ingested_at
+        payloads.append(payload)
+    _upload_points(index_name, [1, 2, 3, 4], model.encode([p["values"] for p in payloads]), payloads)
+
+
+def _remaining(qdrant, index_name):
+    records, _ = qdrant.scroll(index_name, limit=100, with_payload=True, with_vectors=True)
+    return {r.id: (expand_payload(r.payload, index_name, r.id), np.asarray(r.vector)) for r in sorted(records, key=lambda r: r.id)}
+
+
+def _delete(index_name, **spec):
+    return delete_points(DeletePointsRequest(index_name=index_name, filter=spec))
+
+
+def _update(index_name, values, **spec):
+    return update_points(UpdatePointsRequest(index_name=index_name, filter=spec, set=values))
+
+
+def test_delete_by_column_and_source(qdrant, index_name, points):
+    assert _delete(index_name, column="city", source="b.jsonl") == {"status": "success", "deleted": 1}
+    assert list(_remaining(qdrant, index_name)) == [1, 3, 4]
+
+    assert _delete(index_name, column="city", source="b.jsonl")["deleted"] == 0
+
+
+def test_time_ranges_skip_points_without_ingested_at(qdrant, index_name, points):
+    assert _delete(index_name, column="zip", ingested_before=250.0)["deleted"] == 0
+    assert _delete(index_name, ingested_after=150.0, ingested_before=300.0)["deleted"] == 2
+    assert list(_remaining(qdrant, index_name)) == [1, 4]
+
+
+def test_metadata_updates_keep_vectors(qdrant, index_name, points):
+    before = _remaining(qdrant, index_name)
+
+    result = _update(index_name, {"reviewed_by": "ann"}, column="city")
+
+    assert result == {"status": "success", "updated": 2, "reembedded": 0}
+    after = _remaining(qdrant, index_name)
+    assert [after[i][0].get("reviewed_by") for i in (1, 2, 3)] == ["ann", "ann", None]
+    assert all(np.array_equal(before[i][1], after[i][1]) for i in before)
+
+
+def test_embedded_field_updates_reembed_only_matching_points(qdrant, model, index_name, points):
+    before = _remaining(qdrant, index_name)
+
+    result = _update(index_name, {"clean_value": "Birmingham, AL"}, source="a.jsonl")
+
+    assert result == {"status": "success", "updated": 1, "reembedded": 1}
+    after = _remaining(qdrant, index_name)
+    payload, vector = after[1]
+    assert payload["row"]["clean_value"] == "Birmingham, AL" and "Birmingham, AL" in payload["values"]
+    assert payload["ingested_at"] == 100.0 and payload["table_name"] == "a.jsonl"
+    expected = model.encode([payload["values"]])[0]
+    assert np.allclose(vector / np.linalg.norm(vector), expected / np.linalg.norm(expected), atol=1e-5)
+    assert all(np.array_equal(before[i][1], after[i][1]) for i in (2, 3, 4))
+
+
+def test_rejected_requests(index_name, points):
+    assert _update(index_name, {"values": "x"}, column="city")["status"] == "fail"
+    assert _update(index_name, {}, column="city")["status"] == "fail"
+    assert "at least one" in _delete(index_name)["message"]
+    assert _delete("no-such-index", column="city")["message"] == "index does not exist"
@@ -0,0 +1,66 @@
+import json
+
+import core.preprocess as preprocess
+from core.preprocess import estimate_tokens, pack_context, prompt_preprocess
+
+
+def test_estimate_tokens_counts_words_and_punctuation():
+    assert estimate_tokens("city: Birmingham, AL") == 5
+    assert estimate_tokens("") == 0
+    assert estimate_tokens(35004) == 1
+
+
+def test_packs_best_first_preferring_rerank_scores():
+    context = [
+        {"values": "city montgomery", "score": 0.9},
+        {"values": "city birmingham", "score": 0.2, "rerank_score": 5.0},
+        {"values": "zip 35004", "score": "0.1 || 0.95"},  # merged hit from two indexes
+    ]
+
+    packed, used = pack_context(context, token_budget=100)
+
+    assert [c["values"] for c in packed] == ["city birmingham", "zip 35004", "city montgomery"]
+    assert used == 6
+
+
+def test_near_duplicates_are_packed_once():
+    context = [
+        {"values": "city: Birmingham, AL", "score": 0.9},
+        {"values": "City Birmingham AL", "score": 0.8},
+        {"values": "city: Montgomery, AL", "score": 0.7},
+    ]
+
+    packed, _ = pack_context(context, token_budget=100)
+
+    assert [c["score"] for c in packed] == [0.9, 0.7]
+
+
+def test_oversized_items_are_skipped_but_smaller_ones_still_fit():
+    context = [
+        {"values": "a b c", "score": 0.9},
+        {"values": "d e f g h i", "score": 0.8},
+        {"values": "j k", "score": 0.7},
+        "not a hit",
+    ]
+
+    packed, used = pack_context(context, token_budget=5)
+
+    assert [c["values"] for c in packed] == ["a b c", "j k"] and used == 5
+    assert pack_context(None) == ([], 0)
+
+
+def test_default_budget(monkeypatch):
+    monkeypatch.setattr(preprocess, "CONTEXT_TOKEN_BUDGET", 3)
+    context = [{"values": f"row {i} value", "score": 1 - i / 10} for i in range(5)]
+
+    packed, used = pack_context(context)
+
+    assert len(packed) == 1 and used == 3
+
+
+def test_prompt_carries_every_packed_snippet():
+    packed, _ = pack_context([{"values": f"row {i}", "score": i} for i in range(3)], token_budget=100)
+
+    prompt = json.loads(prompt_preprocess("Expand the city", "city", {"value": "bham"}, [], [], packed))
+
+    assert prompt == {"value": "bham", "guidance": "Expand the city", "context": ["row 2", "row 1", "row 0"]}
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from core.domain_kb.profile import value_patterns, profile_columns, format_profile
+
+
+def test_value_patterns_collapse_character_class_runs():
+    shapes = value_patterns(pd.Series(["12.0 oz.", "AL", "256-386-4556", "Ab1"], dtype="str"))
+    assert shapes.tolist() == ["9+.9 a+.", "A+", "9+-9+-9+", "Aa9"]
+
+
+def test_profile_counts_over_non_null_values():
+    df = pd.DataFrame({
+        "state": ["al", "al", "ak", None, " "],
+        "zip": ["35004", "35005", "x", "35007", "35008"],
+    })
+
+    profiles = profile_columns(df)
+
+    state = profiles["state"]
+    assert state["rows"] == 5 and state["null_rate"] == 0.4 and state["distinct"] == 3
+    assert state["top_values"][0] == ("al", 0.5)
+    assert state["patterns"][0] == ("a+", 0.75)
+    assert profiles["zip"]["numeric"] == {"share": 0.8, "min": 35004.0, "max": 35008.0}
+    assert profiles["zip"]["length"] == (1, 5, 4.2)
+
+
+def test_format_profile_is_one_line():
+    line = format_profile("zip", profile_columns(pd.DataFrame({"zip": ["35004", "35005"]}))["zip"])
+    assert "\n" not in line
+    assert line.startswith("column: zip | ")
+    assert "patterns: '9+' (100%)" in line and "numeric: 100% in [35004, 35005]" in line
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+import core.rerank as rerank
+import core.search
+from core.index import build_payload, row_to_sentence, _ensure_collection, _upload_points
+from core.local_index import LocalHit
+from core.search import search_data
+
+
+class CountingCrossEncoder:
+    """Scores a pair by the words query and text share; records every pair it scores."""
+
+    def __init__(self):
+        self.pairs = []
+
+    def predict(self, pairs, batch_size=None):
+        self.pairs.extend(tuple(p) for p in pairs)
+        return [len(set(q.split()) & set(t.split())) for q, t in pairs]
+
+
+@pytest.fixture
+def cross_encoder(monkeypatch):
+    model = CountingCrossEncoder()
+    monkeypatch.setattr(rerank, "_model", model)
+    monkeypatch.setattr(rerank, "score_cache", rerank.LRUCache(100))
+    return model
+
+
+def _hits(*texts):
+    return [LocalHit(i, 1.0 - i / 10, {"values": text}) for i, text in enumerate(texts)]
+
+
+def test_hits_are_ordered_by_cross_encoder_score(cross_encoder):
+    hits = _hits("state alabama", "city birmingham al", "city montgomery")
+
+    reranked = rerank.rerank_batch(["city birmingham"], [hits], top_k=2)[0]
+
+    assert [h.id for h in reranked] == [1, 2]
+    assert [h.rerank_score for h in reranked] == [2, 1]
+    assert reranked[0].score == pytest.approx(0.9)  # retrieval score is kept
+
+
+def test_each_pair_is_scored_once_across_queries_and_calls(cross_encoder):
+    hits = _hits("city birmingham", "city montgomery")
+
+    rerank.rerank_batch(["birmingham", "birmingham", "montgomery"], [hits, hits, hits], top_k=1)
+    assert len(cross_encoder.pairs) == 4
+
+    again = rerank.rerank_batch(["birmingham"], [hits], top_k=1)
+    assert len(cross_encoder.pairs) == 4  # served from the score cache
+    assert again[0][0].payload["values"] == "city birmingham"
+
+
+def test_queries_without_candidates(cross_encoder):
+    assert rerank.rerank_batch(["a", "b"], [[], []], top_k=3) == [[], []]
+    assert cross_encoder.pairs == []
+
+
+def test_results_of_a_failed_rerank_are_not_cached_as_reranked(qdrant, model, index_name, cross_encoder, monkeypatch):
+    _ensure_collection(index_name)
+    rows = [{"table": "t", "column": "city", "dirty_value": c[:3], "clean_value": c} for c in ["Birmingham", "Mobile"]]
+    payloads = [build_payload(row, row_to_sentence(row), "log.jsonl", n) for n, row in enumerate(rows)]
+    _upload_points(index_name, [0, 1], model.encode([p["values"] for p in payloads]), payloads)
+
+    def search():
+        return asyncio.run(search_data(
+            "the city name", index_name, "semantic", "city", [{"id": 0, "value": "bir"}], [], [], will_rerank=True,
+        ))["results"][0]
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("sidecar down")
+
+    monkeypatch.setattr(core.search, "rerank_batch", broken)
+    assert all("rerank_score" not in hit for hit in search())
+
+    monkeypatch.setattr(core.search, "rerank_batch", rerank.rerank_batch)
+    assert all("rerank_score" in hit for hit in search())
@@ -0,0 +1,84 @@
+import os
+import multiprocessing
+
+import numpy as np
+
+from core.retrieval_cache import (
+    LRUCache, get_cached_results, put_cached_results, get_index_version, bump_index_version, encode_queries,
+)
+from core.shared_state import SharedCounter, state_path
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_results_are_reused_until_the_index_changes(index_name):
+    hits = [{"values": "x", "table_name": "t", "row_number": 0, "score": 0.9}]
+    put_cached_results(index_name, "q", {"index_type": "semantic"}, 1, hits)
+
+    cached = get_cached_results(index_name, "q", {"index_type": "semantic"}, 1)
+    assert cached == hits
+    cached[0]["score"] = 0.0  # callers get copies
+    assert get_cached_results(index_name, "q", {"index_type": "semantic"}, 1) == hits
+    assert get_cached_results(index_name, "q", {"index_type": "both"}, 1) is None
+
+    bump_index_version(index_name)
+    assert get_cached_results(index_name, "q", {"index_type": "semantic"}, 1) is None
+
+
+def _bump_in_child(name):
+    bump_index_version(name)
+
+
+def test_write_in_another_process_invalidates_this_process(index_name):
+    put_cached_results(index_name, "q", None, 1, [{"values": "old"}])
+    version = get_index_version(index_name)
+
+    child = multiprocessing.get_context("spawn").Process(target=_bump_in_child, args=(index_name,))
+    child.start()
+    child.join(60)
+    assert child.exitcode == 0
+
+    assert get_index_version(index_name) == version + 1
+    assert get_cached_results(index_name, "q", None, 1) is None
+
+
+def test_counter_reads_zero_without_creating_a_file(tmp_path):
+    path = str(tmp_path / "idx.version")
+    counter = SharedCounter(path)
+    assert counter.value() == 0
+    assert not os.path.exists(path)
+
+    assert counter.bump() == 1
+    assert counter.bump() == 2
+    assert SharedCounter(path).value() == 2
+
+
+def test_state_path_stays_inside_the_state_folder():
+    assert os.path.basename(state_path("a/b", "version")) == "a_b.version"
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_encode_queries_encodes_each_distinct_miss_once():
+    model = CountingModel()
+    first = encode_queries(model, ["cache-test a", "cache-test b", "cache-test a"])
+    second = encode_queries(model, ["cache-test b", "cache-test c"])
+
+    assert model.calls == [["cache-test a", "cache-test b"], ["cache-test c"]]
+    assert np.array_equal(first[0], first[2])
+    assert np.array_equal(first[1], second[0])
@@ -0,0 +1,91 @@
+import time
+import threading
+
+import pandas as pd
+import pytest
+
+import core.domain_kb.construct as construct
+from core.domain_kb.construct import run_rule_prompts, generate_rules_with_llm
+from core.retrieval_cache import LRUCache
+
+
+class RecordingLLM:
+    """Answers with the column name it finds in the prompt; records calls and peak concurrency."""
+
+    def __init__(self, fail=(), delay=0.0):
+        self.fail, self.delay = set(fail), delay
+        self.prompts, self.active, self.peak = [], 0, 0
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self.lock:
+            self.prompts.append(prompt)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            column = prompt.split("'")[1]
+            if column in self.fail:
+                raise RuntimeError("model unavailable")
+            return f"rule for {column}"
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+@pytest.fixture(autouse=True)
+def rule_cache(monkeypatch):
+    monkeypatch.setattr(construct, "_rule_cache", LRUCache(100))
+
+
+def _prompts(*columns, sample="1, 2, 3"):
+    return {col: f"column '{col}' values: {sample}" for col in columns}
+
+
+def test_calls_run_concurrently_up_to_max_workers():
+    llm = RecordingLLM(delay=0.05)
+
+    results = run_rule_prompts("t", _prompts("a", "b", "c", "d", "e"), llm, max_workers=2)
+
+    assert results == {col: f"rule for {col}" for col in "abcde"}
+    assert llm.peak == 2
+
+
+def test_only_changed_samples_are_asked_again():
+    llm = RecordingLLM()
+    run_rule_prompts("t", _prompts("a", "b"), llm)
+
+    prompts = {**_prompts("a"), **_prompts("b", sample="4, 5")}
+    again = run_rule_prompts("t", prompts, llm)
+
+    assert again == {"a": "rule for a", "b": "rule for b"}
+    assert llm.prompts[2:] == [prompts["b"]]
+
+
+def test_cache_is_scoped_by_table_and_model():
+    llm = RecordingLLM()
+    run_rule_prompts("t", _prompts("a"), llm)
+    run_rule_prompts("other", _prompts("a"), llm)
+    run_rule_prompts("t", _prompts("a"), llm, model="gpt-4o")
+
+    assert len(llm.prompts) == 3
+
+
+def test_failures_are_returned_and_not_cached():
+    failing = RecordingLLM(fail={"b"})
+    results = run_rule_prompts("t", _prompts("a", "b"), failing)
+    assert results["a"] == "rule for a" and isinstance(results["b"], RuntimeError)
+
+    recovered = RecordingLLM()
+    assert run_rule_prompts("t", _prompts("a", "b"), recovered)["b"] == "rule for b"
+    assert len(recovered.prompts) == 1
+
+
+def test_generated_rules_keep_column_order_and_fall_back_on_failure():
+    sample = pd.DataFrame({"city": ["birmingham", "montgomery"], "zip": ["35004", "36104"]})
+
+    rules = generate_rules_with_llm(sample, RecordingLLM(fail={"zip"}), table="hospital")
+
+    assert [(r["id"], r["column"]) for r in rules] == [("1", "city"), ("2", "zip")]
+    assert rules[0]["domain_rule"] == "rule for city" and rules[0]["table"] == "hospital"
+    assert rules[1]["domain_rule"] == "Column 'zip' requires valid data in appropriate format"
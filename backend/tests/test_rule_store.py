@@ -0,0 +1,97 @@
+import os
+import time
+import threading
+
+import pytest
+
+import core.domain_kb.rule_store as rule_store_module
+from core.domain_kb.rule_store import RuleStore, rule_point_id
+
+
+def _rule(rule_id, column="city", text="title case"):
+    return {"id": rule_id, "table": "t", "column": column, "rule": text}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch, index_name):
+    store = RuleStore(root=str(tmp_path))
+    monkeypatch.setattr(rule_store_module, "rule_store", store)
+    monkeypatch.setattr(rule_store_module, "RULE_INDEX_TEMPLATE", index_name + "_{dataset}")
+    return store
+
+
+def test_duplicate_ids_are_rejected_and_nothing_is_written(store):
+    with pytest.raises(ValueError, match=r"duplicate rule ids: \['r1'\]"):
+        store.save("ds", [_rule("r1"), _rule("r2"), _rule("r1", text="other")], sync_index=False)
+
+    assert not store.exists("ds")
+    assert store.history("ds") == []
+
+
+def test_rules_without_ids_collide_on_table_and_column(store):
+    with pytest.raises(ValueError, match="t:city"):
+        store.save("ds", [_rule(None), _rule(""), _rule(None, column="zip")], sync_index=False)
+
+
+def test_versions_record_the_delta(store):
+    store.save("ds", [_rule("r1"), _rule("r2"), _rule("r3")], sync_index=False)
+    result = store.save("ds", [_rule("r1"), _rule("r2", text="upper case"), _rule("r4")], sync_index=False)
+
+    assert result["version"] == 2
+    assert (result["added"], result["changed"], result["removed"]) == (1, 1, 1)
+    last = store.history("ds")[-1]
+    assert (last["added"], last["changed"], last["removed"]) == (["r4"], ["r2"], ["r3"])
+
+
+def test_concurrent_saves_get_their_own_version_and_delta(store, monkeypatch):
+    save_rules = rule_store_module.save_rules
+
+    def slow_save_rules(rules, path):
+        time.sleep(0.02)  # widen the window between reading the last version and appending the next
+        save_rules(rules, path)
+
+    monkeypatch.setattr(rule_store_module, "save_rules", slow_save_rules)
+    workers = [store, RuleStore(root=store.root)]  # two handles, as in two worker processes
+    threads = [
+        threading.Thread(target=workers[i % 2].save, args=("ds", [_rule(f"r{i}")]), kwargs={"sync_index": False})
+        for i in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    history = store.history("ds")
+    assert [v["version"] for v in history] == [1, 2, 3, 4, 5, 6]
+    # Each save removed exactly the rule the save before it wrote
+    for before, after in zip(history, history[1:]):
+        assert after["removed"] == before["added"]
+
+
+def test_load_rereads_the_file_only_when_it_changed(store, monkeypatch):
+    store.save("ds", [_rule("r1")], sync_index=False)
+    assert store.load("ds") == [_rule("r1")]
+
+    calls = []
+    monkeypatch.setattr(rule_store_module, "load_rules", lambda path: calls.append(path) or [])
+    assert store.load("ds") == [_rule("r1")]
+    assert calls == []
+
+    with open(store.path("ds"), "a") as f:
+        f.write("\n")
+    store.load("ds")
+    assert calls == [store.path("ds")]
+
+
+def test_only_the_delta_reaches_the_index(store, qdrant, model, index_name):
+    first = store.save("ds", [_rule("r1"), _rule("r2"), _rule("r3")])
+    collection = first["index_sync"]["index_name"]
+    assert first["index_sync"]["upserted"] == 3
+
+    second = store.save("ds", [_rule("r1"), _rule("r2", text="upper case")])
+
+    assert (second["index_sync"]["upserted"], second["index_sync"]["deleted"]) == (1, 1)
+    assert qdrant.count(collection, exact=True).count == 2
+    points = qdrant.retrieve(collection, [rule_point_id(collection, "r2"), rule_point_id(collection, "r3")])
+    assert [p.payload["rule"] for p in points] == ["upper case"]
+    assert os.path.basename(store.path("ds")) == points[0].payload["table_name"]
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.domain_kb.construct import (
+    StratifiedReservoir, stratified_sample, stratified_sample_csv, bounded_strata_columns,
+)
+
+
+def _frame(n=1000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "state": rng.choice(["al", "ak", "az"], size=n),
+        "kind": np.where(np.arange(n) == 7, "rare", "common"),
+        "name": [f"name {i}" for i in range(n)],
+        "score": rng.normal(size=n),
+    })
+
+
+@pytest.mark.parametrize("select", [
+    lambda df: df.iloc[::2],
+    lambda df: df.set_axis(df.index + 1000),
+    lambda df: df.set_axis([f"r{i}" for i in range(len(df))]),
+], ids=["strided", "shifted", "labels"])
+def test_sample_keeps_rows_and_labels_of_any_index(select):
+    df = select(_frame())
+
+    sampled = stratified_sample(df, 0.1, 20)
+
+    assert len(sampled) >= 20
+    assert sampled.index.isin(df.index).all()
+    pd.testing.assert_frame_equal(sampled, df.loc[sampled.index])
+
+
+def test_every_stratum_is_represented():
+    df = _frame()
+    sampled = stratified_sample(df, 0.05, 0, stratify_cols=["kind"])
+    assert "rare" in set(sampled["kind"])
+    assert 7 in sampled.index
+
+
+def test_high_cardinality_columns_are_not_strata():
+    assert bounded_strata_columns(_frame(), max_cardinality=50) == ["state", "kind"]
+    assert bounded_strata_columns(_frame(), ["name", "missing"], max_cardinality=50) == []
+
+
+def test_min_rows_tops_up_small_samples():
+    sampled = stratified_sample(_frame(100), 0.01, 30)
+    assert len(sampled) == 30
+
+
+def test_streamed_csv_matches_in_memory_sample(tmp_path):
+    df = _frame()
+    path = tmp_path / "data.csv"
+    df.to_csv(path, index=False)
+
+    streamed = stratified_sample_csv(str(path), 0.1, 20, stratify_cols=["state", "kind"], chunksize=37)
+    in_memory = stratified_sample(df, 0.1, 20, stratify_cols=["state", "kind"])
+
+    assert streamed.index.tolist() == in_memory.index.tolist()
+    pd.testing.assert_frame_equal(streamed, pd.read_csv(path).loc[streamed.index])
+
+
+def test_reservoir_memory_follows_the_sample_not_the_input():
+    sampler = StratifiedReservoir(frac=0.01, min_rows=10, stratify_cols=["state"])
+    for start in range(0, 200_000, 10_000):
+        chunk = pd.DataFrame({"state": np.resize(["al", "ak", "az"], 10_000), "v": np.arange(start, start + 10_000)})
+        sampler.update(chunk)
+        # Proportional share so far, one row per stratum, the top-up: nothing else is held
+        assert len(sampler.kept) <= 0.01 * sampler.rows_seen * 1.2 + 3 + 10
+
+    sampled = sampler.result()
+    assert sampler.rows_seen == 200_000
+    assert abs(len(sampled) - 2000) < 200
+    assert sampled["v"].is_unique
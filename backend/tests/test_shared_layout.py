@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+import core.layout as layout
+import core.search
+from core.index import (
+    build_payload, row_to_sentence, _ensure_collection, _upload_points, delete_index, delete_points,
+    DeletePointsRequest,
+)
+from core.layout import physical_name, physical_ids, list_indexes, index_exists, TENANT_KEY
+from core.search import search_data
+
+
+@pytest.fixture
+def shared(qdrant, model, monkeypatch, tmp_path):
+    monkeypatch.setattr(layout, "INDEX_LAYOUT", "shared")
+    monkeypatch.setattr(layout, "SHARED_COLLECTION", "shared_test")
+    monkeypatch.setattr(layout, "TENANT_REGISTRY_PATH", str(tmp_path / "tenants.json"))
+    return qdrant
+
+
+def _fill(model, index_name, cities):
+    _ensure_collection(index_name)
+    rows = [{"table": "t", "column": "city", "dirty_value": c[:3], "clean_value": c} for c in cities]
+    payloads = [build_payload(row, row_to_sentence(row), "log.jsonl", n) for n, row in enumerate(rows)]
+    _upload_points(index_name, list(range(len(rows))), model.encode([p["values"] for p in payloads]), payloads)
+
+
+def _tenant_counts(qdrant):
+    records, _ = qdrant.scroll("shared_test", limit=100, with_payload=True)
+    counts = {}
+    for r in records:
+        counts[r.payload[TENANT_KEY]] = counts.get(r.payload[TENANT_KEY], 0) + 1
+    return counts
+
+
+def test_indexes_are_tenants_of_one_collection(shared, model, index_name):
+    _fill(model, index_name + "_a", ["Birmingham", "Montgomery"])
+    _fill(model, index_name + "_b", ["Mobile", "Huntsville", "Tuscaloosa"])  # same logical ids 0, 1
+
+    assert physical_name(index_name + "_a") == "shared_test"
+    assert [c.name for c in shared.get_collections().collections] == ["shared_test"]
+    assert physical_ids(index_name + "_a", [0]) != physical_ids(index_name + "_b", [0])
+    assert _tenant_counts(shared) == {index_name + "_a": 2, index_name + "_b": 3}
+    assert list_indexes() == [index_name + "_a", index_name + "_b"]
+
+
+def test_search_only_sees_its_own_tenant(shared, model, index_name, monkeypatch):
+    monkeypatch.setattr(core.search, "get_local_index", lambda name: None)  # go through Qdrant
+    _fill(model, index_name + "_a", ["Birmingham"])
+    _fill(model, index_name + "_b", ["Birmingham", "Montgomery"])
+
+    result = asyncio.run(search_data(
+        "the city name", index_name + "_a", "semantic", "city",
+        [{"id": 0, "value": "bir"}], [], [], top_k=5,
+    ))
+
+    assert result["status"] == "success" and len(result["results"][0]) == 1
+
+
+def test_deletes_stay_inside_the_tenant(shared, model, index_name):
+    _fill(model, index_name + "_a", ["Birmingham", "Montgomery"])
+    _fill(model, index_name + "_b", ["Mobile"])
+
+    deleted = delete_points(DeletePointsRequest(index_name=index_name + "_a", filter={"column": "city"}))
+    assert deleted["deleted"] == 2
+    assert _tenant_counts(shared) == {index_name + "_b": 1}
+    assert index_exists(index_name + "_a")  # registered, just empty
+
+    delete_index(index_name + "_b")
+    assert not index_exists(index_name + "_b")
+    assert shared.collection_exists("shared_test") and list_indexes() == [index_name + "_a"]
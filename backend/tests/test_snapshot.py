@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+import core.layout as layout
+import core.snapshot as snapshot
+from conftest import HashingModel
+from core.index import build_payload, row_to_sentence, expand_payload, _ensure_collection, _upload_points
+from core.layout import physical_ids, tenant_filter
+from core.snapshot import export_snapshot, import_snapshot
+
+ROWS = [
+    {"table": "t", "column": "city", "dirty_value": "bham", "clean_value": "Birmingham", "id": 7},
+    {"table": "t", "column": "city", "dirty_value": None, "clean_value": "Montgomery"},
+    {"table": "t", "column": "zip", "domain_rule": "five digits"},
+]
+
+
+@pytest.fixture
+def source_index(qdrant, model, index_name):
+    _ensure_collection(index_name)
+    payloads = [build_payload(row, row_to_sentence(row), "log.jsonl", n) for n, row in enumerate(ROWS)]
+    _upload_points(index_name, [11, 12, 13], model.encode([p["values"] for p in payloads]), payloads)
+    return index_name
+
+
+def _points(qdrant, index_name):
+    records, _ = qdrant.scroll(index_name, limit=100, with_payload=True, with_vectors=True)
+    return {r.id: (expand_payload(r.payload, index_name, r.id), np.asarray(r.vector)) for r in records}
+
+
+def test_round_trip_keeps_ids_vectors_and_payloads(qdrant, source_index, tmp_path):
+    path = str(tmp_path / "snap.npz")
+    exported = export_snapshot(source_index, path)
+    assert exported["status"] == "success" and exported["points"] == 3
+
+    with np.load(path) as data:
+        assert data["vectors"].dtype == np.float32
+        assert data["num__row_number"].tolist() == [0, 1, 2]  # numeric fields stay arrays
+
+    restored = import_snapshot(source_index + "_copy", path)
+    assert restored["status"] == "success" and restored["points"] == 3
+
+    before, after = _points(qdrant, source_index), _points(qdrant, source_index + "_copy")
+    assert after.keys() == before.keys()
+    for point_id, (payload, vector) in before.items():
+        assert after[point_id][0] == payload
+        assert np.allclose(after[point_id][1], vector, rtol=1e-6)  # float32 as stored
+
+
+def test_half_precision_snapshots(qdrant, source_index, tmp_path):
+    full = export_snapshot(source_index, str(tmp_path / "full.npz"))
+    half = export_snapshot(source_index, str(tmp_path / "half.npz"), dtype="float16")
+    assert half["bytes"] < full["bytes"]
+
+    assert import_snapshot(source_index + "_half", half["path"])["status"] == "success"
+    before, after = _points(qdrant, source_index), _points(qdrant, source_index + "_half")
+    for point_id, (_, vector) in before.items():
+        assert np.allclose(after[point_id][1], vector, atol=1e-3)
+
+    assert export_snapshot(source_index, dtype="int8")["status"] == "fail"
+
+
+def test_existing_indexes_are_only_replaced_on_request(qdrant, source_index, tmp_path):
+    path = export_snapshot(source_index, str(tmp_path / "snap.npz"))["path"]
+    qdrant.delete(source_index, points_selector=[13])
+
+    assert import_snapshot(source_index, path)["message"] == "index already exists"
+    assert import_snapshot(source_index, path, overwrite=True)["points"] == 3
+    assert sorted(_points(qdrant, source_index)) == [11, 12, 13]
+
+
+@pytest.fixture
+def shared(monkeypatch, tmp_path):
+    monkeypatch.setattr(layout, "INDEX_LAYOUT", "shared")
+    monkeypatch.setattr(layout, "SHARED_COLLECTION", "shared_test")
+    monkeypatch.setattr(layout, "TENANT_REGISTRY_PATH", str(tmp_path / "tenants.json"))
+
+
+def _tenant_ids(qdrant, index_name):
+    records, _ = qdrant.scroll("shared_test", scroll_filter=tenant_filter(index_name), limit=100)
+    return sorted(r.id for r in records)
+
+
+def test_shared_layout_round_trip_keeps_point_identity(qdrant, shared, source_index, tmp_path):
+    stored = sorted(physical_ids(source_index, [11, 12, 13]))
+    assert _tenant_ids(qdrant, source_index) == stored
+
+    for attempt in range(2):  # a restored index exports and restores the same way again
+        path = export_snapshot(source_index, str(tmp_path / f"snap{attempt}.npz"))["path"]
+        assert import_snapshot(source_index, path, overwrite=True)["points"] == 3
+        assert _tenant_ids(qdrant, source_index) == stored
+
+    # Into another index the ids are namespaced again, so the two never collide
+    assert import_snapshot(source_index + "_copy", path)["points"] == 3
+    assert not set(_tenant_ids(qdrant, source_index + "_copy")) & set(stored)
+
+
+class WideModel(HashingModel):
+    def get_sentence_embedding_dimension(self) -> int:
+        return 128
+
+
+def test_snapshots_from_another_embedding_size_are_refused(qdrant, source_index, tmp_path, monkeypatch):
+    path = export_snapshot(source_index, str(tmp_path / "snap.npz"))["path"]
+    monkeypatch.setattr(snapshot, "sentence_model", WideModel())
+
+    refused = import_snapshot(source_index + "_wide", path)
+
+    assert refused["status"] == "fail" and "64-d" in refused["message"] and "128-d" in refused["message"]
+    assert not qdrant.collection_exists(source_index + "_wide")
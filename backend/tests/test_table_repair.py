@@ -0,0 +1,113 @@
+import io
+import csv
+import asyncio
+import zipfile
+
+import pytest
+
+import core.table_repair as table_repair
+from core.table_repair import validate_plan, repair_table_chunks, stream_repaired_zip, repair_table_files
+
+CSV = "id,city,state\n007,bham,al\n008,Mobile,\n009,mgm,al\n010,,al\n011,hsv,AL\n"
+PLAN = [{"target": "city", "pivots": ["state"]}, {"target": "state", "pivots": ["city"]}]
+EXPANSIONS = {"bham": "Birmingham", "mgm": "Montgomery", "hsv": "Huntsville"}
+
+
+class FakeRepair:
+    """Stands in for repair_data: expands city codes and upper-cases states; records the pivots it saw."""
+
+    def __init__(self, fail_target=None):
+        self.fail_target = fail_target
+        self.calls = []
+
+    async def __call__(self, entity_description, target, target_data, pivots, pivot_data, *args, **kwargs):
+        self.calls.append((target, [d["values"] for d in pivot_data]))
+        if target == self.fail_target:
+            return {"status": "fail", "message": "index does not exist"}
+        results = []
+        for d in target_data:
+            value = d["value"]
+            if target == "city":
+                results.append({"value": EXPANSIONS.get(value, value), "table_name": "log.jsonl", "confidence": 0.9})
+            elif value == "al":
+                results.append({"value": "AL", "table_name": "log.jsonl"})
+            else:
+                results.append({"status": "fail", "message": "no value"} if value is None else {"value": value})
+        return {"status": "success", "results": results, "degraded": target == "state"}
+
+
+@pytest.fixture
+def fake_repair(monkeypatch):
+    fake = FakeRepair()
+    monkeypatch.setattr(table_repair, "repair_data", fake)
+    return fake
+
+
+def _chunks(plan=PLAN, chunk_rows=2):
+    async def collect():
+        return [item async for item in repair_table_chunks(io.BytesIO(CSV.encode()), plan, "llm", chunk_rows=chunk_rows)]
+    return asyncio.run(collect())
+
+
+def test_validate_plan():
+    header = ["id", "city", "state"]
+    assert validate_plan(PLAN, header) is None
+    assert validate_plan([], header) == "plan must be a non-empty list of column steps"
+    assert validate_plan([{"pivots": ["state"]}], header) == "every plan step needs a 'target' column"
+    assert validate_plan([{"target": "city", "pivots": ["zip"]}], header) == "columns not in CSV: ['zip']"
+
+
+def test_chunks_are_repaired_step_by_step(fake_repair):
+    chunks = _chunks()
+
+    assert [len(chunk) for chunk, _ in chunks] == [2, 2, 1]
+    # The state step sees the cities the city step just repaired
+    assert fake_repair.calls[:2] == [("city", [["al"], [""]]), ("state", [["Birmingham"], ["Mobile"]])]
+
+    repaired = [chunk for chunk, _ in chunks]
+    assert repaired[0].to_dict("records") == [
+        {"id": "007", "city": "Birmingham", "state": "AL"},
+        {"id": "008", "city": "Mobile", "state": ""},  # untouched cells round-trip as text
+    ]
+    changes = [c for _, cs in chunks for c in cs]
+    assert {(c["row"], c["column"], c["dirty_value"], c.get("repaired_value")) for c in changes if not c.get("error")} == {
+        (0, "city", "bham", "Birmingham"), (0, "state", "al", "AL"),
+        (2, "city", "mgm", "Montgomery"), (2, "state", "al", "AL"),
+        (3, "state", "al", "AL"), (4, "city", "hsv", "Huntsville"),
+    }
+    assert [c["row"] for c in changes if c.get("error") == "no value"] == [1]
+    assert all(c["degraded"] for c in changes if c.get("column") == "state" and not c.get("error"))
+
+
+def test_failed_steps_leave_cells_and_log_the_reason(monkeypatch):
+    monkeypatch.setattr(table_repair, "repair_data", FakeRepair(fail_target="city"))
+
+    chunks = _chunks(chunk_rows=5)
+
+    chunk, changes = chunks[0]
+    assert chunk["city"].tolist() == ["bham", "Mobile", "mgm", "", "hsv"]
+    assert changes[0] == {"row": "0-4", "column": "city", "error": "index does not exist"}
+
+
+def test_zip_stream_holds_repaired_table_and_change_log(fake_repair):
+    async def collect():
+        return b"".join([part async for part in stream_repaired_zip(io.BytesIO(CSV.encode()), PLAN, "llm", chunk_rows=2)])
+
+    archive = zipfile.ZipFile(io.BytesIO(asyncio.run(collect())))
+
+    assert archive.namelist() == ["repaired.csv", "changes.csv"]
+    repaired = archive.read("repaired.csv").decode()
+    assert repaired == "id,city,state\n007,Birmingham,AL\n008,Mobile,\n009,Montgomery,AL\n010,,AL\n011,Huntsville,AL\n"
+    changes = list(csv.DictReader(io.StringIO(archive.read("changes.csv").decode())))
+    assert len(changes) == 7 and changes[0]["repaired_value"] == "Birmingham"
+
+
+def test_cli_writes_both_files(fake_repair, tmp_path):
+    dirty = tmp_path / "dirty.csv"
+    dirty.write_text(CSV)
+
+    result = asyncio.run(repair_table_files(str(dirty), PLAN, "llm", str(tmp_path / "out"), chunk_rows=2))
+
+    assert result == {"status": "success", "changes": 7, "out_dir": str(tmp_path / "out")}
+    assert (tmp_path / "out" / "repaired.csv").read_text().splitlines()[1] == "007,Birmingham,AL"
+    assert asyncio.run(repair_table_files(str(dirty), [{"target": "zip"}], "llm", str(tmp_path)))["status"] == "fail"
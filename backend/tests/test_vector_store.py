@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+
+import core.vector_store as vector_store
+from core.vector_store import CircuitBreaker, ResilientQdrantClient, VectorStoreUnavailable, is_transient
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FlakyStore:
+    """Qdrant stand-in that raises the scripted errors first, then answers."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = []
+
+    def _answer(self, method):
+        self.calls.append(method)
+        if self.errors:
+            raise self.errors.pop(0)
+        return method
+
+    def count(self, **kwargs):
+        return self._answer("count")
+
+    def upsert(self, **kwargs):
+        return self._answer("upsert")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _client(store, retries=3, failures=5, clock=None):
+    sleeps = []
+    client = ResilientQdrantClient(
+        store, retries=retries, backoff_base=0.1, backoff_max=0.3,
+        breaker=CircuitBreaker(failures=failures, reset_seconds=10, clock=clock or Clock()),
+        sleep=sleeps.append,
+    )
+    return client, sleeps
+
+
+def test_transient_errors_are_told_apart():
+    assert is_transient(ConnectionError()) and is_transient(TimeoutError())
+    assert is_transient(HTTPError(503)) and is_transient(HTTPError(429))
+    assert not is_transient(HTTPError(400)) and not is_transient(ValueError())
+
+
+def test_reads_are_retried_with_capped_backoff():
+    store = FlakyStore(ConnectionError(), HTTPError(503), TimeoutError())
+    client, sleeps = _client(store)
+
+    assert client.count(collection_name="c") == "count"
+    assert store.calls == ["count"] * 4
+    assert len(sleeps) == 3 and all(0 <= s <= 0.3 for s in sleeps)
+
+
+def test_reads_give_up_after_the_retries():
+    client, sleeps = _client(FlakyStore(*[ConnectionError()] * 4), retries=2)
+    with pytest.raises(VectorStoreUnavailable):
+        client.count(collection_name="c")
+    assert len(sleeps) == 2
+
+
+def test_writes_are_tried_once():
+    store = FlakyStore(ConnectionError())
+    client, sleeps = _client(store)
+    with pytest.raises(VectorStoreUnavailable):
+        client.upsert(collection_name="c")
+    assert store.calls == ["upsert"] and sleeps == []
+
+
+def test_bad_requests_are_raised_as_is_and_do_not_trip_the_breaker():
+    store = FlakyStore(*[HTTPError(400)] * 5)
+    client, sleeps = _client(store, failures=2)
+    for _ in range(5):
+        with pytest.raises(HTTPError):
+            client.count(collection_name="c")
+    assert client.breaker.state == "closed" and sleeps == []
+
+
+def test_breaker_opens_then_probes_once_after_the_reset():
+    clock = Clock()
+    store = FlakyStore(*[ConnectionError()] * 3)
+    client, _ = _client(store, retries=0, failures=2, clock=clock)
+
+    for _ in range(2):
+        with pytest.raises(VectorStoreUnavailable):
+            client.count(collection_name="c")
+    assert client.breaker.state == "open"
+
+    with pytest.raises(VectorStoreUnavailable, match="circuit open"):
+        client.count(collection_name="c")
+    assert len(store.calls) == 2  # rejected without touching the store
+
+    clock.now = 10
+    assert client.breaker.state == "half_open"
+    with pytest.raises(VectorStoreUnavailable):
+        client.count(collection_name="c")  # failed probe: open again
+    assert client.breaker.state == "open"
+
+    clock.now = 20
+    assert client.count(collection_name="c") == "count"
+    assert client.breaker.state == "closed"
+
+
+def test_no_backoff_sleep_on_the_event_loop():
+    store = FlakyStore(ConnectionError(), ConnectionError())
+    client, sleeps = _client(store)
+
+    async def handler():
+        with pytest.raises(VectorStoreUnavailable):
+            client.count(collection_name="c")
+        # The same read from a worker thread is retried
+        return await asyncio.to_thread(client.count, collection_name="c")
+
+    assert asyncio.run(handler()) == "count"
+    assert store.calls == ["count"] * 3 and len(sleeps) == 1
+
+
+def test_grpc_falls_back_to_rest_when_unreachable(monkeypatch):
+    import qdrant_client
+
+    built = []
+
+    class FakeQdrantClient:
+        def __init__(self, prefer_grpc=False, **kwargs):
+            self.prefer_grpc = prefer_grpc
+            built.append(self)
+
+        def get_collections(self):
+            if self.prefer_grpc:
+                raise ConnectionError("grpc port closed")
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(qdrant_client, "QdrantClient", FakeQdrantClient)
+
+    assert vector_store.make_qdrant_client("http://qdrant:6333", prefer_grpc=True).prefer_grpc is False
+    assert [c.prefer_grpc for c in built] == [True, False]
+    assert vector_store.make_qdrant_client("http://qdrant:6333").prefer_grpc is False  # REST by default
+
+
+def test_index_routes_read_from_a_worker_thread_and_get_retries(qdrant, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    import api.index
+    import core
+
+    class FlakyCollections:
+        def __init__(self):
+            self.calls = 0
+
+        def __getattr__(self, name):
+            return getattr(qdrant, name)
+
+        def get_collections(self):
+            self.calls += 1
+            if self.calls == 1:
+                raise ConnectionError()
+            return qdrant.get_collections()
+
+    store = FlakyCollections()
+    monkeypatch.setattr(core.qdrant_client, "_client", store)
+    monkeypatch.setattr(core.qdrant_client, "_sleep", lambda seconds: None)
+    app = FastAPI()
+    app.include_router(api.index.router, prefix="/index")
+
+    response = TestClient(app).get("/index/")
+
+    assert response.status_code == 200 and store.calls == 2